@@ -0,0 +1,80 @@
+import collections
+import numpy
+
+ENTRY_OVERHEAD = 200 # approximate bytes per entry in addition to key and output values: dictionary slot, key object and array header
+
+class ActionCache:
+    """ represents a bounded least recently used cache of action network outputs
+
+    Input vectors are quantized to a grid of the given resolution, all inputs falling into the same grid cell share one output.
+    Thus repeated states, such as driving with all proximity sensors near zero on a constant ground, skip the forward pass.
+
+    Usage:
+    Assign an instance to the *cache* attribute of an *ActionNetwork*, the network consults it in *forward* and clears it in *fromGenome*.
+    *hits*, *misses* and *evictions* count the lookups since the last call of *resetStatistics*.
+
+    """
+
+    __slots__ = ("resolution", "memoryBudget", "maxEntries", "entries", "hits", "misses", "evictions")
+
+    def __init__(self, resolution=0.01, memoryBudget=65536):
+        """ creates an empty cache
+
+        Arguments:
+        resolution -- width of the quantization grid, either a number or one width per input value (for example coarser for the previous action)
+        memoryBudget -- approximate amount of bytes the entries may use, the least recently used entries are evicted beyond it
+
+        """
+        self.resolution = numpy.asarray(resolution, dtype=numpy.float64)
+        self.memoryBudget = memoryBudget
+        self.maxEntries = None # known once the size of the first entry is known
+        self.entries = collections.OrderedDict()
+        self.resetStatistics()
+
+    def key(self, vector):
+        """ returns the key of the grid cell containing the given input vector """
+        return numpy.floor(vector.ravel() / self.resolution + 0.5).astype(numpy.int32).tobytes()
+
+    def get(self, key):
+        """ returns the cached output for the given key or None, and counts the lookup as hit or miss """
+        output = self.entries.get(key)
+        if output is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return output
+
+    def put(self, key, output):
+        """ stores a copy of the given output under the given key and evicts least recently used entries beyond the memory budget """
+        if self.maxEntries is None:
+            self.maxEntries = max(1, self.memoryBudget // (len(key) + output.nbytes + ENTRY_OVERHEAD))
+
+        self.entries[key] = output.copy()
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """ removes all entries, for example because the network's weights changed; the statistics are kept """
+        self.entries.clear()
+
+    def resetStatistics(self):
+        """ sets hit, miss and eviction counters to zero """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookups(self):
+        """ returns the amount of lookups since the last reset of the statistics """
+        return self.hits + self.misses
+
+    def hitRate(self):
+        """ returns the fraction of lookups answered from the cache, 0 if there was no lookup """
+        if self.lookups() == 0:
+            return 0.0
+        return self.hits / self.lookups()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,62 @@
+import unittest
+import numpy
+from action_cache import *
+from action_network import ActionNetwork
+from activation import tanh
+
+class TestActionCache(unittest.TestCase):
+
+    def test_hits(self):
+        network = ActionNetwork(11, 7, 2, tanh)
+        reference = ActionNetwork(11, 7, 2, tanh, network.toGenome().copy())
+        network.cache = ActionCache(0.01)
+
+        vector = numpy.round(numpy.random.rand(11, 1), 2) # centres of grid cells
+        first = network.input(vector).copy()
+        second = network.input(vector + 0.001).copy() # same grid cell
+
+        self.assertTrue(numpy.array_equal(first, reference.input(vector)))
+        self.assertTrue(numpy.array_equal(second, first))
+        self.assertEqual(network.cache.hits, 1)
+        self.assertEqual(network.cache.misses, 1)
+        self.assertEqual(network.cache.hitRate(), 0.5)
+
+        network.input(vector + 0.1) # another grid cell
+        self.assertEqual(network.cache.misses, 2)
+        self.assertEqual(len(network.cache), 2)
+
+    def test_invalidation(self):
+        network = ActionNetwork(11, 7, 2, tanh)
+        network.cache = ActionCache(0.01)
+        vector = numpy.random.rand(11, 1)
+        network.input(vector)
+
+        genome = 2 * numpy.random.rand(network.genomeLength) - 1
+        network.fromGenome(genome)
+        self.assertEqual(len(network.cache), 0)
+
+        reference = ActionNetwork(11, 7, 2, tanh, genome)
+        self.assertTrue(numpy.array_equal(network.input(vector), reference.input(vector)))
+        self.assertEqual(network.cache.hits, 0)
+
+    def test_budget(self):
+        network = ActionNetwork(11, 7, 2, tanh)
+        entrySize = 11 * 4 + 2 * 8 + ENTRY_OVERHEAD
+        network.cache = ActionCache(0.01, 3 * entrySize)
+
+        vectors = [numpy.full((11, 1), 0.1 * i) for i in range(5)]
+        for vector in vectors:
+            network.input(vector)
+        self.assertEqual(len(network.cache), 3)
+        self.assertEqual(network.cache.evictions, 2)
+
+        network.input(vectors[2]) # used recently, still cached
+        self.assertEqual(network.cache.hits, 1)
+        network.input(vectors[0]) # least recently used, evicted
+        self.assertEqual(network.cache.misses, 6)
+
+        network.cache.resetStatistics()
+        self.assertEqual(network.cache.lookups(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
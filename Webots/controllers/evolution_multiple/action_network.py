@@ -1,16 +1,24 @@
 import numpy
+from activation import supports_out
 
 class ActionNetwork:
     """ represents a feedforward network with one hidden layer
 
+    All weights are stored in one contiguous genome buffer, *hidden* and *out* are views to this buffer.
+
     Usage:
     Call the constructor with desired amount of nodes. The *amountIn* value may be equal to the amount of sensors.
     Then call *input* with a vector of those sensor values in order to retrieve the output vector.
+    Alternatively write the input values directly to *inputVector* (its last entry is the bias) and call *forward*.
+    Optionally assign an *ActionCache* to *cache* in order to reuse outputs of previously seen (quantized) inputs.
 
     """
 
-    def __init__(self, amountIn, amountHidden, amountOut, activationFunction):
-        """ initialize a new ActionNetwork with specified sizes and random matrices
+    __slots__ = ("amountIn", "amountHidden", "amountOut", "activationFunction", "inPlace", "dtype", "genomeLength",
+                 "genome", "hidden", "out", "inputVector", "hiddenVector", "outputVector", "cache")
+
+    def __init__(self, amountIn, amountHidden, amountOut, activationFunction, genome=None, dtype=numpy.float64):
+        """ initialize a new ActionNetwork with specified sizes and random matrices or matrices from given genome
 
         this class represents a simple feed forward network
 
@@ -19,6 +27,8 @@ class ActionNetwork:
         amountHidden -- amount of hidden nodes in the only hidden layer
         amountOut -- amount of output values of the neural network
         activationFunction -- reference to a function applied to the sum of the incoming values for each node
+        genome -- optional genome buffer used as storage of the weights instead of drawing random weights; it is not copied, so later changes of the network's weights write to it
+        dtype -- floating point type of weights and computations, for example numpy.float32 for faster inference with half the memory
 
         Usage:
         call *input(vector)* to input a vector to the network and get the network output
@@ -28,46 +38,166 @@ class ActionNetwork:
         self.amountHidden = amountHidden  
         self.amountOut = amountOut
         self.activationFunction = activationFunction
-        self._constructRandomMatrices()
+        self.inPlace = supports_out(activationFunction)
+        self.dtype = numpy.dtype(dtype)
+        self.genomeLength = self.amountHidden * self.amountIn + self.amountOut * (self.amountHidden+1)
+        self.cache = None # optional ActionCache consulted in forward
+        self._constructBuffers()
+
+        if genome is None:
+            self._constructRandomMatrices()
+        else:
+            self._useGenome(genome)
+
+    def _constructBuffers(self):
+        """ allocates the bias-augmented vectors reused in every call of *forward* """
+        self.inputVector = numpy.empty((self.amountIn, 1), self.dtype)
+        self.inputVector[-1] = -1 # bias
+        self.hiddenVector = numpy.empty((self.amountHidden+1, 1), self.dtype)
+        self.hiddenVector[-1] = -1 # bias neuron for hidden layer
+        self.outputVector = numpy.empty((self.amountOut, 1), self.dtype)
 
     def _constructRandomMatrices(self):
         """ generates random matrices with values in [-1,1) suspect to change via fromGenom """
-        self.hidden = 2 * numpy.random.rand(self.amountHidden, self.amountIn) - 1
-        self.out = 2 * numpy.random.rand(self.amountOut, (self.amountHidden+1)) - 1 # bias neuron for hidden layer 
+        self._useGenome(2 * numpy.random.rand(self.genomeLength) - 1)
+
+    def _useGenome(self, genome):
+        """ uses the given genome buffer as storage and creates the matrices as views to it, the genome is only copied if its type does not match *dtype* """
+        self.genome = numpy.ascontiguousarray(genome[:self.genomeLength], dtype=self.dtype)
+
+        self.hidden = self.genome[:self.amountHidden*self.amountIn].reshape(self.amountHidden, self.amountIn)
+        self.out = self.genome[self.amountHidden*self.amountIn:].reshape(self.amountOut, (self.amountHidden+1)) # bias neuron for hidden layer 
 
     def toGenome(self):
-        """ returns the genome representing this network """
-        return numpy.concatenate((self.hidden.flatten(), self.out.flatten()))
+        """ returns the genome representing this network, which is the buffer storing the weights and not a copy """
+        return self.genome
 
     def fromGenome(self, genome):
         """ overwrites current matrices with those in given genome
 
+        The genome is copied to the genome buffer of this network in a single operation, cached outputs of the old weights are discarded.
+
         Arguments:
-        genome -- genome to reconstruct matrices from, must match exactly the format corresponding to the dimensions of matrices created in constructor
+        genome -- genome to reconstruct matrices from, must match exactly the format corresponding to the dimensions of matrices created in constructor; further entries are ignored
 
         """
-
-        # get either genome
-        genomeHidden = genome[:self.amountHidden*self.amountIn]
-        genomeOut = genome[self.amountHidden*self.amountIn:]
-        
-        # construct matrices
-        self.hidden = genomeHidden.reshape(self.amountHidden, self.amountIn)
-        self.out = genomeOut.reshape(self.amountOut, (self.amountHidden+1))
+        self.genome[:] = genome[:self.genomeLength]
+        if self.cache is not None:
+            self.cache.clear()
 
     def input(self, vector):
         """ input a vector to this network and returns network's output
 
+        The returned vector is reused by the next call, so copy it if it should be kept.
+
         Arguments:
         vector -- numpy vector with exactly *amountIn* elements
 
         """
-        # add bias to input vector
-        vector = numpy.concatenate((vector, [[-1]]), 0)  
-        
-        # calculate hidden layer outputs 
-        tmp = self.activationFunction(self.hidden.dot(vector))
-        # add bias for calculation of outputs 
-        tmp = numpy.concatenate((tmp, [[-1]]), 0) 
-
-        return self.activationFunction(self.out.dot(tmp))
+        self.inputVector[:-1] = vector
+        return self.forward()
+
+    def forward(self):
+        """ calculates the network's output for the values currently stored in *inputVector* without allocating new arrays """
+        if self.cache is not None:
+            key = self.cache.key(self.inputVector[:-1])
+            output = self.cache.get(key)
+            if output is not None:
+                numpy.copyto(self.outputVector, output)
+                return self.outputVector
+
+            self._forward()
+            self.cache.put(key, self.outputVector)
+            return self.outputVector
+
+        return self._forward()
+
+    def _forward(self):
+        """ calculates the network's output without consulting the cache """
+        # calculate hidden layer outputs, the bias for calculation of outputs stays in the last entry
+        numpy.matmul(self.hidden, self.inputVector, out=self.hiddenVector[:-1])
+        self._activate(self.hiddenVector[:-1])
+
+        numpy.matmul(self.out, self.hiddenVector, out=self.outputVector)
+        self._activate(self.outputVector)
+        return self.outputVector
+
+    def _activate(self, vector):
+        """ applies the activation function to the given vector in place """
+        if self.inPlace:
+            self.activationFunction(vector, out=vector)
+        else:
+            vector[...] = self.activationFunction(vector)
+
+
+class ActionNetworkBank:
+    """ represents a bank of equally sized *ActionNetwork*s evaluated in one batched computation
+
+    The weights of K networks are stacked into 3-D arrays, so that one call to *input* computes the outputs of all K networks.
+
+    Usage:
+    Create a bank from a (K, genome length) matrix of genomes or via *fromNetworks* from a list of networks.
+    Then call *input* with the K input vectors stacked to an array of shape (K, amountIn, 1) in order to retrieve the K output vectors as an array of shape (K, amountOut, 1).
+    A single vector of shape (amountIn, 1) is fed to all K networks.
+
+    """
+
+    def __init__(self, amountIn, amountHidden, amountOut, activationFunction, genomes, dtype=None):
+        """ initialize a new ActionNetworkBank with specified sizes from a matrix of genomes
+
+        Arguments:
+        amountIn -- amount of input values for each network
+        amountHidden -- amount of hidden nodes in the only hidden layer of each network
+        amountOut -- amount of output values of each network
+        activationFunction -- reference to a function applied elementwise to the stacked sums of incoming values
+        genomes -- matrix with one genome per row in the format of *ActionNetwork.toGenome*
+        dtype -- optional floating point type of weights and computations, by default the type of *genomes*
+
+        """
+        self.amountIn = amountIn + 1
+        self.amountHidden = amountHidden
+        self.amountOut = amountOut
+        self.activationFunction = activationFunction
+        self.dtype = dtype
+        self.fromGenomes(genomes)
+
+    @classmethod
+    def fromNetworks(cls, networks):
+        """ returns a bank containing copies of the weights of all given networks, which must have equal sizes """
+        first = networks[0]
+        genomes = numpy.stack([network.toGenome() for network in networks])
+        return cls(first.amountIn - 1, first.amountHidden, first.amountOut, first.activationFunction, genomes, first.dtype)
+
+    def toGenomes(self):
+        """ returns the genomes of all networks in this bank as a (K, genome length) matrix """
+        return numpy.concatenate((self.hidden.reshape(self.amountNetworks, -1), self.out.reshape(self.amountNetworks, -1)), 1)
+
+    def fromGenomes(self, genomes):
+        """ overwrites all matrices with those in given genomes
+
+        Arguments:
+        genomes -- matrix with one genome per row, the amount of rows determines the amount of networks in this bank
+
+        """
+        genomes = numpy.asarray(genomes, dtype=self.dtype)
+        self.amountNetworks = genomes.shape[0]
+
+        # get either genome
+        genomeHidden = genomes[:, :self.amountHidden*self.amountIn]
+        genomeOut = genomes[:, self.amountHidden*self.amountIn:]
+
+        # construct stacked matrices
+        self.hidden = genomeHidden.reshape(self.amountNetworks, self.amountHidden, self.amountIn)
+        self.out = genomeOut.reshape(self.amountNetworks, self.amountOut, (self.amountHidden+1))
+
+    def input(self, vectors):
+        """ inputs one vector per network to this bank and returns the stacked outputs of all networks
+
+        Arguments:
+        vectors -- numpy array of shape (K, amountIn, 1), or a single vector of shape (amountIn, 1) fed to all networks
+
+        """
+        # the bias input is -1, so its weights (last column) are subtracted instead of concatenating the bias to each vector
+        tmp = self.activationFunction(numpy.matmul(self.hidden[:, :, :-1], vectors) - self.hidden[:, :, -1:])
+
+        return self.activationFunction(numpy.matmul(self.out[:, :, :-1], tmp) - self.out[:, :, -1:])
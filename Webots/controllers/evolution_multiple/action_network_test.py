@@ -50,5 +50,19 @@ class TestActionNetwork(unittest.TestCase):
         self.assertTrue(numpy.array_equal(network.hidden, copy.hidden), 'fromGenome should be inverse to toGenome')
         self.assertTrue(numpy.array_equal(network.out, copy.out), 'fromGenome should be inverse to toGenome')
 
+    def test_bank(self):
+        networks = [ActionNetwork(4, 3, 2, numpy.tanh) for i in range(5)]
+        bank = ActionNetworkBank.fromNetworks(networks)
+        vectors = numpy.random.rand(5, 4, 1)
+        outputs = bank.input(vectors)
+        for i in range(5):
+            self.assertTrue(numpy.allclose(outputs[i], networks[i].input(vectors[i])), 'bank should match the single networks')
+
+        outputs = bank.input(vectors[0])
+        for i in range(5):
+            self.assertTrue(numpy.allclose(outputs[i], networks[i].input(vectors[0])), 'a single vector should be fed to all networks')
+
+        self.assertTrue(numpy.array_equal(bank.toGenomes()[2], networks[2].toGenome()), 'toGenomes should be inverse to fromGenomes')
+
 if __name__ == '__main__':
     unittest.main()
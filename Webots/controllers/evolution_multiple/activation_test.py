@@ -0,0 +1,37 @@
+import unittest
+import numpy
+from activation import *
+
+class TestActivation(unittest.TestCase):
+
+    def test_sigmoid(self):
+        x = numpy.linspace(-40, 40, 1001)
+        self.assertTrue(numpy.allclose(sigmoid(x), 1 / (1 + numpy.exp(-x)), rtol=0, atol=1e-15), 'sigmoid should match its definition')
+
+        out = numpy.empty_like(x)
+        self.assertIs(sigmoid(x, out=out), out, 'sigmoid should write to out')
+
+    def test_sigmoid_stable(self):
+        x = numpy.linspace(-40, 40, 1001)
+        self.assertTrue(numpy.allclose(sigmoid_stable(x), sigmoid(x), rtol=0, atol=1e-15), 'sigmoid_stable should match the reference sigmoid')
+
+        x32 = x.astype(numpy.float32)
+        result = sigmoid_stable(x32)
+        self.assertEqual(result.dtype, numpy.float32, 'sigmoid_stable should keep the precision')
+        self.assertTrue(numpy.allclose(result, sigmoid(x), rtol=0, atol=1e-6), 'sigmoid_stable should match the reference sigmoid in float32')
+
+        with numpy.errstate(over='raise'):
+            large = numpy.array([-1e5, 1e5], dtype=numpy.float32)
+            self.assertTrue(numpy.array_equal(sigmoid_stable(large), [0, 1]), 'sigmoid_stable should saturate without overflow')
+
+    def test_tanh(self):
+        x = numpy.linspace(-40, 40, 1001)
+        self.assertTrue(numpy.allclose(tanh(x.astype(numpy.float32)), numpy.tanh(x), rtol=0, atol=1e-6), 'tanh should match the reference in float32')
+
+    def test_supports_out(self):
+        self.assertTrue(supports_out(sigmoid))
+        self.assertTrue(supports_out(numpy.tanh))
+        self.assertFalse(supports_out(lambda x : x))
+
+if __name__ == '__main__':
+    unittest.main()
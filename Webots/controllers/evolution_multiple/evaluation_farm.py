@@ -0,0 +1,303 @@
+"""
+Minimize Surprise - evaluation farm
+
+Evaluates several candidate genomes at the same time, each one in its own instance of the same world.
+A local coordinator runs the (1+1) or (1+lambda) selection and hands candidate genomes over a local socket to workers, which return their scores.
+
+Workers are either headless Webots instances, whose master robot connects to the coordinator instead of mutating and selecting on its own
+(see *GeneticPopulation*), or stand-in evaluators running in local processes, for example on the headless simulator.
+
+Usage:
+python3 evaluation_farm.py [-w world] [-i instances] [-l lambda] [-e evaluations] [--headless]
+runs an evolution with the given amount of Webots instances (or headless stand-ins) and writes run.csv and genomes.csv to the results folder.
+"""
+
+import os
+import random
+import subprocess
+import time
+from multiprocessing import Process
+from multiprocessing.connection import Listener, Client, wait
+from optparse import OptionParser
+import numpy
+from genetic_individual import GeneticIndividual
+from activation import sigmoid_stable, tanh
+from state import write_csv
+
+FARM_ADDRESS = "EVOLUTION_FARM" # environment variable with host:port of the coordinator, set for the controllers of Webots instances
+FARM_KEY = "EVOLUTION_FARM_KEY" # environment variable with the hex encoded authentication key of the coordinator
+
+
+def connect_worker(name):
+    """ returns a connection to the coordinator given in the environment, None if the environment does not name a coordinator """
+    address = os.environ.get(FARM_ADDRESS)
+    if not address:
+        return None
+
+    host, port = address.rsplit(":", 1)
+    connection = Client((host, int(port)), authkey=bytes.fromhex(os.environ[FARM_KEY]))
+    connection.send(("hello", name))
+    return connection
+
+
+def serve(address, authkey, evaluate, name):
+    """ evaluates genomes received from the coordinator until it sends stop
+
+    Arguments:
+    address -- address of the coordinator
+    authkey -- authentication key of the coordinator
+    evaluate -- function returning the score of a genome, or the score and a (possibly changed) genome
+    name -- name of this worker
+
+    """
+    connection = Client(address, authkey=authkey)
+    connection.send(("hello", name))
+    while True:
+        message = connection.recv()
+        if message[0] == "stop":
+            break
+
+        result = evaluate(message[2])
+        score, genome = result if isinstance(result, tuple) else (result, None)
+        connection.send(("score", message[1], score, genome))
+    connection.close()
+
+
+class HeadlessEvaluator:
+    """ stand-in for a Webots instance evaluating genomes on the headless simulator, see *serve* """
+
+    def __init__(self, amountRobots, arenaX, arenaY, maxAge, amountHiddenAction, amountHiddenPrediction, controlPeriod=1, dtype=numpy.float64):
+        """ stores the parameters of the evaluations
+
+        Arguments:
+        amountRobots -- amount of simulated robots
+        arenaX -- size of the floor along the x axis in m
+        arenaY -- size of the floor along the y axis in m
+        maxAge -- evaluation length in control ticks, like *EVAL_TIME* of the controller
+        amountHiddenAction -- amount of hidden nodes in the action network
+        amountHiddenPrediction -- amount of hidden nodes in the prediction network
+        controlPeriod -- time steps per control tick, like *CONTROL_PERIOD* of the controller
+        dtype -- floating point type of the evaluated individuals, like the king of the coordinator
+
+        """
+        self.amountRobots = amountRobots
+        self.arenaX = arenaX
+        self.arenaY = arenaY
+        self.maxAge = maxAge
+        self.amountHiddenAction = amountHiddenAction
+        self.amountHiddenPrediction = amountHiddenPrediction
+        self.controlPeriod = controlPeriod
+        self.dtype = dtype
+
+    def __call__(self, genome):
+        from headless_simulator import SwarmSimulator, SwarmEvaluator, SENSORS, ACTIONS
+        simulator = SwarmSimulator(self.amountRobots, self.arenaX, self.arenaY)
+        simulator.placeRandom()
+        individual = GeneticIndividual(SENSORS, ACTIONS, self.amountHiddenAction, self.amountHiddenPrediction, tanh, sigmoid_stable, genome, self.dtype)
+        return float(SwarmEvaluator(simulator, self.maxAge, self.controlPeriod).evaluate(individual).mean())
+
+
+class WebotsInstance:
+    """ a headless Webots process running a world whose master robot works for the coordinator """
+
+    def __init__(self, world, webots="webots"):
+        """ stores the world file and the Webots executable, call *start* to launch the instance """
+        self.world = world
+        self.webots = webots
+        self.process = None
+
+    def start(self, address, authkey):
+        """ launches Webots without rendering in fast mode, the master robot connects to the given coordinator """
+        environment = dict(os.environ)
+        environment[FARM_ADDRESS] = address[0] + ":" + str(address[1])
+        environment[FARM_KEY] = authkey.hex()
+        self.process = subprocess.Popen([self.webots, "--batch", "--mode=fast", "--no-rendering", "--minimize", "--stdout", "--stderr", self.world], env=environment)
+
+    def stop(self):
+        """ terminates the instance if it is still running """
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+
+
+class Coordinator:
+    """ runs the selection of an evolution centrally and distributes the evaluations to workers
+
+    In every generation *lambda* candidates are evaluated in parallel: mutants of the king, and with a chance of *reEval* the king itself,
+    whose score is then mixed with its old score like in *GeneticPopulation*. The best mutant replaces the king if it is at least as good.
+    With lambda = 1 this is the (1+1) evolution of the master robot.
+
+    Usage:
+    Create a coordinator, start the workers with *address* and *authkey*, call *accept* and then *run*.
+
+    """
+
+    def __init__(self, king, amountCandidates, evals, mutateRate, reEval, reEvalWeight, address=("localhost", 0)):
+        """ opens the local socket of the coordinator
+
+        Arguments:
+        king -- first king, a *GeneticIndividual*
+        amountCandidates -- amount of candidates (lambda) evaluated in parallel per generation
+        evals -- amount of evaluations after which the evolution ends
+        mutateRate -- mutation rate used for creating mutants
+        reEval -- chance of re-evaluating the king in a generation
+        reEvalWeight -- weight of the new score of a re-evaluated king
+        address -- address of the local socket, by default a free port on localhost
+
+        """
+        self.king = king
+        self.amountCandidates = amountCandidates
+        self.evals = evals
+        self.mutateRate = mutateRate
+        self.reEval = reEval
+        self.reevalWeightNew = reEvalWeight
+
+        self.scoreKing = 0
+        self.evalCount = 0
+        self.filename = "results/genomes"
+        self.evaluation_listener = None
+
+        self.authkey = os.urandom(16)
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.workers = []
+
+    def set_evaluation_listener(self, listener):
+        """ sets the function called with the score of the king and the one of a candidate after each evaluation, like *GeneticPopulation* """
+        self.evaluation_listener = listener
+
+    def accept(self, amount):
+        """ waits until the given amount of workers connected """
+        for i in range(amount):
+            connection = self.listener.accept()
+            connection.recv() # hello
+            self.workers.append(connection)
+
+    def _individual(self, genome):
+        """ returns an individual of the king's sizes with the given genome """
+        king = self.king
+        return GeneticIndividual(king.amountSensors, king.amountActions, king.amountHiddenAction, king.amountHiddenPrediction,
+                                 king.activationFunctionAction, king.activationFunctionPrediction, genome, king.dtype)
+
+    def _evaluate(self, candidates):
+        """ returns the scores of all candidates, evaluated in parallel on the workers
+
+        Candidates whose worker disconnected are evaluated again on another worker. Workers may return a changed genome (see *serve*),
+        which then replaces the candidate's genome.
+
+        """
+        scores = [None] * len(candidates)
+        queue = list(range(len(candidates)))
+        busy = {} # connection -> index of the candidate
+
+        while queue or busy:
+            for connection in self.workers:
+                if queue and connection not in busy:
+                    index = queue.pop(0)
+                    connection.send(("evaluate", index, candidates[index].toGenome()))
+                    busy[connection] = index
+            if not busy:
+                raise RuntimeError("no workers left")
+
+            for connection in wait(list(busy)):
+                try:
+                    message = connection.recv()
+                except EOFError: # the worker died, its candidate is handed to another worker
+                    queue.append(busy.pop(connection))
+                    self.workers.remove(connection)
+                    continue
+
+                index = busy.pop(connection)
+                scores[index] = message[2]
+                if message[3] is not None:
+                    candidates[index] = self._individual(message[3])
+        return scores
+
+    def run(self):
+        """ runs the evolution until *evals* candidates were evaluated, then stops the workers and returns the king """
+        while self.evalCount < self.evals:
+            amount = min(self.amountCandidates, self.evals - self.evalCount)
+            reEvaluate = random.random() < self.reEval
+            candidates = [self.king.mutate(self.mutateRate) for i in range(amount - 1 if reEvaluate else amount)]
+            if reEvaluate:
+                candidates.append(self.king)
+
+            scores = self._evaluate(candidates)
+            self.evalCount += amount
+
+            if reEvaluate:
+                self.scoreKing = self.reevalWeightNew * scores.pop() + (1.0 - self.reevalWeightNew) * self.scoreKing
+                self.king = candidates.pop()
+                if self.evaluation_listener:
+                    self.evaluation_listener(-1, self.scoreKing)
+            for score in scores:
+                if self.evaluation_listener:
+                    self.evaluation_listener(self.scoreKing, score)
+
+            if scores and max(scores) >= self.scoreKing:
+                best = int(numpy.argmax(scores))
+                self.king = candidates[best]
+                self.scoreKing = scores[best]
+                line = ",".join(str(x) for x in self.king.actionNetwork.toGenome())
+                write_csv(self.filename, line)
+                line = ",".join(str(x) for x in self.king.predictionNetwork.toGenome()) + str("\n")
+                write_csv(self.filename, line)
+
+        self.close()
+        return self.king
+
+    def close(self):
+        """ stops all workers and closes the socket """
+        for connection in self.workers:
+            try:
+                connection.send(("stop",))
+            except OSError:
+                pass
+            connection.close()
+        self.workers = []
+        self.listener.close()
+
+
+if __name__ == '__main__':
+    import sys
+    import webots_emulation
+    sys.modules["controller"] = webots_emulation # the parameters of the evolution are those of the controller
+    import evolution_multiple as parameters
+
+    parser = OptionParser()
+    parser.add_option("-w", "--world", dest="world", default="../../worlds/thymio2_arena_without_walls_TENRobots_1010.wbt", help="Webots world file")
+    parser.add_option("-i", "--instances", dest="instances", type="int", default=os.cpu_count(), help="amount of Webots instances")
+    parser.add_option("-l", "--lambda", dest="candidates", type="int", default=None, help="candidates per generation, by default one per instance")
+    parser.add_option("-e", "--evaluations", dest="evaluations", type="int", default=parameters.EVALS, help="amount of evaluations")
+    parser.add_option("--headless", action="store_true", dest="headless", default=False, help="evaluate on the headless simulator instead of Webots")
+    parser.add_option("--webots", dest="webots", default="webots", help="Webots executable")
+    (options, args) = parser.parse_args()
+
+    king = GeneticIndividual(parameters.SENSORS, parameters.ACTIONS, parameters.HIDDEN_ACTION, parameters.HIDDEN_PRED, tanh, sigmoid_stable, dtype=parameters.PRECISION)
+    coordinator = Coordinator(king, options.candidates or options.instances, options.evaluations, parameters.MUT_RATE, parameters.RE_EVAL_PROB, parameters.RE_EVAL_WEIGHT)
+    os.makedirs("results", exist_ok=True)
+    write_csv("results/run", "king,mutant")
+    coordinator.set_evaluation_listener(lambda x,y: write_csv("results/run", str(x) + "," + str(y)))
+
+    world = webots_emulation.World.fromFile(options.world)
+    workers = []
+    for i in range(options.instances):
+        if options.headless:
+            evaluator = HeadlessEvaluator(parameters.ROBOTS, world.arenaX, world.arenaY, parameters.EVAL_TIME, parameters.HIDDEN_ACTION, parameters.HIDDEN_PRED, parameters.CONTROL_PERIOD, parameters.PRECISION)
+            worker = Process(target=serve, args=(coordinator.address, coordinator.authkey, evaluator, "headless" + str(i)))
+            worker.start()
+        else:
+            worker = WebotsInstance(options.world, options.webots)
+            worker.start(coordinator.address, coordinator.authkey)
+        workers.append(worker)
+
+    start = time.time()
+    coordinator.accept(options.instances)
+    coordinator.run()
+    duration = time.time() - start
+    print(str(options.evaluations) + " evaluations in " + str(round(duration, 2)) + " s, " + str(round(options.evaluations / duration, 2)) + " evaluations per second")
+    for worker in workers:
+        if options.headless:
+            worker.join()
+        else:
+            worker.stop()
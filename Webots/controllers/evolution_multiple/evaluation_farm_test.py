@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy
+from multiprocessing import Process
+from evaluation_farm import *
+from activation import sigmoid_stable, tanh
+
+WORLD = os.path.abspath("../../worlds/thymio2_arena_without_walls_TENRobots_1010.wbt")
+
+def sphere(genome):
+    return 1.0 / (1.0 + float(numpy.sum(genome ** 2)))
+
+def crash(address, authkey):
+    connection = Client(address, authkey=authkey)
+    connection.send(("hello", "crash"))
+    connection.recv()
+    os._exit(1)
+
+def emulate(address, authkey, directory):
+    import webots_emulation
+    sys.modules["controller"] = webots_emulation
+    import evolution_multiple
+    evolution_multiple.EVAL_TIME = 30
+    os.environ[FARM_ADDRESS] = address[0] + ":" + str(address[1])
+    os.environ[FARM_KEY] = authkey.hex()
+    os.chdir(directory)
+    webots_emulation.run(webots_emulation.World.fromFile(WORLD), 10000)
+
+class TestEvaluationFarm(unittest.TestCase):
+
+    def setUp(self):
+        self.king = GeneticIndividual(9, 2, 7, 10, tanh, sigmoid_stable)
+        self.workers = []
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def coordinator(self, amountCandidates, evals, reEval):
+        coordinator = Coordinator(self.king, amountCandidates, evals, 0.1, reEval, 0.2)
+        coordinator.filename = os.path.join(self.directory.name, "genomes")
+        return coordinator
+
+    def start(self, coordinator, target, args):
+        worker = Process(target=target, args=(coordinator.address, coordinator.authkey) + args)
+        worker.start()
+        self.workers.append(worker)
+
+    def run_workers(self, coordinator, amount):
+        coordinator.accept(amount)
+        king = coordinator.run()
+        for worker in self.workers:
+            worker.join()
+        return king
+
+    def test_selection(self):
+        coordinator = self.coordinator(4, 41, 0.2)
+        scores = []
+        coordinator.set_evaluation_listener(lambda x,y: scores.append((x,y)))
+        for i in range(3):
+            self.start(coordinator, serve, (sphere, "sphere" + str(i)))
+        king = self.run_workers(coordinator, 3)
+
+        self.assertEqual(coordinator.evalCount, 41)
+        self.assertEqual(len(scores), 41, "one line per evaluation")
+        self.assertAlmostEqual(sphere(king.toGenome()), max(score for king, score in scores), msg="the king should be the best candidate on a deterministic fitness")
+        self.assertTrue(all([worker.exitcode == 0 for worker in self.workers]), "the workers should be stopped")
+
+    def test_crash(self):
+        coordinator = self.coordinator(2, 4, 0)
+        self.start(coordinator, crash, ())
+        self.start(coordinator, serve, (sphere, "sphere"))
+        self.run_workers(coordinator, 2)
+        self.assertEqual(coordinator.evalCount, 4, "candidates of a crashed worker should be evaluated by the others")
+
+    def test_headless(self):
+        coordinator = self.coordinator(2, 2, 0)
+        scores = []
+        coordinator.set_evaluation_listener(lambda x,y: scores.append(y))
+        for i in range(2):
+            self.start(coordinator, serve, (HeadlessEvaluator(10, 1.0, 1.0, 30, 7, 10), "headless" + str(i)))
+        self.run_workers(coordinator, 2)
+        self.assertEqual(len(scores), 2)
+        self.assertTrue(all([0 <= score <= 1 for score in scores]))
+
+    def test_headless_evaluation(self):
+        evaluator = HeadlessEvaluator(10, 1.0, 1.0, 5, 7, 10, 3, numpy.float32)
+        with mock.patch("headless_simulator.SwarmEvaluator") as swarm:
+            swarm.return_value.evaluate.return_value = numpy.zeros(10)
+            evaluator(self.king.toGenome())
+        self.assertEqual(swarm.call_args[0][1:], (5, 3), "the evaluation should last as many time steps as on a Webots worker")
+        self.assertEqual(swarm.return_value.evaluate.call_args[0][0].dtype, numpy.float32, "the individual should have the precision of the king")
+
+    def test_master(self):
+        coordinator = self.coordinator(1, 3, 0.2)
+        scores = []
+        coordinator.set_evaluation_listener(lambda x,y: scores.append(y))
+        os.mkdir(os.path.join(self.directory.name, "results"))
+        self.start(coordinator, emulate, (self.directory.name,))
+        self.run_workers(coordinator, 1)
+        self.assertFalse(os.path.isfile(os.path.join(self.directory.name, "results", "run.csv")), "the coordinator logs the evolution")
+        self.assertEqual(self.workers[0].exitcode, 0, "the master should quit the simulation when the coordinator stops")
+        self.assertEqual(len(scores), 3)
+        self.assertTrue(all([0 <= score <= 1 for score in scores]))
+
+
+if __name__ == '__main__':
+    unittest.main()
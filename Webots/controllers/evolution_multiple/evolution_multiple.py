@@ -6,11 +6,17 @@ Consequently, all other robots may not contain 'master' in their names.
 """
 
 import sys
+import re
 import random
 import os.path
 from controller import Robot, Emitter, Receiver, Supervisor 
 import numpy as np
 from genetic_population_multiple import GeneticPopulation
+from activation import sigmoid_stable, tanh
+from action_cache import ActionCache
+from placement import random_poses
+from pose_sampler import PoseSampler
+from evaluation_farm import connect_worker
 from state import State, write_csv 
 
 
@@ -23,8 +29,10 @@ ROBOTS = 10 # number of robots
 # EXPERIMENT PARAMETERS 
 EVALS = 1000 
 POSTEVAL = False 
-EVAL_TIME = 1000 
-POST_EVAL_TIME = 10000
+EVAL_TIME = 1000 # in control ticks 
+POST_EVAL_TIME = 10000 # in control ticks 
+CONTROL_PERIOD = 1 # time steps per control tick, the slaves hold their motor commands in between 
+OVERLAP_STEPS = False # slaves compute while the physics advances (Webots R2023b and later), motor commands take effect one time step later 
 RE_EVAL_PROB = 0.2 
 RE_EVAL_WEIGHT = 0.2 
 SENSORS = 9 # 5 front horizontal + 2 back horizontal + 2 ground
@@ -32,54 +40,46 @@ ACTIONS = 2 # left and right wheel
 HIDDEN_ACTION = 7 #5 
 HIDDEN_PRED = 10 #6
 MUT_RATE = 0.1 
+PRECISION = np.float64 # inference precision: np.float64 or np.float32 
+ACTION_CACHE_RESOLUTION = None # quantization of the action network's inputs for caching its outputs, None disables the cache 
+ACTION_CACHE_BUDGET = 65536 # memory budget of the action cache in bytes 
+SHADOW_PREDICTORS = 0 # mutated prediction networks evaluated next to each mutant's one, the best replaces it if it scores higher 
+POSE_DECIMATION = 1 # the trajectory is sampled at every POSE_DECIMATION-th time step of the post-evaluation 
+POSE_BUFFER = 1000 # trajectory samples buffered before they are written 
+RECORD_MOVIE = False # record the post-evaluation in real time with Webots, otherwise it stays in fast mode and render_trajectory.py renders the trajectory 
+GROUPS = 1 # groups of slaves evaluating different mutants at the same time on their own channels, (1+GROUPS) evolution with ROBOTS/GROUPS robots per mutant 
+STEADY_STATE = 0 # slaves evaluating each candidate in the asynchronous steady-state mode, in which every slave forms a group and gets a new candidate as soon as it finishes; 0 keeps generations 
+SPECULATE = False # the master sends the next candidates for both outcomes of an evaluation ahead of time, the slaves go on with the likely one; requires GROUPS = 1 without steady state and aborts 
+EARLY_ABORT_PERIOD = 0 # control ticks between the slaves' reports of score bounds, the master aborts evaluations that cannot beat the king; 0 disables 
+REPETITIONS = 1 # independent runs of the experiment in one simulation, each one logs to its own results directory 
+GENOME_CHANNEL = False # hand genomes to the slaves through shared memory instead of the emitter, all controllers have to run on one host 
 ARENA_X = None
 ARENA_Y = None 
 ROBR = 0.082
 ROBOTS = 10 
+SENSOR_MAX = np.array([[MAX_HORIZONTAL_SENSOR]] * 7 + [[MAX_GROUND_SENSOR]] * 2) # normalization of the sensor vector
 
 def createRandom(): 
     """
     create random positions and headings
     constant set per generation 
     different values per robot and repetition 
+
+    Raises ValueError if ROBOTS robots do not fit into the arena.
     """
     
     global rot 
     global pos 
     
-    # reset 
-    pos = [] 
-    rot = [] 
-        
-    # headings 
-    rot = [2*np.pi*random.random() for i in range(ROBOTS)]
-    
-    # position             
-    for i in range(ROBOTS):
-        free = False 
-    
-        while not free: 
-            x = random.random() * (ARENA_X - 2* ROBR) - 0.5 * (ARENA_X - 2* ROBR)
-            y = random.random() * (ARENA_Y - 2* ROBR) - 0.5 * (ARENA_Y - 2* ROBR)
-            free = True 
-        
-            for k in range(0, len(pos)):                                        
-                dist = np.linalg.norm([pos[k][0] - x, pos[k][2] - y ])
-                                        
-                if dist < 2*ROBR: 
-                    free = False 
-       
-        pos.append([x, 0, y]) 
-
-
-def sigmoid(x):
-    """ returns the value of the sigmoid function evaluated at all elements of x """
-    return 1 / (1 + np.exp(-x))
-    
-    
-def tanh(x):
-    """ returns the value of the sigmoid function evaluated at all elements of x """
-    return np.tanh(x)
+    # non-overlapping positions, at least ROBR away from the edge of the floor 
+    pos, rot = random_poses(ROBOTS, ARENA_X - 2*ROBR, ARENA_Y - 2*ROBR, 2*ROBR)
+
+
+def results_directory(repetition):
+    """ returns the directory of the log files of the given repetition, counted from 1; the results folder itself if there is only one """
+    if REPETITIONS == 1:
+        return "results"
+    return "results/repetition_" + str(repetition)
 
 
 class Controller():
@@ -117,8 +117,23 @@ class Controller():
         self.emitter = emitter
         self.receiver = receiver
 
-        # create a genetic population
-        self.population = GeneticPopulation(self, EVAL_TIME, POST_EVAL_TIME, RE_EVAL_PROB, EVALS, SENSORS, ACTIONS, HIDDEN_ACTION, HIDDEN_PRED, MUT_RATE, tanh, sigmoid, RE_EVAL_WEIGHT)
+        # devices are taken from the given robot, so that several controllers may run in one process (see webots_emulation.py)
+        self._init_devices()
+
+        # the master sends the genome of each group on its own channel, counted from the emitter's channel; the slaves listen to their group's one 
+        self.groups = ROBOTS if STEADY_STATE > 0 else GROUPS
+        self.group = None
+        if self.master:
+            self.emitterChannel = self.emitter.getChannel()
+            self.groupSizes = [len(range(group, ROBOTS, self.groups)) for group in range(self.groups)]
+        else:
+            self.number = int(re.sub(r"\D", "", self.name))
+            self.group = (self.number - 1) % self.groups
+            if self.groups > 1:
+                self.receiver.setChannel(self.receiver.getChannel() + self.group)
+
+        # in a Webots instance of an evaluation farm the master evaluates the coordinator's genomes, which also logs the evolution 
+        self.farm = connect_worker(self.name) if self.master else None
 
         if self.master:
             # get floor size 
@@ -126,64 +141,153 @@ class Controller():
             floor_size = floor.getField('size').getSFVec2f()
             ARENA_X = floor_size[0]
             ARENA_Y = floor_size[1]
-        
-            # init log files
-            self.filename = "results/run"
-
-            write_csv("results/parameters", "evaluation length," + str(self.population.maxAge)) 
-            write_csv("results/parameters", "post-evaluation length," + str(POST_EVAL_TIME)) 
-            write_csv("results/parameters", "re-evaluation probability," + str(self.population.reEval)) 
-            write_csv("results/parameters", "re-evaluation weight (new score)," + str(self.population.reevalWeightNew)) 
-            write_csv("results/parameters", "mutation rate," + str(self.population.mutateRate)) 
-            write_csv("results/parameters", "sensors," + str(self.population.king.amountSensors)) 
-            write_csv("results/parameters", "actions," + str(self.population.king.amountActions))
-            write_csv("results/parameters", "hidden nodes action ANN," + str(self.population.king.amountHiddenAction))
-            write_csv("results/parameters", "hidden nodes prediction ANN," + str(self.population.king.amountHiddenPrediction))
-            write_csv("results/parameters", "transfer function action ANN,tanh")
-            write_csv("results/parameters", "transfer function prediction ANN,sigmoid")         
-            write_csv("results/parameters", "robots," + str(ROBOTS))         
-            write_csv("results/parameters", "arena size x," + str(ARENA_X))         
-            write_csv("results/parameters", "arena size y," + str(ARENA_Y))         
-            
 
-            if not os.path.isfile("results/trajectory.csv"):
-                write_csv("results/trajectory", "robot,translation0,translation1,translation2,rotation0,rotation1,rotation2,rotation3")
+            # node fields of all slaves are resolved once 
+            self.names = ['T' + str(i) for i in range(1, ROBOTS+1)]
+            self.translationFields = [self.robot.getFromDef(name).getField('translation') for name in self.names]
+            self.rotationFields = [self.robot.getFromDef(name).getField('rotation') for name in self.names]
+
+        else: # slave
+             # sensor vector reused in every control tick 
+             self.sensors = np.zeros((SENSORS, 1))
+             self.steps = 1 # time step of the sensor values read in the next call of *control*, a control tick whenever it is a multiple of CONTROL_PERIOD 
 
-            self._log("king,mutant")
+             # the slave's mutant keeps its networks, new genomes are copied into them and clear the cache 
+             self.cache = None 
+             if ACTION_CACHE_RESOLUTION is not None: 
+                 self.cache = ActionCache(ACTION_CACHE_RESOLUTION, ACTION_CACHE_BUDGET)
 
-            # register evaluation listener for logging
-            self.population.set_evaluation_listener(lambda x,y: self._log(str(x) + "," + str(y)))
-                        
+        self.population = None
+        self.repetition = 0
+        self.start_repetition()
+
+    def start_repetition(self):
+        """ starts the next repetition of the experiment with a fresh genetic population logging to the repetition's results directory
+
+        The master tells the slaves to start the next repetition as well, distributes the first genome and repositions the robots.
+
+        """
+        self.repetition += 1
+        self.results = results_directory(self.repetition)
+        os.makedirs(self.results, exist_ok=True)
+
+        if self.population is not None:
+            self.population.close()
+            if self.master:
+                for group in range(self.groups):
+                    self.emit(("REPETITION####" + str(self.repetition)).encode("utf-8"), group)
+
+        # create a genetic population
+        self.population = GeneticPopulation(self, EVAL_TIME, POST_EVAL_TIME, RE_EVAL_PROB, EVALS, SENSORS, ACTIONS, HIDDEN_ACTION, HIDDEN_PRED, MUT_RATE, tanh, sigmoid_stable, RE_EVAL_WEIGHT, PRECISION, SHADOW_PREDICTORS, self.farm, GENOME_CHANNEL, RECORD_MOVIE, self.groups, EARLY_ABORT_PERIOD, STEADY_STATE, SPECULATE)
+
+        if self.master:
+            # init log files
+            self.filename = self.results + "/run"
+
+            if self.farm is None:
+                parameters = self.results + "/parameters"
+                write_csv(parameters, "evaluation length," + str(self.population.maxAge)) 
+                write_csv(parameters, "post-evaluation length," + str(POST_EVAL_TIME)) 
+                write_csv(parameters, "re-evaluation probability," + str(self.population.reEval)) 
+                write_csv(parameters, "re-evaluation weight (new score)," + str(self.population.reevalWeightNew)) 
+                write_csv(parameters, "mutation rate," + str(self.population.mutateRate)) 
+                write_csv(parameters, "sensors," + str(self.population.king.amountSensors)) 
+                write_csv(parameters, "actions," + str(self.population.king.amountActions))
+                write_csv(parameters, "hidden nodes action ANN," + str(self.population.king.amountHiddenAction))
+                write_csv(parameters, "hidden nodes prediction ANN," + str(self.population.king.amountHiddenPrediction))
+                write_csv(parameters, "transfer function action ANN,tanh")
+                write_csv(parameters, "transfer function prediction ANN,sigmoid")         
+                write_csv(parameters, "precision," + np.dtype(PRECISION).name)         
+                write_csv(parameters, "shadow predictors," + str(SHADOW_PREDICTORS))         
+                write_csv(parameters, "genome channel," + str(GENOME_CHANNEL))         
+                write_csv(parameters, "trajectory decimation," + str(POSE_DECIMATION))         
+                write_csv(parameters, "control period," + str(CONTROL_PERIOD))         
+                write_csv(parameters, "overlapped steps," + str(OVERLAP_STEPS))         
+                write_csv(parameters, "movie," + str(RECORD_MOVIE))         
+                write_csv(parameters, "groups," + str(GROUPS))         
+                write_csv(parameters, "steady state," + str(STEADY_STATE))         
+                write_csv(parameters, "speculative candidates," + str(SPECULATE))         
+                write_csv(parameters, "early abort period," + str(EARLY_ABORT_PERIOD))         
+                write_csv(parameters, "repetition," + str(self.repetition) + "/" + str(REPETITIONS))         
+                write_csv(parameters, "robots," + str(ROBOTS))         
+                write_csv(parameters, "arena size x," + str(ARENA_X))         
+                write_csv(parameters, "arena size y," + str(ARENA_Y))         
+
+                if not os.path.isfile(self.results + "/trajectory.csv"):
+                    write_csv(self.results + "/trajectory", "robot,translation0,translation1,translation2,rotation0,rotation1,rotation2,rotation3")
+
+                self._log("king,mutant")
+
+                # register evaluation listener for logging
+                self.population.set_evaluation_listener(lambda x,y: self._log(str(x) + "," + str(y)))
+
+            self.poseSampler = PoseSampler(self.names, self.translationFields, self.rotationFields, self.results + "/trajectory", POSE_DECIMATION, POSE_BUFFER)
             self.reposition_robots() 
-        
+
         else: # slave
+             if self.cache is not None: 
+                 self.cache.clear()
+                 self.cache.resetStatistics()
+                 self.population.mutant.actionNetwork.cache = self.cache
+                 if not os.path.isfile(self.results + "/cache_" + str(self.name) + ".csv"):
+                     write_csv(self.results + "/cache_" + str(self.name), "hits,misses,evictions,entries")
+
              # init log file for predictions and sensors 
-             self.filename = "results/pred_" + str(self.name) 
+             self.filename = self.results + "/pred_" + str(self.name) 
              
              if not os.path.isfile(self.filename):
                  write_csv(self.filename, "obstacle avoidance,pred0 (t+1),pred1 (t+1),pred2 (t+1),pred3 (t+1),pred4 (t+1),pred5 (t+1),pred6 (t+1),predg0 (t+1),predg1 (t+1),s0 (t),s1 (t),s2 (t),s3 (t),s4 (t),s5 (t),s6 (t),sg0 (t),sg1 (t),m0 selected,m1 selected,m0 real,m1 real")
              
 
+    def _init_devices(self):
+        """ gets and enables motors, sensors and receiver of the robot """
+        timeStep = int(self.robot.getBasicTimeStep())
+
+        # Get left and right wheel motors
+        self.leftMotor = self.robot.getMotor("motor.left")
+        self.rightMotor = self.robot.getMotor("motor.right")
+
+        # Disable motor PID control mode
+        self.leftMotor.setPosition(float('inf'))
+        self.rightMotor.setPosition(float('inf'))
+
+        # distance sensors in the order of the sensor vector: 5 front horizontal, 2 back horizontal, 2 ground; only read at control ticks
+        names = ["prox.horizontal." + str(i) for i in range(7)] + ["prox.ground.0", "prox.ground.1"]
+        self.distanceSensors = [self.robot.getDistanceSensor(name) for name in names]
+        for sensor in self.distanceSensors:
+            sensor.enable(timeStep * CONTROL_PERIOD)
+
+        self.receiver.enable(timeStep)
+
     def reposition_robots(self): 
         createRandom()
-        for i in range(1, ROBOTS+1):   
-            slave = self.robot.getFromDef('T' + str(i))
-            slave.getField('translation').setSFVec3f(pos[i-1])
-            slave.getField('rotation').setSFRotation([0, 1, 0, rot[i-1]]) 
+        for i in range(ROBOTS):   
+            self.translationFields[i].setSFVec3f(pos[i])
+            self.rotationFields[i].setSFRotation([0, 1, 0, rot[i]]) 
                  
     def _log(self, line):
         """ writes the line to the logfile """
         write_csv(self.filename, line)
 
-    def emit(self, msg):
-        """ sends a message """
+    def emit(self, msg, group=0):
+        """ sends a message, on the master to the slaves of the given group """
+        if self.master and self.groups > 1:
+            self.emitter.setChannel(self.emitterChannel + group)
         self.emitter.send(msg)
 
     def receive(self):
-        """ receive a (one!) message and returns it, None if no message received """
+        """ receive a (one!) message and returns it, None if no message received
+
+        On a slave, the master's announcement of the next repetition is handled here and not returned.
+
+        """
         if self.receiver.getQueueLength() > 0:
             msg = self.receiver.getData()
             self.receiver.nextPacket()
+            if not self.master and msg.startswith(b"REPETITION####"):
+                self.repetition = int(msg.decode("utf-8").split("####")[1]) - 1
+                self.start_repetition()
+                return None
             return msg
         return None
 
@@ -202,42 +306,45 @@ class Controller():
     def control_master(self):
         """ wait for evaluation scores and distribute new genome """        
         if self.population.POST_EVAL:
-            if self.robot.movieIsReady(): # Quit simulation when run is over 
-                self.robot.simulationQuit(1)
-                
-            if self.population.state != State.STOP: 
+            if self.population.state == State.STOP: 
+                self.poseSampler.flush() # write the remaining trajectory before quitting 
+            else: 
                 # log trajectory for each robot 
-                for i in range(1, ROBOTS+1): 
-                    slave = self.robot.getFromDef('T' + str(i))
-                    translationValues = slave.getField('translation').getSFVec3f()
-                    rotationValues = slave.getField('rotation').getSFRotation() 
-                    write_csv("results/trajectory", 'T' + str(i) + ',' + str(translationValues[0]) + ',' + str(translationValues[1]) + ',' + str(translationValues[2]) + ',' + str(rotationValues[0]) + ',' + str(rotationValues[1]) + ',' + str(rotationValues[2]) + ',' + str(rotationValues[3]))
+                self.poseSampler.sample()
+
+            if self.population.state == State.STOP and self.robot.movieIsReady(): # Quit simulation when run is over, unless there are repetitions left 
+                if self.repetition < REPETITIONS:
+                    self.start_repetition()
+                else:
+                    self.robot.simulationQuit(1)
         
         # receive fitness values, determine overall fitness, distribute new genomes           
         self.population.execute_master()
         
         # don't move        
         motor = [0,0]
-        leftMotor.setVelocity(motor[0])
-        rightMotor.setVelocity(motor[1])
+        self.leftMotor.setVelocity(motor[0])
+        self.rightMotor.setVelocity(motor[1])
         
         return True
 
     def control_slave(self):
-        """ calculates motor values and sets them using 1+1 evolution distributed across a master and his slaves """
-
-        # transform sensor values into a numpy vector
-        sensors = np.array([
-                            [outerLeftSensor.getValue()/MAX_HORIZONTAL_SENSOR],
-                            [centralLeftSensor.getValue()/MAX_HORIZONTAL_SENSOR],
-                            [centralSensor.getValue()/MAX_HORIZONTAL_SENSOR],
-                            [centralRightSensor.getValue()/MAX_HORIZONTAL_SENSOR],
-                            [outerRightSensor.getValue()/MAX_HORIZONTAL_SENSOR],
-                            [backLeftSensor.getValue()/MAX_HORIZONTAL_SENSOR],
-                            [backRightSensor.getValue()/MAX_HORIZONTAL_SENSOR], 
-                            [groundLeftSensor.getValue()/MAX_GROUND_SENSOR],
-                            [groundRightSensor.getValue()/MAX_GROUND_SENSOR]
-                        ])
+        """ calculates motor values and sets them using 1+1 evolution distributed across a master and his slaves
+
+        The networks only run at control ticks, in the time steps in between the motors keep their velocities.
+        Control ticks fall on the time steps at which the distance sensors are sampled, so they always read fresh values.
+
+        """
+        tick = self.steps % CONTROL_PERIOD == 0
+        self.steps += 1
+        if not tick:
+            return True
+
+        # write normalized sensor values into the preallocated numpy vector
+        sensors = self.sensors
+        for i in range(SENSORS):
+            sensors[i, 0] = self.distanceSensors[i].getValue()
+        np.divide(sensors, SENSOR_MAX, out=sensors)
                         
         action, pred = self.population.execute_slave(sensors)  # this is the line containing the 1+1 evolution magic
         obstacle_avoidance = 0 
@@ -265,9 +372,14 @@ class Controller():
         else: # no action if eval time is over 
             motor = [0,0]
 
+            # log cache statistics once per evaluation 
+            if self.cache is not None and self.cache.lookups() > 0:
+                write_csv(self.results + "/cache_" + str(self.name), str(self.cache.hits) + "," + str(self.cache.misses) + "," + str(self.cache.evictions) + "," + str(len(self.cache)))
+                self.cache.resetStatistics()
+
         # set motor values
-        leftMotor.setVelocity(motor[0])
-        rightMotor.setVelocity(motor[1])
+        self.leftMotor.setVelocity(motor[0])
+        self.rightMotor.setVelocity(motor[1])
 
         return True
 
@@ -294,6 +406,32 @@ class Controller():
 
 
 
+def run_controller(robot, controller, timeStep, overlap=False):
+    """ calls *control* once per time step until the simulation ends
+
+    With *overlap*, slaves use the split step functions where Webots provides them: *stepBegin* sends the motor commands and starts the physics step,
+    the controller computes the next commands from the sensor values of the previous step meanwhile, *stepEnd* waits for the step to finish.
+    Motor commands thus take effect one time step later than with *step*. The master always uses *step*, as it changes the scene tree.
+    Webots versions without split steps (e.g. R2020a) fall back to *step*.
+
+    Arguments:
+    robot -- reference to supervisor or robot instance
+    controller -- controller of the robot
+    timeStep -- length of a time step in ms
+    overlap -- True iff computation and physics should overlap
+
+    """
+    if overlap and not controller.master and hasattr(robot, "stepBegin"):
+        controller.steps = 0 # *control* reads the sensor values of the time step before the one started by *stepBegin*
+        while robot.stepBegin(timeStep) != -1:
+            controller.control()
+            if robot.stepEnd() == -1:
+                break
+    else:
+        while robot.step(timeStep) != -1:
+            controller.control()
+
+
 if __name__ == '__main__':
     # Get reference to the robot.
     if str(sys.argv[1]) == "slave":
@@ -304,45 +442,9 @@ if __name__ == '__main__':
     # Get simulation step length
     timeStep = int(robot.getBasicTimeStep())
 
-    # Get left and right wheel motors
-    leftMotor = robot.getMotor("motor.left")
-    rightMotor = robot.getMotor("motor.right")
-
-    # Get distance sensors
-    outerLeftSensor = robot.getDistanceSensor("prox.horizontal.0")
-    centralLeftSensor = robot.getDistanceSensor("prox.horizontal.1")
-    centralSensor = robot.getDistanceSensor("prox.horizontal.2")
-    centralRightSensor = robot.getDistanceSensor("prox.horizontal.3")
-    outerRightSensor = robot.getDistanceSensor("prox.horizontal.4")
-    
-    backLeftSensor = robot.getDistanceSensor("prox.horizontal.5")
-    backRightSensor = robot.getDistanceSensor("prox.horizontal.6")
-    
-    groundLeftSensor = robot.getDistanceSensor("prox.ground.0")
-    groundRightSensor = robot.getDistanceSensor("prox.ground.1")
-
-    # Enable distance sensors
-    outerLeftSensor.enable(timeStep)
-    centralLeftSensor.enable(timeStep)
-    centralSensor.enable(timeStep)
-    centralRightSensor.enable(timeStep)
-    outerRightSensor.enable(timeStep)
-    
-    backLeftSensor.enable(timeStep)
-    backRightSensor.enable(timeStep)
-    
-    groundLeftSensor.enable(timeStep)
-    groundRightSensor.enable(timeStep)
-
-    # Disable motor PID control mode
-    leftMotor.setPosition(float('inf'))
-    rightMotor.setPosition(float('inf'))
-
     # check if this controller is run on the master robot
     print("master" in robot.getName()) 
     controller = Controller(robot, robot.getName(), "master" in robot.getName(), robot.getEmitter("emitter"), robot.getReceiver("receiver"))
-    controller.receiver.enable(timeStep)
 
     # beginning of execution
-    while(robot.step(timeStep) != -1):
-        controller.control()
+    run_controller(robot, controller, timeStep, OVERLAP_STEPS)
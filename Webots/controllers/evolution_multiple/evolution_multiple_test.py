@@ -0,0 +1,56 @@
+import sys
+import unittest
+import webots_emulation
+
+sys.modules["controller"] = webots_emulation
+from evolution_multiple import *
+
+class StepRobot:
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.calls = []
+
+    def step(self, timeStep):
+        self.calls.append("step")
+        self.steps -= 1
+        return -1 if self.steps < 0 else 0
+
+class SplitStepRobot(StepRobot):
+
+    def stepBegin(self, timeStep):
+        self.calls.append("begin")
+        return 0
+
+    def stepEnd(self):
+        self.calls.append("end")
+        self.steps -= 1
+        return -1 if self.steps < 0 else 0
+
+class RecordingController:
+
+    def __init__(self, robot, master):
+        self.robot = robot
+        self.master = master
+
+    def control(self):
+        self.robot.calls.append("control")
+
+class TestEvolutionMultiple(unittest.TestCase):
+
+    def test_run_controller(self):
+        robot = SplitStepRobot(2)
+        run_controller(robot, RecordingController(robot, False), 10, True)
+        self.assertEqual(robot.calls, ["begin", "control", "end"] * 3, "the controller should compute between the beginning and the end of a step")
+
+        robot = SplitStepRobot(2)
+        run_controller(robot, RecordingController(robot, True), 10, True)
+        self.assertEqual(robot.calls, ["step", "control"] * 2 + ["step"], "the master should not overlap")
+
+        robot = StepRobot(2)
+        run_controller(robot, RecordingController(robot, False), 10, True)
+        self.assertEqual(robot.calls, ["step", "control"] * 2 + ["step"], "Webots without split steps should fall back to step")
+
+
+if __name__ == '__main__':
+    unittest.main()
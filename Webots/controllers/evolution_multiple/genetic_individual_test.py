@@ -24,6 +24,42 @@ class TestGeneticIndividual(unittest.TestCase):
         correctScore = ((1 - abs(prediction1[0][0] - sensor2[0][0])) + (1 - abs(prediction2[0][0] - sensor3[0][0]))) / (2*1)
         self.assertEqual(score, correctScore, "evaluate does not evaluate correctly!")
 
+    def test_evaluate_streaming(self):
+        individual = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh)
+
+        predictions = []
+        sensors = [numpy.random.rand(3, 1) for i in range(101)]
+        for i in range(100):
+            if i > 0:
+                individual.storeSensor(sensors[i])
+            individual.action(sensors[i])
+            predictions.append(individual.predict(sensors[i]).copy())
+        individual.storeSensor(sensors[100])
+
+        correctScore = sum(numpy.sum(1 - numpy.absolute(predictions[i] - sensors[i+1])) for i in range(100)) / (100*3)
+        self.assertAlmostEqual(individual.evaluate(), correctScore, msg="streaming evaluate does not evaluate correctly!")
+
+        individual.predict(sensors[0])
+        individual.predict(sensors[0])
+        self.assertRaises(RuntimeError, individual.predict, sensors[0])
+
+    def test_score_bound(self):
+        individual = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh)
+
+        sensors = [numpy.random.rand(3, 1) for i in range(21)]
+        bounds = []
+        for i in range(20):
+            if i > 0:
+                individual.storeSensor(sensors[i])
+                bounds.append(individual.scoreBound(20))
+            individual.action(sensors[i])
+            individual.predict(sensors[i])
+        individual.storeSensor(sensors[20])
+
+        self.assertAlmostEqual(individual.scoreBound(20), individual.evaluate(), msg="the bound of a finished evaluation is its score")
+        for bound, following in zip(bounds, bounds[1:] + [individual.evaluate()]):
+            self.assertGreaterEqual(bound + 1e-12, following, "bounds should only tighten")
+
     def test_mutate(self):
         individual = GeneticIndividual(1, 1, 1, 1, lambda x : x, lambda x : x)
         mutant = individual.mutate(0)
@@ -34,6 +70,72 @@ class TestGeneticIndividual(unittest.TestCase):
         self.assertFalse(numpy.array_equal(individual.actionNetwork.toGenome(), mutant.actionNetwork.toGenome()), "rate=0 should produce a copy")
         self.assertFalse(numpy.array_equal(individual.predictionNetwork.toGenome(), mutant.predictionNetwork.toGenome()), "rate=0 should produce a copy")
 
+    def test_genome(self):
+        individual = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh)
+        copy = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh, individual.toGenome())
+        self.assertTrue(numpy.array_equal(individual.actionNetwork.toGenome(), copy.actionNetwork.toGenome()), "constructor should use the given genome")
+        self.assertTrue(numpy.array_equal(individual.predictionNetwork.toGenome(), copy.predictionNetwork.toGenome()), "constructor should use the given genome")
+
+    def test_genome_buffer(self):
+        individual = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh)
+        genome = individual.toGenome().copy()
+
+        copy = individual.copy()
+        copy.actionNetwork.fromGenome(numpy.zeros(copy.actionNetwork.genomeLength))
+        self.assertTrue(numpy.array_equal(individual.toGenome(), genome), "copy should not share the genome buffer")
+        self.assertFalse(numpy.any(copy.toGenome()[:copy.actionNetwork.genomeLength]), "networks should store their weights in the genome buffer")
+
+        individual.mutate(1)
+        self.assertTrue(numpy.array_equal(individual.toGenome(), genome), "mutate should not change the original genome")
+
+    def test_precision(self):
+        individual = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh)
+        single = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh, individual.toGenome(), numpy.float32)
+        self.assertEqual(single.toGenome().dtype, numpy.float32)
+        self.assertEqual(single.mutate(0.5).toGenome().dtype, numpy.float32, "mutants should keep the precision")
+
+        for i in range(10):
+            sensor = numpy.random.rand(3, 1)
+            self.assertTrue(numpy.allclose(individual.action(sensor), single.action(sensor), atol=1e-5), "float32 should match float64")
+            self.assertTrue(numpy.allclose(individual.predict(sensor), single.predict(sensor), atol=1e-5), "float32 should match float64")
+            individual.storeSensor(sensor)
+            single.storeSensor(sensor)
+        self.assertAlmostEqual(individual.evaluate(), single.evaluate(), places=5)
+
+    def test_shadow(self):
+        individual = GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh)
+        genomes = individual.shadowGenomes(4, 0.5, 42)
+        self.assertTrue(numpy.array_equal(genomes, individual.shadowGenomes(4, 0.5, 42)), "the seed should determine the shadow genomes")
+        self.assertTrue(numpy.array_equal(individual.shadowGenomes(2, 0, 7)[1], individual.predictionNetwork.toGenome()), "rate=0 should produce copies")
+
+        # the last shadow is a copy of the active predictor and must score the same
+        genomes[-1] = individual.predictionNetwork.toGenome()
+        individual.setShadowPredictors(genomes)
+        others = [GeneticIndividual(3, 2, 4, 5, numpy.tanh, numpy.tanh, numpy.concatenate((individual.actionNetwork.toGenome(), genome))) for genome in genomes]
+
+        sensors = [numpy.random.rand(3, 1) for i in range(21)]
+        for k in range(2): # the second evaluation checks reset
+            individual.reset()
+            for other in others:
+                other.reset()
+            for i in range(20):
+                for x in [individual] + others:
+                    if i > 0:
+                        x.storeSensor(sensors[i])
+                    x.action(sensors[i])
+                    x.predict(sensors[i])
+            for x in [individual] + others:
+                x.storeSensor(sensors[20])
+
+            scores = individual.evaluateShadows()
+            self.assertAlmostEqual(scores[-1], individual.evaluate())
+            for score, other in zip(scores, others):
+                self.assertAlmostEqual(score, other.evaluate(), msg="shadows should score like individuals with their genome")
+
+        individual.setShadowPredictors(None)
+        individual.action(sensors[0])
+        individual.predict(sensors[0])
+
 
 if __name__ == '__main__':
     unittest.main()
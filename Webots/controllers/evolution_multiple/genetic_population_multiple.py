@@ -2,9 +2,17 @@ import struct
 import numpy
 import random
 from genetic_individual import GeneticIndividual
+from genome_channel import GenomeChannel, parse_notification
+from steady_state import SteadyState
 from controller import Supervisor
 from state import State, write_csv  
 
+SCORE = 0 # kind of a message carrying the final score of a slave, tagged with the generation of its genome 
+BOUND = 1 # kind of a message carrying the upper bound of a slave's score during its evaluation 
+ABORT = b"ABORT" # message of the master aborting the evaluations of a group
+SPECULATION = "SPECULATION" # prefix of the message carrying the candidates that follow the current mutant ahead of time
+VERDICT = "VERDICT" # prefix of the message telling the slaves which speculative candidate follows the current mutant
+
 
 class GeneticPopulation:
     """ represents a population in terms of 1+1 evolution
@@ -17,10 +25,18 @@ class GeneticPopulation:
 
     If this instance is running on the master:
         After that you only need to call *execute_master* at every time step.
+        With several groups of slaves, each group evaluates a different mutant at the same time, i.e. a (1+lambda) evolution with lambda groups.
+        If a connection to the coordinator of an evaluation farm is given, the master evaluates the genomes received from the coordinator
+        and returns their scores instead of mutating and selecting on its own (see *evaluation_farm.py*).
+        If the slaves report upper bounds of their scores, the master aborts the evaluations once no group's mutant can reach the score of the king anymore.
+        In the asynchronous steady-state mode every slave is a group of its own and gets the next candidate as soon as it sent its score (see *SteadyState*),
+        the king is updated whenever all scores of a candidate arrived.
+        With speculative candidates the master sends the candidates for both outcomes of the current evaluation ahead of time (see *_speculate*),
+        so the slaves go on with the likely one instead of waiting for the master's evaluation.
 
     """
 
-    def __init__(self, controller, maxAge, postEvalTime, reEval, evals, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, mutateRate, activationFunctionAction, activationFunctionPrediction, reEvalWeight):
+    def __init__(self, controller, maxAge, postEvalTime, reEval, evals, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, mutateRate, activationFunctionAction, activationFunctionPrediction, reEvalWeight, dtype=numpy.float64, shadowPredictors=0, farm=None, genomeChannel=False, recordMovie=True, groups=1, boundPeriod=0, steadyState=0, speculative=False):
         """ initializes a population with a king and a mutant
 
         The population consists of a king (the best seen mutant so far) and a currently being tested mutant. Both are instances of the *GeneticIndividual* class.
@@ -30,8 +46,8 @@ class GeneticPopulation:
 
         Arguments:
         controller -- controller controlling the robot, used to determine whether the instance is a slave or a master and for sending and receiving messages
-        maxAge -- evaluation length of genome/mutant 
-        postEvalTime -- length of postevaluation 
+        maxAge -- evaluation length of genome/mutant in control ticks, i.e. calls of *execute_slave*
+        postEvalTime -- length of postevaluation in control ticks
         reEval -- percentage chance of re-evaluation of current king 
         evals -- maximum number of evaluations / cycles / generations 
         amountSensors -- amount of sensor values (needed for the genetical individuals)
@@ -41,9 +57,21 @@ class GeneticPopulation:
         activationFunctionAction -- activation function used in the action networks (needed for the genetical individuals)
         activationFunctionPrediction -- activation function used in the prediction networks (needed for the genetical individuals)
         reEvalWeight -- weight of newly determined score after re-evaluating king; old score weighted with (1-reEvalWeight) 
+        dtype -- floating point type used for genomes and inference, numpy.float64 or numpy.float32 (needed for the genetical individuals)
+        shadowPredictors -- amount of mutated prediction networks evaluated next to each new mutant's prediction network, the best one replaces it if it scores higher
+        farm -- connection to the coordinator of an evaluation farm, only used on the master; None if the master runs the evolution itself
+        genomeChannel -- True iff the master publishes genomes in shared memory and only emits a notification (see *GenomeChannel*), requires all controllers on one host
+        recordMovie -- True iff the post-evaluation is recorded by Webots in real time, otherwise it runs in fast mode
+        groups -- amount of groups of slaves evaluating different mutants at the same time (see *Controller.emit*), only used on the master
+        boundPeriod -- control ticks between a slave's reports of the upper bound of its score, 0 disables the reports and aborts
+        steadyState -- amount of slaves evaluating each candidate in the asynchronous steady-state mode, which requires one group per slave; 0 keeps generations
+        speculative -- True iff the slaves start the next candidate before the master evaluated the current one, requires a single group evaluated in generations without aborts
         """
 
-        self.MASTER_WAIT_PUFFER = 10 # puffer for waiting for delayed messages (in timesteps)
+        self.MASTER_WAIT_PUFFER = 10 # puffer for waiting for delayed messages (in timesteps) until the delay of the scores was observed
+        self.MIN_WAIT_PUFFER = 2 # puffer added to the observed delay of the scores (in timesteps)
+        self.DELAY_WEIGHT = 0.2 # weight of a newly observed delay in the delay estimate 
+        self.ABORT_MARGIN = 5 # evaluations are not aborted any more if less control ticks are left, as hardly any time would be saved
 
         self.maxAge = maxAge
         self.postEvalTime = postEvalTime
@@ -51,24 +79,54 @@ class GeneticPopulation:
         self.reEval = reEval 
         self.evals = evals 
         self.mutateRate = mutateRate
+        self.shadowPredictors = shadowPredictors
+        self.groups = groups
+        self.boundPeriod = boundPeriod
+        self.generations = [0] * groups # genomes distributed to each group so far, on a slave the genomes received so far 
+        self.scoreDelay = None # estimated time steps between the first and the last score of a generation, None until observed 
+        self.bounds = [{} for group in range(groups)] # latest reported (control tick, bound) per slave of each group 
+        self.shadowSeeds = [None] * groups # seeds of the shadow predictors of the mutants being evaluated, None if there are none
         
-        # first king and first mutant 
-        self.king = GeneticIndividual(amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, activationFunctionAction, activationFunctionPrediction)
-        self.mutant = self.king.mutate(self.mutateRate)
+        # first king and first mutants, *mutant* is the one of the first group
+        self.king = GeneticIndividual(amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, activationFunctionAction, activationFunctionPrediction, dtype=dtype)
+        self.mutants = [self.king.mutate(self.mutateRate) for group in range(groups)]
+        self.mutant = self.mutants[0]
         
         self.scoreKing = 0
         self.scoreTemp = None 
-        self.filename = "results/genomes" 
+        self.filename = controller.results + "/genomes" 
         self.POST_EVAL = 0 
         self.reevalWeightNew = reEvalWeight 
         
         self.controller = controller
         self.state = State.WAIT
+        self.farm = farm
+        self.farmEvaluation = None # id of the evaluation requested by the coordinator
+        self.genomeChannel = genomeChannel
+        self.recordMovie = recordMovie
+        self.channels = {} # genome channels created by the master per group, attached by a slave per name when notified of them
+        self.steadyState = SteadyState(steadyState) if steadyState > 0 else None
+        self.speculative = speculative
+        self.speculation = None # candidates sent ahead of time per branch ("win" or "lose"), on a slave with the likely branch and the verdict if it arrived early 
+        self.branch = None # branch a slave runs before the verdict arrived, None if its candidate is confirmed 
+        self.heldScore = None # score message of a slave that finished a branch before the verdict arrived 
 
         if self.controller.master:
-            self.evaluationScores = []
+            if self.farm is not None and (groups > 1 or self.steadyState is not None):
+                raise ValueError("an evaluation farm hands out one genome at a time, use its lambda instead of groups")
+            if speculative and (groups > 1 or self.steadyState is not None or self.farm is not None or boundPeriod > 0):
+                raise ValueError("speculative candidates require a single group evaluated in generations without aborts")
+            self.evaluationScores = [[] for group in range(groups)]
+            self.shadowScores = [[] for group in range(groups)]
             self.evalCount = 0 # how many genomes were evaluated so far 
-            self._distribute(self.mutant)
+            if self.farm is not None:
+                self._receive_farm()
+            elif self.steadyState is not None:
+                for group in range(groups):
+                    self._request(group)
+            else:
+                for group in range(groups):
+                    self._distribute(self.mutants[group], group)
             self.controller.robot.simulationSetMode(Supervisor.SIMULATION_MODE_FAST) 
  
     def set_evaluation_listener(self, listener):
@@ -94,83 +152,308 @@ class GeneticPopulation:
         return action, pred
 
     def _evaluate_master(self):
-        """ evaluates the mutant tested on all slaves and maybe kills the king """
+        """ evaluates the mutants tested on the slaves of all groups and maybe kills the king """
         
-        # calculate total score 
-        self.scoreMutant = sum(self.evaluationScores) / len(self.evaluationScores)
+        # in the post-evaluation all groups test the king, so their scores are pooled 
+        if self.POST_EVAL:
+            self.evaluationScores = [sum(self.evaluationScores, [])] + [[] for group in range(1, self.groups)]
+
+        # calculate total score of each group's mutant, groups without scores are left out 
+        candidates = []
+        for group in range(self.groups):
+            if len(self.evaluationScores[group]) > 0:
+                self.scoreMutant = sum(self.evaluationScores[group]) / len(self.evaluationScores[group])
+                shadowSelected = self._select_shadow(self.mutants[group], self.shadowSeeds[group], self.shadowScores[group])
+                candidates.append((group, self.scoreMutant, shadowSelected))
+
+        # the coordinator selects, a better shadow predictor is returned as part of the genome 
+        if self.farm is not None:
+            self.evaluationScores = [[]]
+            if not candidates: # no slave reported a score, the candidate is evaluated again 
+                self.shadowScores = [[]]
+                self._distribute(self.mutant, 0)
+                return
+            group, score, shadowSelected = candidates[0]
+            self.farm.send(("score", self.farmEvaluation, score, self.mutant.toGenome().copy() if shadowSelected else None))
+            self.shadowScores = [[]]
+            self._receive_farm()
+            return
         
-        # calculate score for re-evaluation case 
-        if self.scoreTemp is not None:
-            self.scoreMutant = self.reevalWeightNew * self.scoreMutant + (1.0 - self.reevalWeightNew) * self.scoreTemp 
-
-        #print("score of mutant: " + str(self.scoreMutant) + " | score of old king: " + str(self.scoreKing))
-        # log scores 
-        if self.evaluation_listener:
-            self.evaluation_listener(self.scoreKing, self.scoreMutant)
+        best = None
+        for group, scoreMutant, shadowSelected in candidates:
+            # calculate score for re-evaluation case, only the first group re-evaluates the king 
+            if group == 0 and self.scoreTemp is not None:
+                scoreMutant = self.reevalWeightNew * scoreMutant + (1.0 - self.reevalWeightNew) * self.scoreTemp 
+
+            #print("score of mutant: " + str(scoreMutant) + " | score of old king: " + str(self.scoreKing))
+            # log scores 
+            if self.evaluation_listener:
+                self.evaluation_listener(self.scoreKing, scoreMutant)
+            if best is None or scoreMutant > best[1]:
+                best = (group, scoreMutant)
         
-        # mutant replaces current king 
-        if self.scoreMutant >= self.scoreKing:
-            self.king = self.mutant
-            self.scoreKing = self.scoreMutant
+        # best mutant replaces current king 
+        won = best is not None and best[1] >= self.scoreKing
+        if won:
+            self.king = self.mutants[best[0]]
+            self.scoreKing = best[1]
             # store/print genome
             line = ",".join(str(x) for x in self.king.actionNetwork.toGenome())
             write_csv(self.filename, line)
             line = ",".join(str(x) for x in self.king.predictionNetwork.toGenome()) + str("\n")
             write_csv(self.filename, line) 
              
-        self.evaluationScores = []
+        self.evaluationScores = [[] for group in range(self.groups)]
+        self.shadowScores = [[] for group in range(self.groups)]
+
+        # the post-evaluation is over 
+        if self.POST_EVAL:
+            if self.recordMovie:
+                self.controller.robot.movieStopRecording() # stop everything 
+            self._stop()
+            return
         
+        # the slaves already run the candidate sent ahead of time for this outcome, which was drawn like the next candidate below 
+        # unless the winner took over a shadow predictor, then the candidates of the winner are outdated and a new one is sent 
+        speculation, branch = self.speculation, "win" if won else "lose"
+        self.speculation = None
+        if won and any(shadowSelected for group, scoreMutant, shadowSelected in candidates):
+            speculation = None
+
         # re-evalate with a chance of reEval percent 
-        if random.random() < self.reEval: 
-            self.mutant = self.king
-            self.mutant.reset()             
+        if (speculation["reEvaluate"] if speculation is not None else random.random() < self.reEval): 
+            self.mutants[0] = self.king
+            self.king.reset()             
             self.scoreTemp = self.scoreKing             
             self.scoreKing = -1 
         
         else:
-            self.mutant = self.king.mutate(self.mutateRate)
+            self.mutants[0] = speculation[branch][0] if speculation is not None else self.king.mutate(self.mutateRate)
             self.scoreTemp = None  
+        self.mutants[1:] = [self.king.mutate(self.mutateRate) for group in range(1, self.groups)]
             
         # POST EVALUATION  
-        if self.evalCount == self.evals:
-            self.mutant = self.king
-            self.mutant.reset()     
-            self.scoreKing = -1 
-            self.scoreTemp = None # don't calculate mixed score 
-            self.maxAge = self.postEvalTime # extend period for re-eval / video 
-            self.POST_EVAL = 1 
-            
-            # reposition robots to new initial positions 
-            self.controller.reposition_robots()
-            
-            # START VIDEO
-            movie = 'results/run.mp4'
-            self.controller.robot.simulationSetMode(Supervisor.SIMULATION_MODE_REAL_TIME)
-            self.controller.robot.movieStartRecording(movie, 800, 600, 0, 100, 1, False) # start recording of video 
+        if self.evalCount >= self.evals:
+            self._start_post_evaluation()
         
-        if self.evalCount != self.evals+1:   
-            self._distribute(self.mutant) 
-        else:           
-            self.controller.robot.movieStopRecording() # stop everything 
-            self.state = State.STOP                             
+        self.mutant = self.mutants[0]
+        if speculation is not None:
+            self._distribute(self.mutant, 0, (branch, speculation[branch][1]))
+            return
+        for group in range(self.groups):
+            self._distribute(self.mutants[group], group) 
+
+    def _start_post_evaluation(self):
+        """ makes all groups test the king for the length of the post-evaluation, the genomes still have to be distributed """
+        self.mutants = [self.king] * self.groups
+        self.king.reset()     
+        self.scoreKing = -1 
+        self.scoreTemp = None # don't calculate mixed score 
+        self.maxAge = self.postEvalTime # extend period for re-eval / video 
+        self.POST_EVAL = 1 
         
-    def _distribute(self, individual):
-        """ sends a genetic individual encoded via genome to slaves """
+        # reposition robots to new initial positions 
+        self.controller.reposition_robots()
+        
+        # START VIDEO, otherwise the post-evaluation stays fast and the logged trajectory can be rendered offline (see render_trajectory.py)
+        if self.recordMovie:
+            movie = self.controller.results + '/run.mp4'
+            self.controller.robot.simulationSetMode(Supervisor.SIMULATION_MODE_REAL_TIME)
+            self.controller.robot.movieStartRecording(movie, 800, 600, 0, 100, 1, False) # start recording of video 
+
+    def _request(self, group):
+        """ hands the next candidate to the idle slave of the given group in the steady-state mode, leaves it idle once all evaluations were handed out """
+        candidate = self.steadyState.open()
+        if candidate is None:
+            if self.evalCount >= self.evals:
+                return
+
+            # re-evaluate the king with a chance of reEval percent, unless it was not evaluated yet or is already being re-evaluated 
+            reEvaluating = any(candidate.individual is self.king for candidate in self.steadyState.candidates.values())
+            if random.random() < self.reEval and self.steadyState.finished > 0 and not reEvaluating:
+                candidate = self.steadyState.add(self.king, None, self.scoreKing)
+            else:
+                shadowSeed = random.randrange(2**31) if self.shadowPredictors > 0 else None
+                candidate = self.steadyState.add(self.king.mutate(self.mutateRate), shadowSeed)
+            self.evalCount += 1
+
+        self.steadyState.assign(group, candidate)
+        self.generations[group] += 1
+        self.mutants[group] = candidate.individual
+        self.shadowSeeds[group] = candidate.shadowSeed
+        self._send(candidate.individual, group, candidate.shadowSeed)
+
+    def _evaluate_candidate(self, candidate):
+        """ evaluates a candidate of the steady-state mode whose scores all arrived and maybe kills the king """
+        self.scoreMutant = sum(candidate.scores) / len(candidate.scores)
+        self._select_shadow(candidate.individual, candidate.shadowSeed, candidate.shadowScores)
+
+        # a re-evaluated king that is still king gets the mixed score, otherwise the mixed score competes like the score of a mutant 
+        scoreKing = self.scoreKing
+        if candidate.scoreTemp is not None:
+            self.scoreMutant = self.reevalWeightNew * self.scoreMutant + (1.0 - self.reevalWeightNew) * candidate.scoreTemp 
+            if candidate.individual is self.king:
+                scoreKing = -1
+
+        # log scores 
+        if self.evaluation_listener:
+            self.evaluation_listener(scoreKing, self.scoreMutant)
+
+        # candidate replaces current king 
+        if self.scoreMutant >= scoreKing:
+            self.king = candidate.individual
+            self.scoreKing = self.scoreMutant
+            # store/print genome
+            line = ",".join(str(x) for x in self.king.actionNetwork.toGenome())
+            write_csv(self.filename, line)
+            line = ",".join(str(x) for x in self.king.predictionNetwork.toGenome()) + str("\n")
+            write_csv(self.filename, line) 
 
-        genomeAction = individual.actionNetwork.toGenome()
-        genomePrediction = individual.predictionNetwork.toGenome()
+    def _execute_steady_state(self):
+        """ collects the scores of the slaves, evaluates candidates whose scores all arrived and hands the next candidates to the idle slaves """
+        msg = self.controller.receive()
+        while msg is not None:
+            received = struct.unpack(str(len(msg) // 8) + "d", msg)
+            group = int(received[1])
+            if received[0] == SCORE and received[2] == self.generations[group]:
+                candidate = self.steadyState.report(group, received[3], received[4:] if len(received) > 4 else None)
+                if candidate is not None:
+                    self._evaluate_candidate(candidate)
+                self._request(group)
+            msg = self.controller.receive()
 
-        listAction = [str(x) for x in genomeAction]
-        listPrediction = [str(x) for x in genomePrediction]
+        # POST EVALUATION once all evaluations are done, all groups test the king at the same time 
+        if self.evalCount >= self.evals and len(self.steadyState.running) == 0:
+            self._start_post_evaluation()
+            self.mutant = self.king
+            for group in range(self.groups):
+                self._distribute(self.king, group)
         
-        msg = str(self.POST_EVAL) + "####" + "@".join(listAction) + "####" + "@".join(listPrediction)
-        self.controller.emit(struct.pack("10000s", msg.encode("utf-8")))
+    def _select_shadow(self, mutant, shadowSeed, shadowScores):
+        """ replaces the prediction network of the mutant by the best shadow predictor if that one scored higher than *scoreMutant*, returns True iff it was replaced
+
+        Arguments:
+        mutant -- the evaluated mutant
+        shadowSeed -- seed of the shadow predictors distributed with the mutant, None if there are none
+        shadowScores -- scores of the shadow predictors reported by each slave
+
+        """
+        if shadowSeed is None or len(shadowScores) == 0:
+            return False
+
+        scores = numpy.mean(shadowScores, axis=0)
+        best = int(numpy.argmax(scores))
+        if scores[best] > self.scoreMutant:
+            # the mutant still has the distributed genome, so the same shadow genomes as on the slaves are derived from the seed
+            mutant.predictionNetwork.fromGenome(mutant.shadowGenomes(len(scores), self.mutateRate, shadowSeed)[best])
+            self.scoreMutant = scores[best]
+            return True
+        return False
+
+    def _receive_farm(self):
+        """ waits for the next genome of the coordinator and distributes it to the slaves, quits the simulation when the coordinator stops """
+        msg = self.farm.recv()
+        if msg[0] == "stop":
+            self.farm.close()
+            self._stop()
+            self.controller.robot.simulationQuit(0)
+            return
+
+        king = self.king
+        self.farmEvaluation = msg[1]
+        self.mutant = GeneticIndividual(king.amountSensors, king.amountActions, king.amountHiddenAction, king.amountHiddenPrediction,
+                                        king.activationFunctionAction, king.activationFunctionPrediction, msg[2], king.dtype)
+        self.mutants = [self.mutant]
+        self._distribute(self.mutant, 0)
+
+    def _stop(self):
+        """ stops the run and removes the genome channel """
+        self.close()
+        self.state = State.STOP
+
+    def close(self):
+        """ releases the genome channels, removing them on the master """
+        for channel in self.channels.values():
+            channel.close()
+        self.channels = {}
+
+    def _distribute(self, individual, group, verdict=None):
+        """ sends a genetic individual encoded via genome to the slaves of the given group
+
+        Arguments:
+        individual -- the genetic individual
+        group -- the group of slaves
+        verdict -- branch and shadow seed if the slaves already got the individual ahead of time, only the branch is sent then
+
+        """
+
+        # shadow predictors are only searched for new mutants, not for re-evaluated kings or in the post-evaluation
+        shadowSeed = None
+        if verdict is not None:
+            shadowSeed = verdict[1]
+        elif self.shadowPredictors > 0 and not (group == 0 and self.scoreTemp is not None) and not self.POST_EVAL:
+            shadowSeed = random.randrange(2**31)
+        self.shadowSeeds[group] = shadowSeed
+        self.generations[group] += 1
+        self.bounds[group] = {}
+        if verdict is not None:
+            self.controller.emit((VERDICT + "####" + verdict[0]).encode("utf-8"), group)
+        else:
+            self._send(individual, group, shadowSeed)
         
         # increase quantity of evaluated genomes 
         self.evalCount += 1 
 
         #print("sent genome")
         self.state = State.WAIT
+
+        if self.speculative:
+            self._speculate()
+
+    def _speculate(self):
+        """ sends the candidates that may follow the mutant ahead of time: a mutant of the king if the mutant loses and a mutant of the mutant if it wins
+
+        Whether the king is re-evaluated next is drawn here already, then the candidates are the king and the mutant themselves.
+        The slaves derive the candidate of the mutant from the mutant's genome and the genes that differ, so only these are sent.
+        The slaves start the likely branch as soon as they finished the mutant, the verdict tells them which one to keep (see *_receive_verdict*).
+
+        """
+        if self.POST_EVAL or self.evalCount >= self.evals:
+            return # the post-evaluation follows
+
+        reEvaluate = random.random() < self.reEval
+        self.speculation = {"reEvaluate": reEvaluate}
+        for branch, parent in (("lose", self.king), ("win", self.mutant)):
+            shadowSeed = random.randrange(2**31) if self.shadowPredictors > 0 and not reEvaluate else None
+            self.speculation[branch] = (parent if reEvaluate else parent.mutate(self.mutateRate), shadowSeed)
+
+        # the first mutant and re-evaluated kings always win, other mutants mostly lose 
+        likely = "win" if self.scoreKing <= 0 else "lose"
+        lose, loseSeed = self.speculation["lose"]
+        win, winSeed = self.speculation["win"]
+        genes = numpy.flatnonzero(win.toGenome() != self.mutant.toGenome())
+        msg = "####".join([SPECULATION, likely, str(loseSeed) if loseSeed is not None else "-", "@".join(str(x) for x in lose.toGenome()),
+                           str(winSeed) if winSeed is not None else "-", "@".join(str(x) for x in genes), "@".join(str(x) for x in win.toGenome()[genes])])
+        self.controller.emit(msg.encode("utf-8"))
+
+    def _send(self, individual, group, shadowSeed):
+        """ sends the genome of a genetic individual and the seed of its shadow predictors to the slaves of the given group """
+
+        if self.genomeChannel:
+            # the genome is copied into shared memory, the slaves are only notified 
+            if group not in self.channels:
+                self.channels[group] = GenomeChannel.create(individual.toGenome().size, individual.dtype)
+            sequence = self.channels[group].publish(individual.toGenome(), self.POST_EVAL, shadowSeed)
+            self.controller.emit(self.channels[group].notification(sequence), group)
+        else:
+            genomeAction = individual.actionNetwork.toGenome()
+            genomePrediction = individual.predictionNetwork.toGenome()
+
+            listAction = [str(x) for x in genomeAction]
+            listPrediction = [str(x) for x in genomePrediction]
+
+            msg = str(self.POST_EVAL) + "####" + "@".join(listAction) + "####" + "@".join(listPrediction) + "####" + (str(shadowSeed) if shadowSeed is not None else "-")
+            self.controller.emit(struct.pack("10000s", msg.encode("utf-8")), group)
         
 
     def _evaluate_slave(self, lastSensor):
@@ -179,70 +462,254 @@ class GeneticPopulation:
         self.mutant.storeSensor(lastSensor)
         self.scoreMutant = self.mutant.evaluate()
 
-        self.controller.emit(struct.pack("d",self.scoreMutant)) # double 
+        # the slave's group and generation, the score of the mutant and the scores of its shadow predictors 
+        scores = [SCORE, self.controller.group, self.generations[0], self.scoreMutant]
+        if self.mutant.shadowBank is not None:
+            scores += list(self.mutant.evaluateShadows())
+        msg = struct.pack(str(len(scores)) + "d", *scores) # doubles 
 
         self.state = State.WAIT
 
+        if self.branch is not None:
+            self.heldScore = msg # the score of a speculative candidate only counts if the verdict confirms it 
+        else:
+            self.controller.emit(msg)
+            if self.speculation is not None:
+                self._start_branch(self.speculation["verdict"] or self.speculation["likely"])
+
+    def _report_bound(self):
+        """ sends the upper bound of the mutant's final score to the master, tagged with the generation of the genome so the master can drop outdated bounds """
+        bound = [BOUND, self.controller.group, self.controller.number, self.generations[0], self.time, self.mutant.scoreBound(self.maxAge)]
+        self.controller.emit(struct.pack(str(len(bound)) + "d", *bound))
+
+    def _abort(self):
+        """ aborts the evaluations of all groups if every slave reported a bound and no group's mutant can reach the score of the king anymore
+
+        The mutants are evaluated with the mean of their bounds, which is logged as their score.
+
+        """
+        if self.POST_EVAL or self.farm is not None or self.steadyState is not None:
+            return
+        for group in range(self.groups):
+            bounds = self.bounds[group].values()
+            if len(bounds) < self.controller.groupSizes[group] or max(tick for tick, bound in bounds) + self.ABORT_MARGIN >= self.maxAge:
+                return
+            if sum(bound for tick, bound in bounds) / len(bounds) >= self.scoreKing:
+                return
+
+        for group in range(self.groups):
+            self.controller.emit(ABORT, group)
+            self.evaluationScores[group] = [bound for tick, bound in self.bounds[group].values()]
+            self.shadowScores[group] = []
+        self._evaluate_master()
+
+    def _receive(self, msg):
+        """ handles a message of the master on a slave: a genome, the candidates sent ahead of time or the verdict on them """
+        if msg.startswith(SPECULATION.encode("utf-8")):
+            self._receive_speculation(msg)
+        elif msg.startswith(VERDICT.encode("utf-8")):
+            self._receive_verdict(msg.decode("utf-8").split("####")[1])
+        else:
+            # a genome replaces all candidates sent ahead of time 
+            if self.branch is not None:
+                self.generations[0] -= 1 # the genome replaces the branch started for the same generation
+            self.branch = None
+            self.speculation = None
+            self.heldScore = None
+            self._receive_genome(msg)
+
+    def _receive_speculation(self, msg):
+        """ stores the candidates of both branches sent ahead of time, a slave that already waits starts the likely one """
+        [prefix, likely, loseSeed, lose, winSeed, genes, values] = msg.decode("utf-8").split("####")
+        if self.speculation is not None and self.speculation["verdict"] is not None:
+            self._start_branch(self.speculation["verdict"]) # the master evaluated without this slave, which catches up with the others
+        win = self.mutant.toGenome().copy() # sent as difference to the genome the slave runs 
+        win[[int(x) for x in genes.split("@") if x]] = [float(x) for x in values.split("@") if x]
+        self.speculation = {"likely": likely, "verdict": None,
+                            "lose": (numpy.array([float(x) for x in lose.split("@")]), int(loseSeed) if loseSeed != "-" else None),
+                            "win": (win, int(winSeed) if winSeed != "-" else None)}
+        if self.state == State.WAIT:
+            self._start_branch(likely)
+
+    def _receive_verdict(self, branch):
+        """ keeps the branch a slave runs ahead of time if the verdict confirms it and switches to the other one otherwise
+
+        If the slave still runs the evaluated mutant, the branch of the verdict is started as soon as it finished.
+
+        """
+        if self.branch is None:
+            self.speculation["verdict"] = branch
+        elif self.branch == branch:
+            self.branch = None
+            self.speculation = None
+            if self.heldScore is not None:
+                self.controller.emit(self.heldScore)
+                self.heldScore = None
+        else:
+            self.heldScore = None
+            self._start_branch(branch)
+
+    def _start_branch(self, branch):
+        """ restarts the slave with the candidate of the given branch, which is confirmed if the verdict already arrived """
+        genome, shadowSeed = self.speculation[branch]
+        self.mutant.toGenome()[:] = genome
+        if self.mutant.actionNetwork.cache is not None:
+            self.mutant.actionNetwork.cache.clear() # the genome buffer was overwritten without *fromGenome*
+
+        if self.branch is not None:
+            self.generations[0] -= 1 # the other branch was started for the same generation
+        if self.speculation["verdict"] is not None or self.branch is not None: # a switch follows the verdict as well
+            self.branch = None
+            self.speculation = None
+        else:
+            self.branch = branch
+        self._restart(0, shadowSeed)
+
     def _receive_genome(self, msg):
         """ called when the slave received a genome and restarts the slave using this genome """
 
         #print("received genome")
-        received = struct.unpack("10000s", msg)[0].decode("utf-8").rstrip("\x00")
-        # update post eval flag and genome 
-        [flag, listAction, listPrediction] = received.split("####")
-        
+        notification = parse_notification(msg)
+        if notification is not None:
+            # copy the genome published by the master straight into the genome buffer of the mutant 
+            if notification[0] not in self.channels:
+                self.channels[notification[0]] = GenomeChannel.attach(notification[0], self.mutant.dtype)
+            sequence, flag, shadowSeed = self.channels[notification[0]].read(self.mutant.toGenome())
+            if self.mutant.actionNetwork.cache is not None:
+                self.mutant.actionNetwork.cache.clear() # the genome buffer was overwritten without *fromGenome*
+        else:
+            received = struct.unpack("10000s", msg)[0].decode("utf-8").rstrip("\x00")
+            # update post eval flag and genome 
+            [flag, listAction, listPrediction, shadowSeed] = received.split("####")
+            shadowSeed = int(shadowSeed) if shadowSeed != "-" else None
+
+            genomeAction = listAction.split("@")
+            genomeAction = [float(x) for x in genomeAction]
+            genomePrediction = listPrediction.split("@")
+            genomePrediction = [float(x) for x in genomePrediction]
+
+            self.mutant.actionNetwork.fromGenome(numpy.array(genomeAction))
+            self.mutant.predictionNetwork.fromGenome(numpy.array(genomePrediction))
+
+        self._restart(int(flag), shadowSeed)
+
+    def _restart(self, flag, shadowSeed):
+        """ restarts the evaluation on a slave after a new genome was copied into the mutant
+
+        Arguments:
+        flag -- post-evaluation flag
+        shadowSeed -- seed of the shadow predictors, None if there are none
+
+        """
+        self.generations[0] += 1
+
         # update time for post-evaluation 
-        self.POST_EVAL = int(flag)
+        self.POST_EVAL = flag
         if self.POST_EVAL:
             self.maxAge = self.postEvalTime
-            
-        genomeAction = listAction.split("@")
-        genomeAction = [float(x) for x in genomeAction]
-        genomePrediction = listPrediction.split("@")
-        genomePrediction = [float(x) for x in genomePrediction]
 
-        self.mutant.actionNetwork.fromGenome(numpy.array(genomeAction))
-        self.mutant.predictionNetwork.fromGenome(numpy.array(genomePrediction))
+        # derive the shadow predictors from the received genome 
+        if shadowSeed is not None:
+            self.mutant.setShadowPredictors(self.mutant.shadowGenomes(self.shadowPredictors, self.mutateRate, shadowSeed))
+        else:
+            self.mutant.setShadowPredictors(None)
         self.mutant.reset()
 
         self.time = -1
         self.state = State.RUN
 
     def execute_master(self):
-        """ evaluates the mutant when max age is reached """
+        """ evaluates the mutant as soon as the scores of all slaves arrived or aborts it when it cannot beat the king anymore
 
-        if self.state == State.WAIT or self.state == State.WAIT_PUFFER:
+        Missing scores are waited for twice the usual delay of the scores, before the delay was observed for *MASTER_WAIT_PUFFER* time steps.
 
-            msg = self.controller.receive()
+        """
 
-            if msg is not None:
-                # received first score of a mutant
+        if self.steadyState is not None and not self.POST_EVAL:
+            self._execute_steady_state()
 
-                received = struct.unpack("d",msg)[0]
-                self.evaluationScores.append(received)
-                self.execute_master() # collect all scores received in this timestep 
-                self.time = 0
-                self.state = State.WAIT_PUFFER # wait for delayed scores
+        elif self.state == State.WAIT or self.state == State.WAIT_PUFFER:
 
-            elif self.state == State.WAIT_PUFFER:
+            # collect all scores and bounds received in this timestep, packets of earlier generations may still arrive 
+            scored = False
+            msg = self.controller.receive()
+            while msg is not None:
+                received = struct.unpack(str(len(msg) // 8) + "d", msg)
+                group = int(received[1])
+                if received[0] == BOUND:
+                    robot, generation, tick, bound = received[2:]
+                    if generation == self.generations[group]:
+                        self.bounds[group][robot] = (tick, bound)
+                elif received[2] == self.generations[group]:
+                    self.evaluationScores[group].append(received[3])
+                    if len(received) > 4:
+                        self.shadowScores[group].append(received[4:])
+                    scored = True
+                msg = self.controller.receive()
+
+            if scored and self.state == State.WAIT:
+                # received first score of the generation 
+                self.time = 0
+                self.state = State.WAIT_PUFFER # wait for the remaining scores 
 
-                self.time = self.time + 1
+            if self.state == State.WAIT_PUFFER:
 
-                if self.time > self.MASTER_WAIT_PUFFER:
+                if all(len(self.evaluationScores[group]) >= self.controller.groupSizes[group] for group in range(self.groups)):
+                    # all scores arrived, their delay adapts the puffer 
+                    delay = self.time if self.scoreDelay is None else self.DELAY_WEIGHT * self.time + (1.0 - self.DELAY_WEIGHT) * self.scoreDelay
+                    self.scoreDelay = delay
                     self._evaluate_master() # evaluate the mutant
+
+                else:
+
+                    self.time = self.time + 1
+
+                    if self.time > self._wait_puffer():
+                        self._evaluate_master() # evaluate the mutant without the missing scores
+
+            elif self.boundPeriod > 0:
+                self._abort()
                 
+    def _wait_puffer(self):
+        """ returns the time steps the master waits for missing scores after the first score of a generation arrived """
+        if self.scoreDelay is None:
+            return self.MASTER_WAIT_PUFFER
+        return int(2 * self.scoreDelay) + self.MIN_WAIT_PUFFER
 
     def execute_slave(self, sensor):
-        """ calculates an action and evaluates the mutant when max age is reached """
+        """ calculates an action and evaluates the mutant when max age is reached
+
+        With overlapped steps (see *evolution_multiple.run_controller*) the action is applied one time step after the sensor values were measured,
+        so the prediction of the next sensor values spans an additional time step.
+
+        """
         
         if self.state == State.WAIT:
 
             msg = self.controller.receive()
 
+            if msg is not None and msg != ABORT: # an abort may arrive after the evaluation ended
+                self._receive(msg)
+            if self.state == State.WAIT:
+                return None, None # abort and keep waiting
+
+        elif self.speculative:
+
+            # the verdict and the next candidates arrive during the evaluation 
+            msg = self.controller.receive()
             if msg is not None:
+                self._receive(msg)
+
+        elif self.boundPeriod > 0 and not self.POST_EVAL:
+
+            msg = self.controller.receive()
+
+            if msg == ABORT:
+                self.time = -1
+                self.state = State.WAIT
+                return None, None # abort and wait for the next genome 
+            elif msg is not None:
                 self._receive_genome(msg)
-            else:
-                return None, None # abort and keep waiting
 
         self.time = self.time + 1
 
@@ -252,4 +719,6 @@ class GeneticPopulation:
             return None, None # abort and start waiting 
 
         action,pred = self._feed(sensor)
+        if self.boundPeriod > 0 and not self.POST_EVAL and self.time > 0 and self.time % self.boundPeriod == 0:
+            self._report_bound()
         return action, pred
@@ -0,0 +1,99 @@
+import os
+import time
+import numpy
+from multiprocessing import shared_memory, resource_tracker
+
+HEADER = 4 # sequence counter, post-evaluation flag, shadow seed + 1 (0 if none), genome length
+PREFIX = "SHM" # prefix of notifications, genome messages start with the post-evaluation flag
+RETRIES = 1000 # attempts of a reader to get a consistent copy before giving up
+
+_created = set() # names of the blocks created by this process, which is tracked once for all its channels
+
+
+class GenomeChannel:
+    """ shared memory block through which the master hands genomes to the slaves running on the same host
+
+    The block holds a header of unsigned 64 bit integers followed by the genome. The header's sequence counter works as a seqlock:
+    the writer makes it odd before and even again after copying a genome, so a reader retries if the counter was odd or changed while it copied.
+    The emitter only carries a short notification with the block's name and the sequence counter (see *notification*).
+
+    Usage:
+    The master creates the channel with *create*, calls *publish* and emits *notification*.
+    A slave attaches with the name of the first notification and calls *read* on every notification.
+
+    """
+
+    def __init__(self, memory, owner, dtype):
+        self.memory = memory
+        self.owner = owner
+        self.dtype = numpy.dtype(dtype)
+        self.header = numpy.ndarray((HEADER,), numpy.uint64, memory.buf)
+        self.genome = numpy.ndarray(((memory.size - HEADER * 8) // self.dtype.itemsize,), self.dtype, memory.buf, HEADER * 8)
+
+    @classmethod
+    def create(cls, length, dtype=numpy.float64):
+        """ creates a new block for genomes of the given length """
+        name = "thymio_" + str(os.getpid()) + "_" + str(time.time_ns() % 10**9)
+        memory = shared_memory.SharedMemory(name, create=True, size=HEADER * 8 + length * numpy.dtype(dtype).itemsize)
+        _created.add(memory.name)
+        channel = cls(memory, True, dtype)
+        channel.header[:] = 0
+        return channel
+
+    @classmethod
+    def attach(cls, name, dtype=numpy.float64):
+        """ maps the block of the given name, which stays owned by its creator """
+        try:
+            memory = shared_memory.SharedMemory(name, track=False)
+        except TypeError: # before Python 3.13 every attached block is tracked and would be unlinked when this process ends
+            memory = shared_memory.SharedMemory(name)
+            if name not in _created:
+                resource_tracker.unregister(memory._name, "shared_memory")
+        return cls(memory, False, dtype)
+
+    def publish(self, genome, flag, shadowSeed=None):
+        """ copies the genome into the block and returns the new sequence counter
+
+        Arguments:
+        genome -- genome of the individual, at most as long as the block
+        flag -- post-evaluation flag
+        shadowSeed -- seed of the shadow predictors, None if there are none
+
+        """
+        sequence = int(self.header[0])
+        self.header[0] = sequence + 1
+        self.genome[:len(genome)] = genome
+        self.header[1:] = flag, 0 if shadowSeed is None else shadowSeed + 1, len(genome)
+        self.header[0] = sequence + 2
+        return sequence + 2
+
+    def read(self, out):
+        """ copies the current genome into *out* and returns its sequence counter, post-evaluation flag and shadow seed (None if there are none) """
+        for attempt in range(RETRIES):
+            sequence = int(self.header[0])
+            if sequence % 2 == 0:
+                flag, seed, length = (int(x) for x in self.header[1:])
+                out[:] = self.genome[:length]
+                if int(self.header[0]) == sequence:
+                    return sequence, flag, seed - 1 if seed > 0 else None
+
+        raise RuntimeError("genome channel " + self.memory.name + " is written continuously")
+
+    def notification(self, sequence):
+        """ returns the message announcing the genome with the given sequence counter """
+        return (PREFIX + "####" + self.memory.name + "####" + str(sequence)).encode("utf-8")
+
+    def close(self):
+        """ unmaps the block and removes it if this channel created it """
+        del self.header, self.genome # views have to be released before the block is closed
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def parse_notification(msg):
+    """ returns the name of the block and the sequence counter of a notification, None if the message is no notification """
+    if not msg.startswith(PREFIX.encode("utf-8")):
+        return None
+    [prefix, name, sequence] = msg.decode("utf-8").split("####")
+    return name, int(sequence)
@@ -0,0 +1,36 @@
+import unittest
+import numpy
+from genome_channel import *
+from webots_emulation_test import evolve
+
+class TestGenomeChannel(unittest.TestCase):
+
+    def test_channel(self):
+        master = GenomeChannel.create(5)
+        slave = GenomeChannel.attach(master.memory.name)
+        genome = numpy.arange(5.0)
+        out = numpy.zeros(5)
+
+        sequence = master.publish(genome, 0, 7)
+        self.assertEqual(slave.read(out), (sequence, 0, 7))
+        numpy.testing.assert_array_equal(out, genome)
+
+        sequence = master.publish(genome[::-1], 1)
+        self.assertEqual(slave.read(out), (sequence, 1, None))
+        numpy.testing.assert_array_equal(out, genome[::-1])
+        self.assertEqual(parse_notification(master.notification(sequence)), (master.memory.name, sequence))
+        self.assertIsNone(parse_notification(b"0####1@2####3@4####-"))
+
+        master.header[0] += 1 # a writer stuck in the middle of copying
+        self.assertRaises(RuntimeError, slave.read, out)
+        slave.close()
+        master.close()
+
+    def test_run(self):
+        world, steps, lines, trajectory, predictions = evolve(genomeChannel=True)
+        self.assertEqual(world.quit, 1)
+        self.assertEqual(len(lines), 1 + 4, "one line per evaluation and the post-evaluation")
+
+
+if __name__ == '__main__':
+    unittest.main()
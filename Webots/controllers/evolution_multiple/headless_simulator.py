@@ -0,0 +1,289 @@
+"""
+Minimize Surprise - headless swarm simulator
+
+Two dimensional kinematic simulation of a swarm of Thymios in the arenas of the thymio2_arena_without_walls_TENRobots_* worlds.
+It replaces Webots as evaluation backend when many evaluations are needed fast: the state of the whole swarm is kept in arrays
+(positions, headings, wheel speeds and raw sensor values) and every time step is a handful of numpy operations for all robots.
+
+The floor is centred at the origin, a robot with heading 0 drives along the x axis and headings increase counterclockwise.
+A position (x, y) and heading a correspond to the Webots translation [x, 0, -y] and rotation [0, 1, 0, a].
+
+Model:
+- differential drive kinematics of the Thymio with the motor velocities in rad/s, integrated once per time step
+- robots are discs that cannot overlap and are kept on the arena by the low walls surrounding the floor
+- horizontal proximity sensors are rays that detect other robots linearly from MAX_HORIZONTAL_SENSOR at contact to 0 at SENSOR_RANGE,
+  the low walls are invisible to them like in Webots
+- ground sensors read GROUND_FLOOR on the floor and 0 beyond its edge
+
+Usage:
+python3 headless_simulator.py [robots] [evaluations]
+runs a 1+1 evolution like the master and prints the scores of king and mutant.
+"""
+
+import sys
+import random
+import numpy
+from action_network import ActionNetworkBank
+from prediction_network import PredictionNetworkBank
+from genetic_individual import GeneticIndividual
+from placement import random_poses
+from activation import sigmoid_stable, tanh
+
+# same values as in evolution_multiple.py
+TIME_STEP = 0.01 # basicTimeStep of the worlds in s
+MAX_SPEED = 6 # rad/s
+MAX_HORIZONTAL_SENSOR = 4500.0
+MAX_GROUND_SENSOR = 1100.0
+SENSOR_MAX = numpy.array([MAX_HORIZONTAL_SENSOR] * 7 + [MAX_GROUND_SENSOR] * 2) # normalization of the sensor vector
+SENSORS = 9
+ACTIONS = 2
+
+# Thymio geometry
+WHEEL_RADIUS = 0.021 # m
+AXLE_LENGTH = 0.0935 # m
+ROBOT_RADIUS = 0.055 # m, radius of the disc approximating the body
+SENSOR_ANGLES = numpy.array([0.69, 0.35, 0.0, -0.35, -0.69, numpy.pi - 0.35, -numpy.pi + 0.35]) # directions of the horizontal sensors relative to the heading
+SENSOR_RANGE = 0.1 # m, distance from the body at which the horizontal sensors read 0
+GROUND_SENSORS = numpy.array([[0.072, 0.0115], [0.072, -0.0115]]) # positions of the left and right ground sensor relative to the robot (forward, left)
+GROUND_FLOOR = 1000.0 # raw ground sensor value on the floor
+WALL_OFFSET = 0.12 # the walls stand this far beyond the edge of the floor
+DENSE_PAIRS = 64 # up to this amount of robots all pairs are compared instead of sorting the robots into a grid
+
+
+def hwp(motors, sensors):
+    """ applies the hardware protection of *Controller._hwp* to all robots at once and returns a boolean vector marking the stopped robots
+
+    Arguments:
+    motors -- (N, 2) array of motor values, the motors of stopped robots are set to 0 in place
+    sensors -- (N, 9) array of normalized sensor values
+
+    """
+    left = motors[:, 0]
+    right = motors[:, 1]
+    # straight drive or large turning radius, |(left+right)/(right-left)| >= 1
+    straight = numpy.abs(left + right) >= numpy.abs(right - left)
+    offEdge = numpy.any(sensors[:, 7:] < 0.01, axis=1)
+
+    forward = (left > 0) & (right > 0) & (numpy.any(sensors[:, :5] > 0.9, axis=1) | offEdge)
+    backward = (left < 0) & (right < 0) & (numpy.any(sensors[:, 5:7] > 0.9, axis=1) | offEdge)
+    stopped = straight & (forward | backward)
+
+    motors[stopped] = 0
+    return stopped
+
+
+class SwarmSimulator:
+    """ simulates a swarm of Thymios in an arena without walls
+
+    Usage:
+    Create a simulator with the amount of robots and the floor size, place the robots with *placeRandom* (or write *positions* and *headings*).
+    Then repeatedly read the normalized sensor values via *sense*, set the wheel speeds in *wheelSpeeds* and call *step*.
+
+    """
+
+    def __init__(self, amountRobots, arenaX, arenaY):
+        """ creates a swarm with all robots in the centre of the floor
+
+        Arguments:
+        amountRobots -- amount of robots
+        arenaX -- size of the floor along the x axis in m
+        arenaY -- size of the floor along the y axis in m
+
+        """
+        self.amountRobots = amountRobots
+        self.arenaX = arenaX
+        self.arenaY = arenaY
+
+        self.positions = numpy.zeros((amountRobots, 2))
+        self.headings = numpy.zeros(amountRobots)
+        self.wheelSpeeds = numpy.zeros((amountRobots, 2)) # left and right motor velocity in rad/s
+        self.rawSensors = numpy.zeros((amountRobots, SENSORS))
+        self.sensors = numpy.zeros((amountRobots, SENSORS)) # normalized like in control_slave
+        self.allPairs = numpy.nonzero(~numpy.eye(amountRobots, dtype=bool)) if amountRobots <= DENSE_PAIRS else None
+
+    def placeRandom(self, rng=random):
+        """ places the robots at random positions on the floor without overlaps and with random headings, like *createRandom*
+
+        Raises ValueError if the robots do not fit into the arena.
+
+        """
+        positions, headings = random_poses(self.amountRobots, self.arenaX - 2 * ROBOT_RADIUS, self.arenaY - 2 * ROBOT_RADIUS, 2 * ROBOT_RADIUS, rng)
+        self.positions[:] = [[x, -z] for x, y, z in positions] # Webots z is -y
+        self.headings[:] = headings
+
+    def sense(self):
+        """ updates and returns the normalized sensor values of all robots as (N, 9) array """
+        self.rawSensors[:, :7] = self._horizontal()
+        self.rawSensors[:, 7:] = self._ground()
+        numpy.divide(self.rawSensors, SENSOR_MAX, out=self.sensors)
+        return self.sensors
+
+    def _pairs(self, cutoff):
+        """ returns all ordered pairs of different robots closer than *cutoff*: both robot indices, the offsets between them and their distances
+
+        Large swarms are sorted into a grid of cells of size *cutoff*, so that only robots in neighbouring cells are compared.
+
+        """
+        if self.allPairs is not None:
+            robot, other = self.allPairs
+        else:
+            robot, other = self._gridPairs(cutoff)
+
+        delta = self.positions[other] - self.positions[robot]
+        distance = numpy.hypot(delta[:, 0], delta[:, 1])
+        close = (robot != other) & (distance < cutoff)
+        return robot[close], other[close], delta[close], distance[close]
+
+    def _gridPairs(self, cutoff):
+        """ returns the indices of all pairs of robots in the same or in neighbouring cells of a grid with cell size *cutoff*, including pairs of a robot with itself """
+        cells = numpy.floor(self.positions / cutoff).astype(numpy.int64)
+        cells -= cells.min(axis=0) - 1 # keeps the neighbours of all cells at non-negative coordinates
+        width = cells[:, 1].max() + 2
+        keys = cells[:, 0] * width + cells[:, 1]
+        order = numpy.argsort(keys, kind="stable")
+        sortedKeys = keys[order]
+
+        robots, others = [], []
+        for neighbour in (-width - 1, -width, -width + 1, -1, 0, 1, width - 1, width, width + 1):
+            start = numpy.searchsorted(sortedKeys, keys + neighbour, "left")
+            counts = numpy.searchsorted(sortedKeys, keys + neighbour, "right") - start
+            # all robots of the neighbouring cell for every robot
+            robots.append(numpy.repeat(numpy.arange(self.amountRobots), counts))
+            offsets = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+            others.append(order[numpy.repeat(start, counts) + offsets])
+        return numpy.concatenate(robots), numpy.concatenate(others)
+
+    def _horizontal(self):
+        """ returns the raw horizontal sensor values, only pairs of robots close enough to see each other are checked """
+        values = numpy.zeros((self.amountRobots, 7))
+        robot, other, delta, distance = self._pairs(3 * ROBOT_RADIUS + SENSOR_RANGE)
+        if robot.size == 0:
+            return values
+
+        # rays starting at the body of *robot*, intersected with the disc of *other*
+        angles = self.headings[robot, None] + SENSOR_ANGLES
+        directions = numpy.stack((numpy.cos(angles), numpy.sin(angles)), axis=2)
+        toOther = delta[:, None, :] - ROBOT_RADIUS * directions
+        along = numpy.sum(toOther * directions, axis=2)
+        offset = numpy.sum(toOther * toOther, axis=2) - ROBOT_RADIUS ** 2
+        discriminant = along ** 2 - offset
+
+        hit = (discriminant >= 0) & ((along > 0) | (offset < 0))
+        rayLength = numpy.where(offset < 0, 0, along - numpy.sqrt(numpy.maximum(discriminant, 0)))
+        reading = numpy.where(hit, MAX_HORIZONTAL_SENSOR * (1 - rayLength / SENSOR_RANGE), 0)
+        numpy.maximum.at(values, robot, numpy.clip(reading, 0, MAX_HORIZONTAL_SENSOR))
+        return values
+
+    def _ground(self):
+        """ returns the raw ground sensor values: GROUND_FLOOR above the floor, 0 beyond its edge """
+        cos = numpy.cos(self.headings)[:, None]
+        sin = numpy.sin(self.headings)[:, None]
+        x = self.positions[:, 0, None] + cos * GROUND_SENSORS[:, 0] - sin * GROUND_SENSORS[:, 1]
+        y = self.positions[:, 1, None] + sin * GROUND_SENSORS[:, 0] + cos * GROUND_SENSORS[:, 1]
+        onFloor = (numpy.abs(x) <= self.arenaX / 2) & (numpy.abs(y) <= self.arenaY / 2)
+        return numpy.where(onFloor, GROUND_FLOOR, 0.0)
+
+    def step(self):
+        """ moves all robots according to their wheel speeds for one time step, then resolves collisions """
+        speeds = self.wheelSpeeds * WHEEL_RADIUS
+        velocity = speeds.mean(axis=1)
+        rotation = (speeds[:, 1] - speeds[:, 0]) / AXLE_LENGTH
+
+        heading = self.headings + 0.5 * rotation * TIME_STEP # midpoint of the arc
+        self.positions[:, 0] += velocity * numpy.cos(heading) * TIME_STEP
+        self.positions[:, 1] += velocity * numpy.sin(heading) * TIME_STEP
+        self.headings += rotation * TIME_STEP
+
+        self._collide()
+
+    def _collide(self):
+        """ pushes overlapping robots apart and keeps all robots between the walls """
+        robot, other, delta, distance = self._pairs(2 * ROBOT_RADIUS)
+        if robot.size > 0:
+            overlap = 2 * ROBOT_RADIUS - distance
+            direction = delta / numpy.maximum(distance, 1e-9)[:, None]
+            numpy.add.at(self.positions, robot, -0.5 * overlap[:, None] * direction) # each pair appears twice, once per robot
+
+        limitX = self.arenaX / 2 + WALL_OFFSET - ROBOT_RADIUS
+        limitY = self.arenaY / 2 + WALL_OFFSET - ROBOT_RADIUS
+        numpy.clip(self.positions[:, 0], -limitX, limitX, out=self.positions[:, 0])
+        numpy.clip(self.positions[:, 1], -limitY, limitY, out=self.positions[:, 1])
+
+
+class SwarmEvaluator:
+    """ evaluates genetic individuals on all robots of a *SwarmSimulator* at once, like the slaves do in Webots
+
+    Every robot runs its own copy of the individual's networks. The copies are stacked into network banks, so one step of the whole swarm
+    is one batched forward pass. The score of each robot is computed like *GeneticIndividual.evaluate* on a slave.
+
+    Usage:
+    Create an evaluator for a simulator and call *evaluate* with an individual. Place the robots before every evaluation.
+
+    """
+
+    def __init__(self, simulator, maxAge, controlPeriod=1):
+        """ creates an evaluator
+
+        Arguments:
+        simulator -- the simulated swarm
+        maxAge -- evaluation length in control ticks
+        controlPeriod -- time steps per control tick, the motor commands are held in between
+
+        """
+        self.simulator = simulator
+        self.maxAge = maxAge
+        self.controlPeriod = controlPeriod
+
+    def evaluate(self, individual):
+        """ returns the scores of all robots for the given individual as numpy vector, the mean is the score the master computes """
+        n = self.simulator.amountRobots
+        amountIn = individual.amountSensors + individual.amountActions
+        actionBank = ActionNetworkBank(amountIn, individual.amountHiddenAction, individual.amountActions, individual.activationFunctionAction,
+                                       numpy.tile(individual.actionNetwork.toGenome(), (n, 1)), individual.dtype)
+        predictionBank = PredictionNetworkBank(amountIn, individual.amountHiddenPrediction, individual.amountSensors, individual.activationFunctionPrediction,
+                                               numpy.tile(individual.predictionNetwork.toGenome(), (n, 1)), individual.dtype)
+
+        inputs = numpy.empty((n, amountIn, 1), individual.dtype)
+        inputs[:, individual.amountSensors:] = 1 # the first given action is 1, like in GeneticIndividual.reset
+        scoreSums = numpy.zeros(n)
+        prediction = None
+
+        for time in range(self.maxAge + 1):
+            sensors = self.simulator.sense()
+            if prediction is not None:
+                scoreSums += individual.amountSensors - numpy.abs(prediction[:, :, 0] - sensors).sum(axis=1)
+            if time == self.maxAge:
+                break
+
+            inputs[:, :individual.amountSensors, 0] = sensors
+            action = actionBank.input(inputs)
+            inputs[:, individual.amountSensors:] = action
+            prediction = predictionBank.input(inputs)
+
+            motors = action[:, :, 0] * MAX_SPEED
+            hwp(motors, sensors)
+            self.simulator.wheelSpeeds[:] = motors
+            for step in range(self.controlPeriod):
+                self.simulator.step()
+
+        return scoreSums / (self.maxAge * individual.amountSensors)
+
+
+if __name__ == '__main__':
+    robots = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    evaluations = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    simulator = SwarmSimulator(robots, 1.0, 1.0)
+    evaluator = SwarmEvaluator(simulator, 1000)
+
+    # 1+1 evolution without re-evaluation
+    king = GeneticIndividual(SENSORS, ACTIONS, 7, 10, tanh, sigmoid_stable)
+    scoreKing = 0
+    for evaluation in range(evaluations):
+        mutant = king.mutate(0.1)
+        simulator.placeRandom()
+        scoreMutant = evaluator.evaluate(mutant).mean()
+        print(str(scoreKing) + "," + str(scoreMutant))
+        if scoreMutant >= scoreKing:
+            king = mutant
+            scoreKing = scoreMutant
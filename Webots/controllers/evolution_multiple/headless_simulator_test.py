@@ -0,0 +1,99 @@
+import random
+import unittest
+import numpy
+from headless_simulator import *
+from genetic_individual import GeneticIndividual
+from activation import sigmoid_stable, tanh
+
+class TestSwarmSimulator(unittest.TestCase):
+
+    def test_kinematics(self):
+        simulator = SwarmSimulator(2, 1, 1)
+        simulator.positions[1] = 0.3, 0.3
+        simulator.headings[0] = numpy.pi / 2
+        simulator.wheelSpeeds[0] = MAX_SPEED, MAX_SPEED
+        simulator.wheelSpeeds[1] = -MAX_SPEED, MAX_SPEED
+        for i in range(100):
+            simulator.step()
+
+        self.assertTrue(numpy.allclose(simulator.positions[0], [0, MAX_SPEED * WHEEL_RADIUS]), "straight drive for 1s")
+        self.assertTrue(numpy.allclose(simulator.positions[1], [0.3, 0.3]), "turning on the spot")
+        self.assertAlmostEqual(simulator.headings[1], 2 * MAX_SPEED * WHEEL_RADIUS / AXLE_LENGTH)
+
+    def test_sensors(self):
+        simulator = SwarmSimulator(3, 1, 1)
+        simulator.positions[:] = [[-0.2, 0], [-0.2 + 2 * ROBOT_RADIUS + SENSOR_RANGE / 2, 0], [0.49, 0.3]]
+        simulator.headings[:] = [0, numpy.pi, 0]
+        sensors = simulator.sense()
+
+        self.assertAlmostEqual(sensors[0, 2], 0.5, msg="central sensor half way into its range")
+        self.assertAlmostEqual(sensors[1, 2], 0.5, msg="central sensor half way into its range")
+        self.assertEqual(sensors[0, 5], 0, "back sensors see nothing")
+        self.assertEqual(sensors[0, 7], GROUND_FLOOR / MAX_GROUND_SENSOR, "ground sensors on the floor")
+        self.assertTrue(numpy.all(sensors[2, :7] == 0), "nothing around the robot at the edge")
+        self.assertTrue(numpy.all(sensors[2, 7:] == 0), "ground sensors beyond the edge of the floor")
+
+    def test_collisions(self):
+        simulator = SwarmSimulator(2, 1, 1)
+        simulator.positions[:] = [[0, 0], [ROBOT_RADIUS, 0]]
+        simulator.step()
+        self.assertAlmostEqual(simulator.positions[1, 0] - simulator.positions[0, 0], 2 * ROBOT_RADIUS)
+
+        simulator.positions[0] = 1, -1
+        simulator.step()
+        self.assertTrue(numpy.allclose(simulator.positions[0], [0.5 + WALL_OFFSET - ROBOT_RADIUS, -0.5 - WALL_OFFSET + ROBOT_RADIUS]), "walls keep the robots on the arena")
+
+    def test_pairs(self):
+        simulator = SwarmSimulator(150, 2, 2)
+        simulator.placeRandom(random.Random(1))
+        robot, other, delta, distance = simulator._pairs(0.2)
+
+        difference = simulator.positions[None, :, :] - simulator.positions[:, None, :]
+        dense = numpy.hypot(difference[:, :, 0], difference[:, :, 1])
+        numpy.fill_diagonal(dense, numpy.inf)
+        self.assertEqual(set(zip(robot, other)), set(zip(*numpy.nonzero(dense < 0.2))), "the grid should find the same pairs as comparing all robots")
+
+    def test_hwp(self):
+        motors = numpy.array([[1.0, 1.0], [1.0, 1.0], [-1.0, -1.0], [1.0, -1.0], [0.0, 0.0], [2.0, 1.0]])
+        sensors = numpy.full((6, 9), 0.5)
+        sensors[0, 2] = 0.95 # obstacle in front
+        sensors[2, 8] = 0 # edge of the floor
+        sensors[3, 2] = 0.95 # turning on the spot is allowed
+        sensors[5, 0] = 0.95 # large turning radius
+        stopped = hwp(motors, sensors)
+
+        self.assertEqual(list(stopped), [True, False, True, False, False, True])
+        self.assertTrue(numpy.all(motors[stopped] == 0))
+        self.assertTrue(numpy.all(motors[1] == 1))
+
+    def test_evaluator(self):
+        simulator = SwarmSimulator(4, 0.7, 0.7)
+        simulator.placeRandom(random.Random(2))
+        positions, headings = simulator.positions.copy(), simulator.headings.copy()
+        individual = GeneticIndividual(SENSORS, ACTIONS, 7, 10, tanh, sigmoid_stable)
+        genome = individual.toGenome().copy()
+        scores = SwarmEvaluator(simulator, 200).evaluate(individual)
+
+        # the same evaluation with one individual per robot, stepped like on the slaves
+        simulator.positions[:], simulator.headings[:] = positions, headings
+        robots = [GeneticIndividual(SENSORS, ACTIONS, 7, 10, tanh, sigmoid_stable, genome.copy()) for i in range(4)]
+        for time in range(200):
+            sensors = simulator.sense().copy()
+            motors = numpy.zeros((4, 2))
+            for i, robot in enumerate(robots):
+                sensor = sensors[i].reshape(SENSORS, 1)
+                if time > 0:
+                    robot.storeSensor(sensor)
+                motors[i] = robot.action(sensor)[:, 0] * MAX_SPEED
+                robot.predict(sensor)
+            hwp(motors, sensors)
+            simulator.wheelSpeeds[:] = motors
+            simulator.step()
+        sensors = simulator.sense()
+        for i, robot in enumerate(robots):
+            robot.storeSensor(sensors[i].reshape(SENSORS, 1))
+            self.assertAlmostEqual(scores[i], robot.evaluate())
+
+
+if __name__ == '__main__':
+    unittest.main()
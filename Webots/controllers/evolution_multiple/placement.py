@@ -0,0 +1,66 @@
+import math
+import random
+import numpy
+
+MAX_COVERAGE = 0.45 # random sequential placement of discs jams at a coverage of about 0.547, it slows down considerably before
+ATTEMPTS = 1000 # candidate positions drawn per robot before the placement is restarted
+RESTARTS = 20 # restarts before giving up
+
+
+def random_poses(amount, width, height, distance, rng=random):
+    """ returns random non-overlapping positions and random headings in the format of *createRandom*
+
+    Candidates are drawn uniformly like in rejection sampling, but they are only compared to robots in neighbouring cells of a grid (spatial hash),
+    so placing N robots takes time linear in N as long as the requested density is feasible.
+
+    Arguments:
+    amount -- amount of robots
+    width -- size of the area available for robot centres along the x axis, centred at 0
+    height -- size of the area available for robot centres along the (Webots) z axis, centred at 0
+    distance -- minimum distance between the centres of two robots
+    rng -- random generator providing *random()*
+
+    Raises ValueError if the robots cover too much of the arena to be placed randomly, RuntimeError if placing them failed nevertheless.
+
+    """
+    # discs of diameter *distance* around all centres have to fit into the enlarged area
+    coverage = amount * math.pi * (distance / 2) ** 2 / ((width + distance) * (height + distance))
+    if width < 0 or height < 0 or coverage > MAX_COVERAGE:
+        maximum = int(MAX_COVERAGE * max(width + distance, 0) * max(height + distance, 0) / (math.pi * (distance / 2) ** 2))
+        raise ValueError("cannot place " + str(amount) + " robots at a distance of " + str(distance) + " in an area of " + str(width) + " x " + str(height)
+                         + ": coverage " + str(round(coverage, 3)) + " exceeds " + str(MAX_COVERAGE) + ", at most " + str(maximum) + " robots fit")
+
+    headings = [2 * math.pi * rng.random() for i in range(amount)]
+    for restart in range(RESTARTS):
+        positions = _place(amount, width, height, distance, rng)
+        if positions is not None:
+            return [[x, 0, y] for x, y in positions], headings
+
+    raise RuntimeError("could not place " + str(amount) + " robots after " + str(RESTARTS) + " restarts, reduce the amount of robots or enlarge the arena")
+
+
+def _place(amount, width, height, distance, rng):
+    """ returns a list of *amount* positions or None if a robot could not be placed within *ATTEMPTS* candidates """
+    cell = distance / math.sqrt(2) # a cell contains at most one robot
+    columns = max(1, int(math.ceil(width / cell)))
+    rows = max(1, int(math.ceil(height / cell)))
+    grid = numpy.full((columns + 4, rows + 4), -1, dtype=numpy.int64) # padded by the two cells checked around each cell
+    positions = numpy.empty((amount, 2))
+
+    for i in range(amount):
+        for attempt in range(ATTEMPTS):
+            x = rng.random() * width - 0.5 * width
+            y = rng.random() * height - 0.5 * height
+            column = min(int((x + 0.5 * width) / cell), columns - 1) + 2
+            row = min(int((y + 0.5 * height) / cell), rows - 1) + 2
+
+            neighbours = grid[column-2:column+3, row-2:row+3]
+            neighbours = neighbours[neighbours >= 0]
+            if neighbours.size == 0 or numpy.min(numpy.hypot(positions[neighbours, 0] - x, positions[neighbours, 1] - y)) >= distance:
+                positions[i] = x, y
+                grid[column, row] = i
+                break
+        else:
+            return None
+
+    return positions.tolist()
@@ -0,0 +1,38 @@
+import random
+import unittest
+import numpy
+from placement import *
+
+class TestPlacement(unittest.TestCase):
+
+    def check(self, positions, amount, width, height, distance):
+        positions = numpy.array(positions)
+        self.assertEqual(positions.shape, (amount, 3))
+        self.assertTrue(numpy.all(numpy.abs(positions[:, 0]) <= width / 2))
+        self.assertTrue(numpy.all(numpy.abs(positions[:, 2]) <= height / 2))
+        self.assertTrue(numpy.all(positions[:, 1] == 0))
+
+        difference = positions[None, :, :] - positions[:, None, :]
+        dense = numpy.hypot(difference[:, :, 0], difference[:, :, 2])
+        numpy.fill_diagonal(dense, numpy.inf)
+        self.assertGreaterEqual(dense.min(), distance, "robots should not overlap")
+
+    def test_worlds(self):
+        for size in [0.7, 0.8, 0.9, 1.0, 1.5]:
+            positions, headings = random_poses(10, size - 0.164, size - 0.164, 0.164)
+            self.check(positions, 10, size - 0.164, size - 0.164, 0.164)
+            self.assertEqual(len(headings), 10)
+            self.assertTrue(all(0 <= heading < 2 * numpy.pi for heading in headings))
+
+    def test_large(self):
+        positions, headings = random_poses(1000, 10, 5, 0.164, random.Random(3))
+        self.check(positions, 1000, 10, 5, 0.164)
+        self.assertEqual((positions, headings), random_poses(1000, 10, 5, 0.164, random.Random(3)), "the generator should determine the poses")
+
+    def test_infeasible(self):
+        self.assertRaises(ValueError, random_poses, 12, 0.536, 0.536, 0.164)
+        self.assertRaises(ValueError, random_poses, 1, -0.1, 1, 0.164)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import numpy
+
+
+class PoseSampler:
+    """ samples translation and rotation of robots into a preallocated buffer and appends the samples to a csv file in bulk
+
+    Usage:
+    Create a sampler with the field handles of the robots, which are resolved only once, call *sample* at every time step and *flush* at the end of the run.
+
+    """
+
+    def __init__(self, names, translationFields, rotationFields, filename, decimation=1, capacity=1000):
+        """ preallocates the buffer
+
+        Arguments:
+        names -- names of the robots, written in the first column
+        translationFields -- translation fields of the robots (SFVec3f)
+        rotationFields -- rotation fields of the robots (SFRotation)
+        filename -- csv file the samples are appended to, without '.csv'
+        decimation -- a pose is sampled at every *decimation*-th call of *sample*
+        capacity -- amount of samples buffered before they are written
+
+        """
+        self.names = names
+        self.translationFields = translationFields
+        self.rotationFields = rotationFields
+        self.filename = filename
+        self.decimation = decimation
+        self.buffer = numpy.empty((capacity, len(names), 7)) # translation followed by rotation of every robot
+        self.count = 0 # samples in the buffer
+        self.steps = 0 # calls of *sample*
+
+    def sample(self):
+        """ stores the poses of all robots if the time step is not skipped, writes the buffer once it is full """
+        if self.steps % self.decimation == 0:
+            poses = self.buffer[self.count]
+            for i in range(len(self.names)):
+                poses[i, :3] = self.translationFields[i].getSFVec3f()
+                poses[i, 3:] = self.rotationFields[i].getSFRotation()
+            self.count += 1
+            if self.count == len(self.buffer):
+                self.flush()
+        self.steps += 1
+
+    def flush(self):
+        """ appends all buffered samples to the csv file, one line per robot and sample """
+        if self.count == 0:
+            return
+
+        lines = []
+        for poses in self.buffer[:self.count].tolist():
+            for name, pose in zip(self.names, poses):
+                lines.append(name + "," + ",".join(str(x) for x in pose) + "\n")
+        with open(self.filename + ".csv", "a") as file:
+            file.write("".join(lines))
+        self.count = 0
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from pose_sampler import *
+
+class Field:
+
+    def __init__(self, values):
+        self.values = values
+
+    def getSFVec3f(self):
+        return self.values
+
+    def getSFRotation(self):
+        return self.values + [self.values[0]]
+
+class TestPoseSampler(unittest.TestCase):
+
+    def test_sample(self):
+        fields = [Field([0.5, 0.0, -0.25]), Field([1.0, 2.0, 3.0])]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "trajectory")
+            sampler = PoseSampler(["T1", "T2"], fields, fields, filename, 3, 2)
+            for i in range(10):
+                sampler.sample()
+                fields[0].values[0] = float(i + 1)
+            self.assertEqual(sampler.count, 0, "samples 0 and 3, 6 and 9 should have been written")
+            with open(filename + ".csv") as file:
+                lines = file.read().split()
+
+            for i in range(3):
+                sampler.sample()
+            sampler.flush()
+            with open(filename + ".csv") as file:
+                self.assertEqual(len(file.read().split()), 8 + 2, "flush should write the remaining sample")
+
+        self.assertEqual(len(lines), 4 * 2)
+        self.assertEqual(lines[0], "T1,0.5,0.0,-0.25,0.5,0.0,-0.25,0.5")
+        self.assertEqual(lines[1], "T2,1.0,2.0,3.0,1.0,2.0,3.0,1.0")
+        self.assertEqual([line.split(",")[1] for line in lines[::2]], ["0.5", "3.0", "6.0", "9.0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
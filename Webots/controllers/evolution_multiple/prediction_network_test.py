@@ -12,15 +12,16 @@ class TestPredictionNetwork(unittest.TestCase):
         resultFirst = numpy.array([[1]])
         resultSecond = numpy.array([[2]])
 
-        network.hidden = numpy.array([[1,0, 0,0,0], [0,1, 0,0,0], [1,1, 0,0,0]])
+        network.hidden = numpy.array([[1,0, 0], [0,1, 0], [1,1, 0]]) # last column: bias
+        network.recurrent = numpy.zeros((3, 1))
 
-        network.out = numpy.array([[0, 0, 1]])
+        network.out = numpy.array([[0, 0, 1, 0]])
         self.assertEqual(network.input(testVector), resultSum)
 
-        network.out = numpy.array([[0, 1, 0]])
+        network.out = numpy.array([[0, 1, 0, 0]])
         self.assertEqual(network.input(testVector), resultSecond)
 
-        network.out = numpy.array([[1, 0, 0]])
+        network.out = numpy.array([[1, 0, 0, 0]])
         self.assertEqual(network.input(testVector), resultFirst)
 
     def test_network_activation(self):
@@ -31,15 +32,16 @@ class TestPredictionNetwork(unittest.TestCase):
         resultFirst = numpy.array([[(1^2)^2]])
         resultSecond = numpy.array([[(2^2)^2]])
 
-        network.hidden = numpy.array([[1,0, 0,0,0], [0,1, 0,0,0], [1,1, 0,0,0]])
+        network.hidden = numpy.array([[1,0, 0], [0,1, 0], [1,1, 0]]) # last column: bias
+        network.recurrent = numpy.zeros((3, 1))
 
-        network.out = numpy.array([[0, 0, 1]])
+        network.out = numpy.array([[0, 0, 1, 0]])
         self.assertEqual(network.input(testVector), resultSum)
 
-        network.out = numpy.array([[0, 1, 0]])
+        network.out = numpy.array([[0, 1, 0, 0]])
         self.assertEqual(network.input(testVector), resultSecond)
 
-        network.out = numpy.array([[1, 0, 0]])
+        network.out = numpy.array([[1, 0, 0, 0]])
         self.assertEqual(network.input(testVector), resultFirst)
 
     def test_network_with_self_weights(self):
@@ -51,25 +53,26 @@ class TestPredictionNetwork(unittest.TestCase):
         resultFirst = numpy.array([[1]])
         resultSecond = numpy.array([[2]])
 
-        network.hidden = numpy.array([[1,0, 1,0,0], [0,1, 0,1,0], [1,1, 0,0,1]])
-        network.hiddenOutput = numpy.array([[0], [0], [0]])
+        network.hidden = numpy.array([[1,0, 0], [0,1, 0], [1,1, 0]]) # last column: bias
+        network.recurrent = numpy.array([[1.0], [1.0], [1.0]])
+        network.hiddenState = numpy.array([[0.0], [0.0], [0.0]])
 
-        network.out = numpy.array([[0, 0, 1]])
+        network.out = numpy.array([[0, 0, 1, 0]])
         self.assertEqual(network.input(testVector), resultSum)
 
         # now input null vector to check for output conserving
 
-        network.out = numpy.array([[0, 0, 1]])
+        network.out = numpy.array([[0, 0, 1, 0]])
         self.assertEqual(network.input(nullVector), resultSum)
 
-        network.out = numpy.array([[0, 1, 0]])
+        network.out = numpy.array([[0, 1, 0, 0]])
         self.assertEqual(network.input(nullVector), resultSecond)
 
-        network.out = numpy.array([[1, 0, 0]])
+        network.out = numpy.array([[1, 0, 0, 0]])
         self.assertEqual(network.input(nullVector), resultFirst)
 
-        network.hidden = numpy.array([[1,0, 1,0,0], [0,1, 0,1,0], [1,1, 0,0,0.5]])
-        network.out = numpy.array([[0, 0, 1]])
+        network.recurrent = numpy.array([[1.0], [1.0], [0.5]])
+        network.out = numpy.array([[0, 0, 1, 0]])
         self.assertEqual(network.input(nullVector), 0.5 * resultSum)
         self.assertEqual(network.input(nullVector), 0.25 * resultSum)
         self.assertEqual(network.input(nullVector), 0.125 * resultSum)
@@ -80,8 +83,48 @@ class TestPredictionNetwork(unittest.TestCase):
         copy = PredictionNetwork(2, 3, 1, lambda x : x)
         copy.fromGenome(genome)
         self.assertTrue(numpy.array_equal(network.hidden, copy.hidden), 'fromGenome should be inverse to toGenome')
+        self.assertTrue(numpy.array_equal(network.recurrent, copy.recurrent), 'fromGenome should be inverse to toGenome')
         self.assertTrue(numpy.array_equal(network.hiddenOutput, copy.hiddenOutput), 'fromGenome should be inverse to toGenome')
         self.assertTrue(numpy.array_equal(network.out, copy.out), 'fromGenome should be inverse to toGenome')
 
+    def test_genome_layout(self):
+        network = PredictionNetwork(4, 3, 2, numpy.tanh)
+        genome = network.toGenome().copy()
+
+        # reference: dense hidden matrix with the self-recurrence as diagonal block, built from the genome
+        hidden = numpy.concatenate((genome[:15].reshape(3, 5), numpy.diag(genome[15:18])), 1)
+        hiddenOutput = genome[18:21].reshape(3, 1)
+        out = genome[21:].reshape(2, 4)
+
+        for step in range(3):
+            vector = numpy.random.rand(4, 1)
+            hiddenOutput = numpy.tanh(hidden.dot(numpy.concatenate((vector, [[-1]], hiddenOutput), 0)))
+            prediction = numpy.tanh(out.dot(numpy.concatenate((hiddenOutput, [[-1]]), 0)))
+            self.assertTrue(numpy.allclose(network.input(vector), prediction), 'elementwise recurrence should match the dense diagonal block')
+
+    def test_bank(self):
+        networks = [PredictionNetwork(4, 3, 2, numpy.tanh) for i in range(5)]
+        bank = PredictionNetworkBank.fromNetworks(networks)
+        for step in range(3): # recurrent states have to be kept separately
+            vectors = numpy.random.rand(5, 4, 1)
+            outputs = bank.input(vectors)
+            for i in range(5):
+                self.assertTrue(numpy.allclose(outputs[i], networks[i].input(vectors[i])), 'bank should match the single networks')
+
+        self.assertTrue(numpy.allclose(bank.toGenomes()[2, 18:21], networks[2].hiddenState.flatten()), 'toGenomes should contain the current hidden states')
+
+    def test_genome_unchanged(self):
+        network = PredictionNetwork(4, 3, 2, numpy.tanh)
+        genome = network.toGenome().copy()
+        for vector in numpy.random.rand(3, 4, 1):
+            network.input(vector)
+        self.assertTrue(numpy.array_equal(network.toGenome(), genome), 'running the network should not change its genome')
+
+        network.reset()
+        vectors = numpy.random.rand(3, 4, 1)
+        copy = PredictionNetwork(4, 3, 2, numpy.tanh, genome.copy())
+        for vector in vectors:
+            self.assertTrue(numpy.array_equal(network.input(vector), copy.input(vector)), 'reset should restart from the initial hidden layer output')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,169 @@
+"""
+Minimize Surprise - trajectory renderer
+
+Renders the trajectory logged during the post-evaluation (trajectory.csv) as top-down frames, so that the post-evaluation can run in fast mode
+instead of being recorded by Webots in real time. Frames are rendered by several processes and written as PNG images.
+They are assembled into a video if ffmpeg is installed, or into an animated GIF if Pillow is installed.
+
+Usage:
+python3 render_trajectory.py [-r results folder] [-o output folder] [-s pixels per m] [-e every n-th sample] [-p processes] [--gif] [--video]
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+import zlib
+from multiprocessing import Pool
+from optparse import OptionParser
+import numpy
+
+ROBOT_RADIUS = 0.055 # radius of a Thymio in m
+WALL_OFFSET = 0.12 # distance of the walls from the edge of the floor in m
+BACKGROUND = (255, 255, 255)
+FLOOR = (225, 225, 225)
+TRAIL = (160, 190, 230)
+ROBOT = (40, 90, 170)
+HEADING = (240, 240, 240)
+
+
+def read_trajectory(filename):
+    """ returns the names of the robots and their poses as array of shape (samples, robots, 7): translation followed by rotation """
+    with open(filename) as file:
+        lines = [line.strip().split(",") for line in file.read().split("\n")[1:] if line.strip()]
+
+    names = []
+    for line in lines: # every sample lists all robots in the same order
+        if line[0] in names:
+            break
+        names.append(line[0])
+
+    samples = len(lines) // len(names)
+    poses = numpy.array([[float(x) for x in line[1:]] for line in lines[:samples * len(names)]])
+    return names, poses.reshape(samples, len(names), 7)
+
+
+def read_arena(filename):
+    """ returns the arena size logged in the given parameters file, None if it is not logged """
+    size = {}
+    with open(filename) as file:
+        for line in file.read().split("\n"):
+            key, _, value = line.partition(",")
+            size[key] = value
+    if "arena size x" not in size or "arena size y" not in size:
+        return None
+    return float(size["arena size x"]), float(size["arena size y"])
+
+
+def positions(poses):
+    """ returns the positions (x, y) and headings of the given poses in the coordinates of the floor, like *webots_emulation.Field* """
+    return poses[..., 0], -poses[..., 2], poses[..., 6] * numpy.sign(poses[..., 4])
+
+
+def render_frame(trajectory, index, arenaX, arenaY, scale, trail=0):
+    """ returns the top-down image of the given sample as array of shape (height, width, 3)
+
+    Arguments:
+    trajectory -- poses as returned by *read_trajectory*
+    index -- index of the sample
+    arenaX -- size of the floor along the x axis in m
+    arenaY -- size of the floor along the y axis in m
+    scale -- pixels per m
+    trail -- amount of previous samples whose positions are drawn
+
+    """
+    width = int(round((arenaX + 2 * WALL_OFFSET) * scale))
+    height = int(round((arenaY + 2 * WALL_OFFSET) * scale))
+    image = numpy.empty((height, width, 3), numpy.uint8)
+    image[:] = BACKGROUND
+
+    # pixel centres in m, y pointing up
+    columns = (numpy.arange(width) + 0.5) / scale - arenaX / 2 - WALL_OFFSET
+    rows = arenaY / 2 + WALL_OFFSET - (numpy.arange(height) + 0.5) / scale
+    floor = (numpy.abs(rows)[:, None] <= arenaY / 2) & (numpy.abs(columns)[None, :] <= arenaX / 2)
+    image[floor] = FLOOR
+
+    x, y, heading = positions(trajectory[max(0, index - trail):index + 1])
+    for i in range(x.shape[1]):
+        for tx, ty in zip(x[:-1, i], y[:-1, i]):
+            _disc(image, columns, rows, tx, ty, 0.01, TRAIL)
+        _disc(image, columns, rows, x[-1, i], y[-1, i], ROBOT_RADIUS, ROBOT)
+        _disc(image, columns, rows, x[-1, i] + 0.6 * ROBOT_RADIUS * numpy.cos(heading[-1, i]), y[-1, i] + 0.6 * ROBOT_RADIUS * numpy.sin(heading[-1, i]), 0.2 * ROBOT_RADIUS, HEADING)
+    return image
+
+
+def _disc(image, columns, rows, x, y, radius, color):
+    """ fills a disc in the bounding box of the disc only """
+    left, right = numpy.searchsorted(columns, [x - radius, x + radius])
+    top, bottom = numpy.searchsorted(-rows, [-y - radius, -y + radius])
+    inside = (columns[None, left:right] - x) ** 2 + (rows[top:bottom, None] - y) ** 2 <= radius ** 2
+    image[top:bottom, left:right][inside] = color
+
+
+def write_png(filename, image):
+    """ writes an RGB image of shape (height, width, 3) as PNG file """
+    height, width = image.shape[:2]
+    raw = numpy.hstack([numpy.zeros((height, 1), numpy.uint8), image.reshape(height, width * 3)]).tobytes() # filter type 0 in every row
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(filename, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        file.write(chunk(b"IEND", b""))
+
+
+def _render(job):
+    """ renders the samples of one process and writes them as numbered frames """
+    trajectory, indices, arenaX, arenaY, scale, trail, output = job
+    for number, index in indices:
+        write_png(os.path.join(output, "frame_%06d.png" % number), render_frame(trajectory, index, arenaX, arenaY, scale, trail))
+
+
+def render(trajectory, output, arenaX, arenaY, scale=400, every=1, trail=0, processes=None):
+    """ renders every *every*-th sample of the trajectory to numbered PNG frames in the output folder, returns the amount of frames """
+    os.makedirs(output, exist_ok=True)
+    indices = list(enumerate(range(0, len(trajectory), every)))
+    processes = processes or os.cpu_count()
+    jobs = [(trajectory, indices[i::processes], arenaX, arenaY, scale, trail, output) for i in range(processes)]
+    with Pool(processes) as pool:
+        pool.map(_render, jobs)
+    return len(indices)
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option("-r", "--results", dest="results", default="results", help="results folder containing trajectory.csv and parameters.csv")
+    parser.add_option("-o", "--output", dest="output", default=None, help="output folder of the frames, by default frames in the results folder")
+    parser.add_option("-s", "--scale", dest="scale", type="float", default=400, help="pixels per m")
+    parser.add_option("-e", "--every", dest="every", type="int", default=10, help="render every n-th sample")
+    parser.add_option("-t", "--trail", dest="trail", type="int", default=50, help="previous samples drawn as trail")
+    parser.add_option("-x", "--arena", dest="arena", type="float", nargs=2, default=None, help="arena size in m, by default read from parameters.csv")
+    parser.add_option("-f", "--fps", dest="fps", type="int", default=10, help="frames per second of the video or GIF")
+    parser.add_option("-p", "--processes", dest="processes", type="int", default=None, help="amount of processes")
+    parser.add_option("--gif", action="store_true", dest="gif", default=False, help="assemble an animated GIF (requires Pillow)")
+    parser.add_option("--video", action="store_true", dest="video", default=False, help="assemble an mp4 video (requires ffmpeg)")
+    (options, args) = parser.parse_args()
+
+    arena = options.arena or read_arena(os.path.join(options.results, "parameters.csv"))
+    output = options.output or os.path.join(options.results, "frames")
+    names, trajectory = read_trajectory(os.path.join(options.results, "trajectory.csv"))
+    frames = render(trajectory, output, arena[0], arena[1], options.scale, options.every, options.trail, options.processes)
+    print(str(frames) + " frames of " + str(len(names)) + " robots written to " + output)
+
+    if options.video:
+        if shutil.which("ffmpeg") is None:
+            print("ffmpeg not found, no video written")
+        else:
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(options.fps), "-i", os.path.join(output, "frame_%06d.png"),
+                            "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", os.path.join(options.results, "run.mp4")], check=True)
+    if options.gif:
+        try:
+            from PIL import Image
+        except ImportError:
+            print("Pillow not found, no GIF written")
+        else:
+            images = [Image.open(os.path.join(output, "frame_%06d.png" % i)) for i in range(frames)]
+            images[0].save(os.path.join(options.results, "run.gif"), save_all=True, append_images=images[1:], duration=int(1000 / options.fps), loop=0)
@@ -0,0 +1,61 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+import numpy
+from render_trajectory import *
+
+class TestRenderTrajectory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "trajectory.csv")
+        with open(self.filename, "w") as file:
+            file.write("robot,translation0,translation1,translation2,rotation0,rotation1,rotation2,rotation3\n")
+            for i in range(5):
+                file.write("T1," + str(0.05 * i) + ",0,0.2,0,1,0,0\n")
+                file.write("T2,-0.3,0,-0.1,0,-1,0,1.5707963\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read(self):
+        names, trajectory = read_trajectory(self.filename)
+        self.assertEqual(names, ["T1", "T2"])
+        self.assertEqual(trajectory.shape, (5, 2, 7))
+        x, y, heading = positions(trajectory)
+        self.assertAlmostEqual(x[4, 0], 0.2)
+        self.assertAlmostEqual(y[0, 0], -0.2)
+        self.assertAlmostEqual(heading[0, 1], -1.5707963)
+
+    def test_frame(self):
+        names, trajectory = read_trajectory(self.filename)
+        image = render_frame(trajectory, 4, 1.0, 1.0, 100, trail=4)
+        self.assertEqual(image.shape, (124, 124, 3))
+        self.assertEqual(tuple(image[0, 0]), BACKGROUND)
+        self.assertEqual(tuple(image[13, 13]), FLOOR)
+        self.assertEqual(tuple(image[62 + 20, 62 + 17]), ROBOT, "T1 should be drawn at x = 0.2 m, y = -0.2 m")
+        self.assertEqual(tuple(image[62 + 20, 62]), TRAIL, "earlier positions of T1 should be drawn as trail")
+
+    def test_png(self):
+        image = numpy.random.randint(0, 256, (7, 5, 3)).astype(numpy.uint8)
+        filename = os.path.join(self.directory.name, "image.png")
+        write_png(filename, image)
+        with open(filename, "rb") as file:
+            data = file.read()
+        self.assertEqual(data[:8], b"\x89PNG\r\n\x1a\n")
+        self.assertEqual(struct.unpack(">II", data[16:24]), (5, 7))
+        length = struct.unpack(">I", data[33:37])[0]
+        raw = numpy.frombuffer(zlib.decompress(data[41:41 + length]), numpy.uint8).reshape(7, 16)
+        numpy.testing.assert_array_equal(raw[:, 1:].reshape(7, 5, 3), image)
+
+    def test_render(self):
+        names, trajectory = read_trajectory(self.filename)
+        output = os.path.join(self.directory.name, "frames")
+        self.assertEqual(render(trajectory, output, 1.0, 1.0, 50, 2, processes=2), 3)
+        self.assertEqual(sorted(os.listdir(output)), ["frame_000000.png", "frame_000001.png", "frame_000002.png"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+class Candidate:
+    """ genome handed to several robots in the asynchronous steady-state evolution, its scores are pooled once all of them reported """
+
+    __slots__ = ("number", "individual", "shadowSeed", "scoreTemp", "robots", "scores", "shadowScores")
+
+    def __init__(self, number, individual, shadowSeed=None, scoreTemp=None):
+        """ creates a candidate that was not handed to any robot yet
+
+        Arguments:
+        number -- number of the candidate, unique within its scheduler
+        individual -- genetic individual evaluated as candidate
+        shadowSeed -- seed of the shadow predictors evaluated next to it, None if there are none
+        scoreTemp -- previous score if the candidate is a re-evaluated king, None otherwise
+
+        """
+        self.number = number
+        self.individual = individual
+        self.shadowSeed = shadowSeed
+        self.scoreTemp = scoreTemp
+        self.robots = 0 # robots the candidate was handed to
+        self.scores = []
+        self.shadowScores = []
+
+
+class SteadyState:
+    """ schedules the candidates of an asynchronous steady-state evolution, in which every robot gets a new candidate as soon as it finished the last one
+
+    Usage:
+    When a robot is idle, hand it the candidate returned by *open* via *assign*, or *add* a new candidate first if *open* returns None.
+    Pass each score to *report*, which returns the candidate once the scores of all its robots arrived.
+
+    """
+
+    def __init__(self, samples):
+        """ creates an empty scheduler
+
+        Arguments:
+        samples -- amount of robots evaluating each candidate, their scores are averaged
+
+        """
+        self.samples = samples
+        self.candidates = {} # candidates still missing scores by number, in the order they were added
+        self.running = {} # candidate and tick of the assignment per robot evaluating a candidate
+        self.count = 0 # candidates added so far
+        self.finished = 0 # candidates whose scores all arrived so far
+
+    def open(self):
+        """ returns the oldest candidate that was not handed to enough robots yet, None if there is none """
+        for candidate in self.candidates.values():
+            if candidate.robots < self.samples:
+                return candidate
+        return None
+
+    def add(self, individual, shadowSeed=None, scoreTemp=None):
+        """ adds a new candidate and returns it (see *Candidate*) """
+        candidate = Candidate(self.count, individual, shadowSeed, scoreTemp)
+        self.candidates[candidate.number] = candidate
+        self.count += 1
+        return candidate
+
+    def assign(self, robot, candidate, tick=0):
+        """ records that the robot evaluates the candidate since the given tick """
+        candidate.robots += 1
+        self.running[robot] = (candidate, tick)
+
+    def restart(self, robot, tick):
+        """ records that the robot restarted its candidate at the given tick, e.g. because the candidate was handed to it again """
+        self.running[robot] = (self.running[robot][0], tick)
+
+    def report(self, robot, score, shadowScores=None, number=None):
+        """ stores the score of a robot and returns its candidate if all scores of the candidate arrived, None otherwise
+
+        Arguments:
+        robot -- robot that finished its evaluation, it is idle afterwards
+        score -- score of the candidate on the robot
+        shadowScores -- scores of the shadow predictors on the robot, None if there are none
+        number -- number of the evaluated candidate if the robot reports it, scores of candidates the robot does not evaluate any more are dropped
+
+        """
+        if robot not in self.running or (number is not None and self.running[robot][0].number != number):
+            return None
+
+        candidate = self.running.pop(robot)[0]
+        candidate.scores.append(score)
+        if shadowScores is not None:
+            candidate.shadowScores.append(shadowScores)
+        if len(candidate.scores) < self.samples:
+            return None
+        del self.candidates[candidate.number]
+        self.finished += 1
+        return candidate
+
+    def overdue(self, tick, timeout):
+        """ returns the robots that evaluate their candidate for more than *timeout* ticks """
+        return [robot for robot, (candidate, start) in self.running.items() if tick - start > timeout]
@@ -0,0 +1,38 @@
+import unittest
+from steady_state import *
+
+class TestSteadyState(unittest.TestCase):
+
+    def test_schedule(self):
+        scheduler = SteadyState(2)
+        self.assertIsNone(scheduler.open())
+
+        first = scheduler.add("first", 7)
+        scheduler.assign(0, scheduler.open())
+        scheduler.assign(1, scheduler.open())
+        self.assertIsNone(scheduler.open(), "a candidate is handed to as many robots as it needs scores")
+        second = scheduler.add("second", scoreTemp=0.5)
+        scheduler.assign(2, scheduler.open(), 3)
+
+        self.assertIsNone(scheduler.report(1, 0.4, [0.1, 0.2]))
+        self.assertIsNone(scheduler.report(1, 0.4), "an idle robot has no score to report")
+        self.assertIsNone(scheduler.report(2, 0.9, number=first.number), "scores of other candidates are dropped")
+        scheduler.assign(1, scheduler.open(), 5)
+        self.assertIs(scheduler.report(0, 0.6, [0.3, 0.4]), first)
+        self.assertEqual(first.scores, [0.4, 0.6])
+        self.assertEqual(first.shadowScores, [[0.1, 0.2], [0.3, 0.4]])
+        self.assertEqual((first.individual, first.shadowSeed), ("first", 7))
+
+        self.assertEqual(scheduler.overdue(10, 6), [2])
+        scheduler.restart(2, 10)
+        self.assertEqual(scheduler.overdue(10, 6), [])
+        self.assertIsNone(scheduler.report(2, 0.7, number=second.number))
+        self.assertIs(scheduler.report(1, 0.8), second)
+        self.assertEqual((second.scores, second.scoreTemp), ([0.7, 0.8], 0.5))
+        self.assertEqual(scheduler.running, {})
+        self.assertEqual(scheduler.candidates, {})
+        self.assertEqual((scheduler.count, scheduler.finished), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,382 @@
+"""
+Minimize Surprise - Webots emulation
+
+Stand-in for the *controller* module of Webots, so that the master and all slaves of *evolution_multiple.py* run in one process without Webots.
+Robots, emitters and receivers are emulated in memory, the robots move according to *headless_simulator.SwarmSimulator*.
+All controllers are stepped in lockstep: each controller is called once, then the world advances by one basic time step.
+
+Only the part of the controller API used by *evolution_multiple.py* and *genetic_population_multiple.py* is provided.
+The master does not take part in the simulation, like in the worlds where it stands outside of the walls.
+
+Usage:
+python3 webots_emulation.py [-w world] [-d directory] [-e evaluations] [-t evaluation length] [-p post-evaluation length]
+runs a complete evolution of the given world (by default the 1.0 m x 1.0 m arena), writes the logs to the results folder in the given directory
+and prints the evaluations per second.
+"""
+
+import os
+import re
+import sys
+import time
+from optparse import OptionParser
+import numpy
+from headless_simulator import SwarmSimulator
+
+
+class World:
+    """ represents the simulated world shared by all emulated robots
+
+    Usage:
+    Create the world from a world file via *fromFile* or add robots via *addRobot*, then create a controller for every robot in *robots*.
+    Call the controllers and *step* alternately until *quit* is set.
+
+    """
+
+    def __init__(self, arenaX, arenaY, basicTimeStep=10):
+        """ creates an empty world
+
+        Arguments:
+        arenaX -- size of the floor along the x axis in m
+        arenaY -- size of the floor along the y axis in m
+        basicTimeStep -- length of a time step in ms
+
+        """
+        self.arenaX = arenaX
+        self.arenaY = arenaY
+        self.basicTimeStep = basicTimeStep
+        self.robots = []
+        self.simulator = None # created once all robots are known
+        self.quit = None # exit status once a supervisor quit the simulation
+        self.time = 0
+
+    @classmethod
+    def fromFile(cls, filename):
+        """ returns a world with the floor size, basic time step and robots (names, roles, channels) of the given Webots world file """
+        with open(filename) as file:
+            text = file.read()
+        floor = re.search(r"DEF Floor Floor \{\s*size ([\d.]+) ([\d.]+)", text)
+        timeStep = re.search(r"basicTimeStep (\d+)", text)
+        world = cls(float(floor.group(1)), float(floor.group(2)), int(timeStep.group(1)) if timeStep else 10)
+
+        for match in re.finditer(r"^DEF (\w+) Thymio2 \{\n(.*?)^\}", text, re.MULTILINE | re.DOTALL):
+            block = match.group(2)
+            name = re.search(r'name "([^"]*)"', block)
+            receiver = re.search(r"Receiver \{\s*channel (-?\d+)", block)
+            emitter = re.search(r"Emitter \{\s*channel (-?\d+)", block)
+            supervisor = re.search(r"supervisor TRUE", block) is not None
+            world.addRobot(name.group(1) if name else match.group(1), match.group(1), supervisor,
+                           int(emitter.group(1)) if emitter else 0, int(receiver.group(1)) if receiver else 0)
+        return world
+
+    def addRobot(self, name, definition, supervisor, emitterChannel, receiverChannel):
+        """ adds a robot and returns it, supervisors do not move and are not simulated
+
+        Arguments:
+        name -- name returned by *getName*
+        definition -- DEF name used by *Supervisor.getFromDef*
+        supervisor -- True iff the robot is a supervisor
+        emitterChannel -- channel of the robot's emitter
+        receiverChannel -- channel of the robot's receiver
+
+        """
+        index = None
+        if not supervisor:
+            index = sum(1 for robot in self.robots if robot.index is not None)
+        robot = (Supervisor if supervisor else Robot)(self, name, definition, index)
+        robot.emitter.channel = emitterChannel
+        robot.receiver.channel = receiverChannel
+        self.robots.append(robot)
+        self.simulator = None
+        return robot
+
+    def getSimulator(self):
+        """ returns the simulator of all robots which are not supervisors """
+        if self.simulator is None:
+            self.simulator = SwarmSimulator(sum(1 for robot in self.robots if robot.index is not None), self.arenaX, self.arenaY)
+            self.simulator.sense()
+        return self.simulator
+
+    def step(self):
+        """ advances the world by one time step: moves the robots, delivers the packets sent during the last step and samples the distance sensors """
+        simulator = self.getSimulator()
+        for robot in self.robots:
+            if robot.index is not None:
+                simulator.wheelSpeeds[robot.index] = robot.leftMotor.velocity, robot.rightMotor.velocity
+        simulator.step()
+        simulator.sense()
+
+        for sender in self.robots:
+            for channel, packet in sender.emitter.pending:
+                for robot in self.robots:
+                    if robot is not sender and robot.receiver.enabled and robot.receiver.channel == channel:
+                        robot.receiver.queue.append(packet)
+            sender.emitter.pending = []
+        self.time += self.basicTimeStep
+
+        for robot in self.robots:
+            for sensor in robot.distanceSensors.values():
+                sensor.sample()
+
+
+class Motor:
+    """ emulates a Webots motor in velocity control mode """
+
+    def __init__(self):
+        self.velocity = 0.0
+
+    def setPosition(self, position):
+        pass
+
+    def setVelocity(self, velocity):
+        self.velocity = velocity
+
+
+class DistanceSensor:
+    """ emulates a Webots distance sensor sampling the raw sensor values of the simulator once per sampling period
+
+    Like in Webots, the value is NaN until the first sample was taken, which happens one sampling period after the sensor was enabled.
+
+    """
+
+    def __init__(self, robot, index):
+        self.robot = robot
+        self.index = index
+        self.samplingPeriod = 0 # in ms, 0 if disabled
+        self.value = float("nan")
+
+    def enable(self, samplingPeriod):
+        self.samplingPeriod = samplingPeriod
+
+    def sample(self):
+        """ takes a sample if the time of the world is a multiple of the sampling period, called by *World.step* """
+        if self.samplingPeriod > 0 and self.robot.index is not None and self.robot.world.time % self.samplingPeriod == 0:
+            self.value = float(self.robot.world.getSimulator().rawSensors[self.robot.index, self.index])
+
+    def getValue(self):
+        if self.robot.index is None:
+            return 0.0
+        return self.value
+
+
+class Emitter:
+    """ emulates a Webots emitter with unlimited range, packets are delivered on the channel set when sending by the next *World.step* """
+
+    def __init__(self):
+        self.channel = 0
+        self.pending = []
+
+    def send(self, data):
+        self.pending.append((self.channel, bytes(data) if not isinstance(data, str) else data))
+        return 1
+
+    def setChannel(self, channel):
+        self.channel = channel
+
+    def getChannel(self):
+        return self.channel
+
+
+class Receiver:
+    """ emulates a Webots receiver with an unbounded packet queue """
+
+    def __init__(self):
+        self.channel = 0
+        self.enabled = False
+        self.queue = []
+
+    def enable(self, samplingPeriod):
+        self.enabled = True
+
+    def getQueueLength(self):
+        return len(self.queue)
+
+    def getData(self):
+        return self.queue[0]
+
+    def nextPacket(self):
+        self.queue.pop(0)
+
+    def setChannel(self, channel):
+        self.channel = channel
+
+    def getChannel(self):
+        return self.channel
+
+
+DEVICES = ["prox.horizontal." + str(i) for i in range(7)] + ["prox.ground.0", "prox.ground.1"] # in the order of the simulator's sensors
+
+
+class Robot:
+    """ emulates a Webots robot, see *World* """
+
+    def __init__(self, world, name, definition, index):
+        self.world = world
+        self.name = name
+        self.definition = definition
+        self.index = index # index in the simulator, None if not simulated
+        self.leftMotor = Motor()
+        self.rightMotor = Motor()
+        self.emitter = Emitter()
+        self.receiver = Receiver()
+        self.distanceSensors = {} # by name, created when first requested
+
+    def getName(self):
+        return self.name
+
+    def getBasicTimeStep(self):
+        return float(self.world.basicTimeStep)
+
+    def getTime(self):
+        return self.world.time / 1000.0
+
+    def getMotor(self, name):
+        return self.leftMotor if name == "motor.left" else self.rightMotor
+
+    def getDistanceSensor(self, name):
+        if name not in self.distanceSensors:
+            self.distanceSensors[name] = DistanceSensor(self, DEVICES.index(name))
+        return self.distanceSensors[name]
+
+    def getEmitter(self, name):
+        return self.emitter
+
+    def getReceiver(self, name):
+        return self.receiver
+
+    def step(self, timeStep):
+        """ returns -1 once the simulation was quit; the world is advanced by the lockstep loop and not by the robots """
+        return -1 if self.world.quit is not None else 0
+
+
+class Field:
+    """ emulates a field of a Webots node, translation and rotation of robots are mapped to the simulator """
+
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+
+    def getSFVec2f(self):
+        return [self.node.world.arenaX, self.node.world.arenaY]
+
+    def getSFVec3f(self):
+        simulator = self.node.world.getSimulator()
+        x, y = simulator.positions[self.node.robot.index]
+        return [float(x), 0.0, float(-y)]
+
+    def setSFVec3f(self, values):
+        self.node.world.getSimulator().positions[self.node.robot.index] = values[0], -values[2]
+
+    def getSFRotation(self):
+        return [0.0, 1.0, 0.0, float(self.node.world.getSimulator().headings[self.node.robot.index])]
+
+    def setSFRotation(self, values):
+        self.node.world.getSimulator().headings[self.node.robot.index] = values[3] * numpy.sign(values[1])
+
+
+class Node:
+    """ emulates a Webots node: the floor or a simulated robot """
+
+    def __init__(self, world, robot=None):
+        self.world = world
+        self.robot = robot
+
+    def getField(self, name):
+        return Field(self, name)
+
+
+class Supervisor(Robot):
+    """ emulates a Webots supervisor, see *World* """
+
+    SIMULATION_MODE_PAUSE = 0
+    SIMULATION_MODE_REAL_TIME = 1
+    SIMULATION_MODE_RUN = 2
+    SIMULATION_MODE_FAST = 3
+
+    def __init__(self, world, name, definition, index):
+        Robot.__init__(self, world, name, definition, index)
+        self.mode = Supervisor.SIMULATION_MODE_REAL_TIME
+        self.recording = False
+
+    def getFromDef(self, name):
+        if name == "Floor":
+            return Node(self.world)
+        for robot in self.world.robots:
+            if robot.definition == name and robot.index is not None:
+                return Node(self.world, robot)
+        return None
+
+    def simulationSetMode(self, mode):
+        self.mode = mode
+
+    def simulationGetMode(self):
+        return self.mode
+
+    def simulationQuit(self, status):
+        self.world.quit = status
+
+    def movieStartRecording(self, filename, width, height, codec, quality, acceleration, caption):
+        self.recording = True
+
+    def movieStopRecording(self):
+        self.recording = False
+
+    def movieIsReady(self):
+        return not self.recording
+
+    def movieFailed(self):
+        return False
+
+
+def run(world, maxSteps=None):
+    """ runs one controller per robot of the world in lockstep until a supervisor quits, returns the amount of time steps
+
+    Arguments:
+    world -- the emulated world
+    maxSteps -- optional maximum amount of time steps
+
+    """
+    sys.modules["controller"] = sys.modules[__name__] # evolution_multiple imports Robot, Supervisor, ... from here
+    import evolution_multiple
+
+    # the master has to exist first, it places the slaves and sends the first genome
+    robots = sorted(world.robots, key=lambda robot: "master" not in robot.getName())
+    controllers = []
+    for robot in robots:
+        controllers.append(evolution_multiple.Controller(robot, robot.getName(), "master" in robot.getName(), robot.getEmitter("emitter"), robot.getReceiver("receiver")))
+        world.getSimulator() # the master places the slaves in the simulator
+
+    steps = 0
+    while world.quit is None and (maxSteps is None or steps < maxSteps):
+        world.step()
+        for controller in controllers:
+            controller.control()
+        steps += 1
+    return steps
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option("-w", "--world", dest="world", default="../../worlds/thymio2_arena_without_walls_TENRobots_1010.wbt", help="Webots world file")
+    parser.add_option("-d", "--directory", dest="directory", default=".", help="directory containing the results folder")
+    parser.add_option("-e", "--evaluations", dest="evaluations", type="int", default=None, help="amount of evaluations (EVALS)")
+    parser.add_option("-t", "--time", dest="evalTime", type="int", default=None, help="evaluation length in time steps (EVAL_TIME)")
+    parser.add_option("-p", "--post", dest="postEvalTime", type="int", default=None, help="post-evaluation length in time steps (POST_EVAL_TIME)")
+    (options, args) = parser.parse_args()
+
+    sys.modules["controller"] = sys.modules[__name__]
+    import evolution_multiple
+    if options.evaluations is not None:
+        evolution_multiple.EVALS = options.evaluations
+    if options.evalTime is not None:
+        evolution_multiple.EVAL_TIME = options.evalTime
+    if options.postEvalTime is not None:
+        evolution_multiple.POST_EVAL_TIME = options.postEvalTime
+
+    world = World.fromFile(options.world)
+    os.makedirs(os.path.join(options.directory, "results"), exist_ok=True)
+    os.chdir(options.directory)
+
+    start = time.time()
+    steps = run(world)
+    duration = time.time() - start
+    print(str(steps) + " time steps in " + str(round(duration, 2)) + " s, " + str(round(evolution_multiple.EVALS / duration, 2)) + " evaluations per second")
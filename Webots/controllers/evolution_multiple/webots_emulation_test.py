@@ -0,0 +1,221 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy
+import webots_emulation
+from webots_emulation import *
+from genetic_individual import GeneticIndividual
+
+sys.modules["controller"] = webots_emulation
+import evolution_multiple
+from genetic_population_multiple import GeneticPopulation
+
+def evolve(controlPeriod=1, groups=1, evals=3, evalTime=30, abortPeriod=0, steadyState=0, speculate=False, genomeChannel=False, repetitions=1):
+    """ runs a short evolution in the 1.0 m x 1.0 m arena, returns the world, the time steps and the lines of the run, trajectory and prediction logs
+
+    With several repetitions the logs are returned per repetition, as dictionaries keyed by the name of the repetition's directory.
+    The parameters of the controller are restored afterwards, so the tests of other modules run their evolutions with it as well.
+
+    """
+    directory = os.getcwd()
+    saved = evolution_multiple.EVALS, evolution_multiple.EVAL_TIME, evolution_multiple.POST_EVAL_TIME
+    evolution_multiple.EVALS, evolution_multiple.EVAL_TIME, evolution_multiple.POST_EVAL_TIME = evals, evalTime, 40
+    evolution_multiple.CONTROL_PERIOD = controlPeriod
+    evolution_multiple.GROUPS = groups
+    evolution_multiple.EARLY_ABORT_PERIOD = abortPeriod
+    evolution_multiple.STEADY_STATE = steadyState
+    evolution_multiple.SPECULATE = speculate
+    evolution_multiple.GENOME_CHANNEL = genomeChannel
+    evolution_multiple.REPETITIONS = repetitions
+    world = World.fromFile("../../worlds/thymio2_arena_without_walls_TENRobots_1010.wbt")
+    try:
+        with tempfile.TemporaryDirectory() as results:
+            os.chdir(results)
+            os.mkdir("results")
+            steps = run(world, 10000)
+            logs = {}
+            for folder in ["."] if repetitions == 1 else sorted(os.listdir("results")):
+                logs[folder] = []
+                for log in ["run", "trajectory", "pred_T1"]:
+                    with open(os.path.join("results", folder, log + ".csv")) as file:
+                        logs[folder].append(file.read().split())
+    finally:
+        os.chdir(directory)
+        evolution_multiple.EVALS, evolution_multiple.EVAL_TIME, evolution_multiple.POST_EVAL_TIME = saved
+        evolution_multiple.CONTROL_PERIOD = 1
+        evolution_multiple.GROUPS = 1
+        evolution_multiple.EARLY_ABORT_PERIOD = 0
+        evolution_multiple.STEADY_STATE = 0
+        evolution_multiple.SPECULATE = False
+        evolution_multiple.GENOME_CHANNEL = False
+        evolution_multiple.REPETITIONS = 1
+    if repetitions == 1:
+        lines, trajectory, predictions = logs["."]
+        return world, steps, lines, trajectory, predictions
+    lines, trajectory, predictions = [{folder: log[i] for folder, log in logs.items()} for i in range(3)]
+    return world, steps, lines, trajectory, predictions
+
+
+class TestWebotsEmulation(unittest.TestCase):
+
+    def test_messages(self):
+        world = World(1, 1)
+        master = world.addRobot("T_master", "T_master", True, 2, 1)
+        slaves = [world.addRobot("T" + str(i), "T" + str(i), False, 1, 2) for i in range(1, 3)]
+        for robot in world.robots:
+            robot.getReceiver("receiver").enable(10)
+
+        master.getEmitter("emitter").send(b"genome")
+        slaves[0].getEmitter("emitter").send(b"score")
+        self.assertEqual(slaves[1].getReceiver("receiver").getQueueLength(), 0, "packets arrive in the next time step")
+
+        world.step()
+        for slave in slaves:
+            self.assertEqual(slave.getReceiver("receiver").getQueueLength(), 1)
+            self.assertEqual(slave.getReceiver("receiver").getData(), b"genome")
+        self.assertEqual(master.getReceiver("receiver").getData(), b"score")
+        master.getReceiver("receiver").nextPacket()
+        self.assertEqual(master.getReceiver("receiver").getQueueLength(), 0)
+
+    def test_sampling(self):
+        world = World(1, 1)
+        robot = world.addRobot("T1", "T1", False, 1, 2)
+        sensor = robot.getDistanceSensor("prox.ground.0")
+        sensor.enable(20)
+        world.step()
+        self.assertTrue(numpy.isnan(sensor.getValue()), "the value should be NaN before the first sample")
+        world.step()
+        self.assertEqual(sensor.getValue(), 1000, "the ground sensor should see the floor")
+        world.getSimulator().positions[0] = [0.45, 0] # next to the edge of the floor
+        world.step()
+        self.assertEqual(world.getSimulator().rawSensors[0, 7], 0)
+        self.assertEqual(sensor.getValue(), 1000, "the value should only change every sampling period")
+        world.step()
+        self.assertEqual(sensor.getValue(), 0)
+
+    def test_nodes(self):
+        world = World.fromFile("../../worlds/thymio2_arena_without_walls_TENRobots_0707.wbt")
+        self.assertEqual(len(world.robots), 11)
+        master = [robot for robot in world.robots if "master" in robot.getName()][0]
+        self.assertTrue(isinstance(master, Supervisor))
+        self.assertEqual(master.getFromDef("Floor").getField("size").getSFVec2f(), [0.7, 0.7])
+
+        node = master.getFromDef("T3")
+        node.getField("translation").setSFVec3f([0.1, 0, -0.2])
+        node.getField("rotation").setSFRotation([0, 1, 0, 1.5])
+        self.assertEqual(node.getField("translation").getSFVec3f(), [0.1, 0.0, -0.2])
+        self.assertEqual(node.getField("rotation").getSFRotation(), [0.0, 1.0, 0.0, 1.5])
+        self.assertEqual(list(world.getSimulator().positions[2]), [0.1, 0.2])
+
+    def slowed(self, name):
+        """ returns a patch letting the controller of the given robot skip every other time step """
+        control = evolution_multiple.Controller.control
+        def slow(controller):
+            controller.calls = getattr(controller, "calls", 0) + 1
+            if controller.name != name or controller.calls % 2 == 0:
+                control(controller)
+        return mock.patch.object(evolution_multiple.Controller, "control", slow)
+
+    def test_run(self):
+        world, steps, lines, trajectory, predictions = evolve()
+
+        self.assertEqual(world.quit, 1, "the master should quit after the post-evaluation")
+        self.assertLess(steps, 10000)
+        self.assertEqual(lines[0], "king,mutant")
+        self.assertEqual(len(lines), 1 + 4, "one line per evaluation and the post-evaluation")
+        self.assertGreaterEqual(len(trajectory), 1 + 10 * 40, "the pose of every robot should be logged in every step of the post-evaluation")
+        self.assertEqual((len(trajectory) - 1) % 10, 0)
+
+    def test_control_period(self):
+        world, steps, lines, trajectory, predictions = evolve()
+        world, stepsDecimated, lines, trajectory, predictionsDecimated = evolve(4)
+
+        self.assertEqual(world.quit, 1)
+        self.assertEqual(len(lines), 1 + 4)
+        self.assertEqual(len(predictionsDecimated), len(predictions), "evaluations should last the same amount of control ticks")
+        self.assertGreater(stepsDecimated, 3 * steps, "a control tick should last four time steps")
+
+    def test_control_phase(self):
+        # every control tick has to fall on a time step at which the sensors are sampled 
+        reads = []
+        execute = GeneticPopulation.execute_slave
+        def record(population, sensors):
+            reads.append((population.controller.robot.world.time, sensors.copy()))
+            return execute(population, sensors)
+        with mock.patch.object(GeneticPopulation, "execute_slave", record):
+            world, steps, lines, trajectory, predictions = evolve(4)
+
+        self.assertTrue(all([time % 40 == 0 for time, sensors in reads]), "control ticks should read fresh samples")
+        self.assertFalse(any([numpy.isnan(sensors).any() for time, sensors in reads]), "no control tick should come before the first sample")
+
+    def test_groups(self):
+        world, steps, lines, trajectory, predictions = evolve(groups=2, evals=6)
+        world, stepsSingle, linesSingle, trajectory, predictions = evolve(evals=6)
+
+        self.assertEqual(world.quit, 1)
+        self.assertEqual(len(lines), 1 + 6 + 1, "one line per mutant and one for the post-evaluation")
+        self.assertLess(steps, 0.7 * stepsSingle, "two groups should evaluate six mutants in three generations")
+
+    def test_early_abort(self):
+        # slaves claiming that their mutants cannot score above 0 are aborted as soon as the king scored anything
+        with mock.patch.object(GeneticIndividual, "scoreBound", lambda individual, length: 0.0):
+            world, steps, lines, trajectory, predictions = evolve(evals=6, evalTime=100, abortPeriod=10)
+        world, stepsComplete, linesComplete, trajectory, predictions = evolve(evals=6, evalTime=100)
+
+        self.assertEqual(world.quit, 1)
+        self.assertEqual(len(lines), 1 + 6 + 1, "aborted mutants should be logged like evaluated ones")
+        self.assertIn("0.0", [line.split(",")[1] for line in lines], "aborted mutants should be logged with their bound")
+        self.assertLess(steps, stepsComplete, "hopeless mutants should be aborted")
+
+    def test_steady_state(self):
+        with self.slowed("T3"):
+            world, steps, lines, trajectory, predictions = evolve(evals=10, steadyState=5)
+            world, stepsGenerations, linesGenerations, trajectory, predictions = evolve(groups=2, evals=10)
+
+        self.assertEqual(world.quit, 1)
+        self.assertEqual(len(lines), 1 + 10 + 1, "one line per candidate and one for the post-evaluation")
+        self.assertGreaterEqual(len(trajectory), 1 + 10 * 40, "all slaves should take part in the post-evaluation")
+        self.assertLess(steps, stepsGenerations, "slaves should not wait for the late scores of a slow one")
+
+    def test_speculation(self):
+        world, steps, lines, trajectory, predictions = evolve(evals=8, speculate=True)
+        world, stepsWaiting, linesWaiting, trajectory, predictions = evolve(evals=8)
+
+        self.assertEqual(world.quit, 1)
+        self.assertEqual(len(lines), 1 + 8 + 1, "one line per evaluation and the post-evaluation")
+        self.assertEqual(len(set(line.split(",")[1] for line in lines[1:])), 9, "every candidate should be evaluated on its own")
+        self.assertLess(steps, stepsWaiting, "the slaves should not wait for the master's evaluation")
+
+    def test_generation_completion(self):
+        world, steps, lines, trajectory, predictions = evolve(evals=5)
+        self.assertLess(steps, 6 * (30 + 10), "the master should not wait once all scores arrived")
+
+        # a slave running at half speed always sends its score after the master evaluated without it 
+        scores = []
+        evaluate = GeneticPopulation._evaluate_master
+        def count(population):
+            scores.append(len(population.evaluationScores[0]))
+            evaluate(population)
+
+        with self.slowed("T3"), mock.patch.object(GeneticPopulation, "_evaluate_master", count):
+            world, steps, lines, trajectory, predictions = evolve(evals=5)
+
+        self.assertEqual(world.quit, 1)
+        self.assertEqual(len(lines), 1 + 6)
+        self.assertEqual(scores[:5], [9] * 5, "late scores should not count for the next generation")
+
+    def test_repetitions(self):
+        world, steps, lines, trajectory, predictions = evolve(repetitions=3)
+
+        self.assertEqual(world.quit, 1, "the master should quit after the last repetition")
+        self.assertEqual(sorted(lines), ["repetition_1", "repetition_2", "repetition_3"])
+        for repetition in lines:
+            self.assertEqual(len(lines[repetition]), 1 + 4, "every repetition should run all evaluations and the post-evaluation")
+            self.assertGreater(len(predictions[repetition]), 0, "the slaves should log to the directory of the repetition")
+            self.assertGreaterEqual(len(trajectory[repetition]), 1 + 10 * 40, "the poses of all robots should be logged in every post-evaluation")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+"""
+Minimize Surprise - Aseba export
+
+Exports the king of a run (last genome pair in results/genomes.csv) as Aseba script, so that the controller runs natively on the Thymio
+without the D-Bus round trips of the host loop. The script computes exactly what *fixed_point.FixedPointController* computes.
+
+Usage:
+python3 aseba_export.py [-g results/genomes.csv] [-o results/controller.aesl] [-p]
+Then load the .aesl file with Aseba Studio or asebamassloader.
+"""
+
+from optparse import OptionParser
+from xml.sax.saxutils import escape
+import numpy
+import fixed_point
+import parameters
+
+
+def read_king(filename):
+    """ returns the action and prediction genome of the last king stored in the given genome file
+
+    The file contains one line per genome, the action genome followed by the prediction genome of each new king.
+
+    """
+    lines = [line.strip() for line in open(filename) if line.strip() != ""]
+    if len(lines) < 2:
+        raise ValueError("no king found in " + filename)
+
+    genomeAction = numpy.array([float(x) for x in lines[-2].split(",")])
+    genomePrediction = numpy.array([float(x) for x in lines[-1].split(",")])
+    return genomeAction, genomePrediction
+
+
+def _array(name, values, comment=None):
+    """ returns the declaration of an initialized Aseba array """
+    line = "var " + name + "[" + str(len(values)) + "] = [" + ", ".join(str(int(x)) for x in values) + "]"
+    if comment:
+        line += " # " + comment
+    return line
+
+
+def _activate(lines, target, activation):
+    """ appends the table lookup of the activation function for z to the given lines """
+    if activation == "tanh":
+        lines.append("\ti = z + " + str(fixed_point.TABLE_OFFSET))
+    else: # sigmoid(z) = (1 + tanh(z / 2)) / 2
+        lines.append("\ti = (z >> 1) + " + str(fixed_point.TABLE_OFFSET))
+    lines.append("\tif i < 0 then")
+    lines.append("\t\ti = 0")
+    lines.append("\tend")
+    lines.append("\tif i > " + str(fixed_point.TABLE_SIZE - 1) + " then")
+    lines.append("\t\ti = " + str(fixed_point.TABLE_SIZE - 1))
+    lines.append("\tend")
+    if activation == "tanh":
+        lines.append("\t" + target + " = table[i]")
+    else:
+        lines.append("\t" + target + " = (table[i] + " + str(fixed_point.ONE) + ") >> 1")
+
+
+def export_script(genomeAction, genomePrediction, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, maxSpeed, maxHorizontal, maxGround):
+    """ returns the Aseba script running the given genomes
+
+    Arguments:
+    genomeAction -- genome of the action network
+    genomePrediction -- genome of the prediction network, None to skip predictions (saves variable and bytecode memory)
+    amountSensors -- amount of sensors, must be 9 (7 horizontal and 2 ground sensors)
+    amountActions -- amount of actions, must be 2 (left and right wheel)
+    amountHiddenAction -- amount of hidden nodes in the action network
+    amountHiddenPrediction -- amount of hidden nodes in the prediction network
+    maxSpeed -- motor target corresponding to an action of 1.0
+    maxHorizontal -- raw value of a horizontal sensor corresponding to 1.0
+    maxGround -- raw value of a ground sensor corresponding to 1.0
+
+    """
+    if amountSensors != 9 or amountActions != 2:
+        raise ValueError("the Aseba script supports 9 sensors and 2 actions only")
+
+    one = fixed_point.ONE
+    amountIn = amountSensors + amountActions
+    action = fixed_point.FixedPointActionNetwork(amountIn, amountHiddenAction, amountActions, "tanh", genomeAction)
+    prediction = None
+    if genomePrediction is not None:
+        prediction = fixed_point.FixedPointPredictionNetwork(amountIn, amountHiddenPrediction, amountSensors, "sigmoid", genomePrediction)
+
+    # declarations
+    lines = ["# Minimize Surprise controller exported by aseba_export.py",
+             "# fixed point numbers with " + str(fixed_point.FRACTION_BITS) + " fractional bits (" + str(one) + " = 1.0), see fixed_point.py for the reference implementation",
+             "",
+             _array("table", fixed_point.TABLE, "tanh lookup table")]
+    for k in range(amountHiddenAction):
+        lines.append(_array("actionHidden" + str(k), action.hidden[k]))
+    for k in range(amountActions):
+        lines.append(_array("actionOut" + str(k), action.out[k]))
+    if prediction is not None:
+        for k in range(amountHiddenPrediction):
+            lines.append(_array("predictionHidden" + str(k), numpy.append(prediction.hidden[k], prediction.recurrent[k]), "last entry: recurrent weight"))
+        for k in range(amountSensors):
+            lines.append(_array("predictionOut" + str(k), prediction.out[k]))
+
+    lines += [_array("horizontalOne", [one] * 7),
+              _array("horizontalMax", [maxHorizontal] * 7),
+              _array("groundOne", [one] * 2),
+              _array("groundMax", [maxGround] * 2),
+              _array("speed", [maxSpeed] * 2),
+              _array("one", [one] * 2),
+              "var horizontal[7]",
+              "var ground[2]",
+              "var x[" + str(amountIn + 1) + "] # sensors, last action, bias",
+              "var h[" + str(amountHiddenAction + 1) + "] # hidden layer of the action network, bias",
+              _array("a", [one] * amountActions, "action, initially 1.0 like GeneticIndividual.reset"),
+              "var motor[2]",
+              "var z",
+              "var i"]
+    if prediction is not None:
+        lines += ["var xr[" + str(amountIn + 2) + "] # sensors, action, bias, last output of one hidden node",
+                  _array("ph", numpy.append(prediction.hiddenOutput, -one), "hidden layer of the prediction network, bias"),
+                  "var p[" + str(amountSensors) + "] # predicted sensor values of the next step"]
+
+    lines += ["",
+              "x[" + str(amountIn) + "] = " + str(-one),
+              "h[" + str(amountHiddenAction) + "] = " + str(-one)]
+    if prediction is not None:
+        lines.append("xr[" + str(amountIn) + "] = " + str(-one))
+    lines += ["timer.period[0] = 100 # same control period as the host loop",
+              "",
+              "onevent timer0",
+              "\t# normalized sensor values and last action",
+              "\tcall math.muldiv(horizontal, prox.horizontal, horizontalOne, horizontalMax)",
+              "\tcall math.muldiv(ground, prox.ground.reflected, groundOne, groundMax)"]
+    for k in range(7):
+        lines.append("\tx[" + str(k) + "] = horizontal[" + str(k) + "]")
+    for k in range(2):
+        lines.append("\tx[" + str(7 + k) + "] = ground[" + str(k) + "]")
+    for k in range(amountActions):
+        lines.append("\tx[" + str(amountSensors + k) + "] = a[" + str(k) + "]")
+
+    lines.append("\t# action network")
+    for k in range(amountHiddenAction):
+        lines.append("\tcall math.dot(z, actionHidden" + str(k) + ", x, " + str(fixed_point.DOT_SHIFT) + ")")
+        _activate(lines, "h[" + str(k) + "]", "tanh")
+    for k in range(amountActions):
+        lines.append("\tcall math.dot(z, actionOut" + str(k) + ", h, " + str(fixed_point.DOT_SHIFT) + ")")
+        _activate(lines, "a[" + str(k) + "]", "tanh")
+
+    if prediction is not None:
+        lines.append("\t# prediction network")
+        for k in range(amountSensors):
+            lines.append("\txr[" + str(k) + "] = x[" + str(k) + "]")
+        for k in range(amountActions):
+            lines.append("\txr[" + str(amountSensors + k) + "] = a[" + str(k) + "]")
+        for k in range(amountHiddenPrediction):
+            lines.append("\txr[" + str(amountIn + 1) + "] = ph[" + str(k) + "]")
+            lines.append("\tcall math.dot(z, predictionHidden" + str(k) + ", xr, " + str(fixed_point.DOT_SHIFT) + ")")
+            _activate(lines, "ph[" + str(k) + "]", "sigmoid")
+        for k in range(amountSensors):
+            lines.append("\tcall math.dot(z, predictionOut" + str(k) + ", ph, " + str(fixed_point.DOT_SHIFT) + ")")
+            _activate(lines, "p[" + str(k) + "]", "sigmoid")
+
+    lines += ["\t# motor values and hardware protection",
+              "\tcall math.muldiv(motor, a, speed, one)",
+              "\tif motor[0] > 0 and motor[1] > 0 then",
+              "\t\tif " + " or ".join(["x[" + str(k) + "] > " + str(fixed_point.HWP_HORIZONTAL) for k in range(5)] + ["x[" + str(k) + "] >= " + str(fixed_point.HWP_GROUND) for k in (7, 8)]) + " then",
+              "\t\t\tmotor[0] = 0",
+              "\t\t\tmotor[1] = 0",
+              "\t\tend",
+              "\tend",
+              "\tif motor[0] < 0 and motor[1] < 0 then",
+              "\t\tif " + " or ".join(["x[" + str(k) + "] > " + str(fixed_point.HWP_HORIZONTAL) for k in (5, 6)] + ["x[" + str(k) + "] >= " + str(fixed_point.HWP_GROUND) for k in (7, 8)]) + " then",
+              "\t\t\tmotor[0] = 0",
+              "\t\t\tmotor[1] = 0",
+              "\t\tend",
+              "\tend",
+              "\tmotor.left.target = motor[0]",
+              "\tmotor.right.target = motor[1]",
+              ""]
+    return "\n".join(lines)
+
+
+def write_aesl(filename, script):
+    """ writes the script to the given file in the .aesl format of Aseba Studio """
+    file = open(filename, "w")
+    file.write('<!DOCTYPE aesl-source>\n<network>\n<keywords flag="true"/>\n<node nodeId="1" name="thymio-II">')
+    file.write(escape(script))
+    file.write("</node>\n</network>\n")
+    file.close()
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option("-g", "--genomes", dest="genomes", default="results/genomes.csv", help="genome file written by the master")
+    parser.add_option("-o", "--output", dest="output", default="results/controller.aesl", help="Aseba file to write")
+    parser.add_option("-p", "--prediction", action="store_true", dest="prediction", default=False, help="also run the prediction network on the Thymio")
+    (options, args) = parser.parse_args()
+
+    genomeAction, genomePrediction = read_king(options.genomes)
+    if not options.prediction:
+        genomePrediction = None
+
+    script = export_script(genomeAction, genomePrediction, parameters.SENSORS, parameters.ACTIONS, parameters.HIDDEN_ACTION, parameters.HIDDEN_PRED,
+                           parameters.MAX_SPEED, int(parameters.MAX_HORIZONTAL_SENSOR), int(parameters.MAX_GROUND_SENSOR))
+    write_aesl(options.output, script)
+    print("exported king of " + options.genomes + " to " + options.output)
@@ -8,6 +8,8 @@ import math
 import os.path
 import numpy as np
 from genetic_population_multiple_real import GeneticPopulation
+from activation import sigmoid_stable, tanh
+from action_cache import ActionCache
 from state import State, write_csv 
 import parameters
 
@@ -17,16 +19,6 @@ from rob import Robot
 # imports for connection
 from clientME import Client
 
-def sigmoid(x):
-    """ returns the value of the sigmoid function evaluated at all elements of x """
-    return 1 / (1 + np.exp(-x))
-    
-    
-def tanh(x):
-    """ returns the value of the sigmoid function evaluated at all elements of x """
-    return np.tanh(x)
-
-
 class Controller():
     """
     Controller for thymio simulation using 1+1 evolution  distributed across a master and his clients
@@ -45,8 +37,13 @@ class Controller():
         """
 
         # create a genetic population
-        self.population = GeneticPopulation(self, parameters.EVAL_TIME, parameters.POST_EVAL_TIME, parameters.RE_EVAL_PROB, parameters.EVALS, parameters.SENSORS, parameters.ACTIONS, parameters.HIDDEN_ACTION, parameters.HIDDEN_PRED, parameters.MUT_RATE, tanh, sigmoid, parameters.RE_EVAL_WEIGHT)
-      
+        self.population = GeneticPopulation(self, parameters.EVAL_TIME, parameters.POST_EVAL_TIME, parameters.RE_EVAL_PROB, parameters.EVALS, parameters.SENSORS, parameters.ACTIONS, parameters.HIDDEN_ACTION, parameters.HIDDEN_PRED, parameters.MUT_RATE, tanh, sigmoid_stable, parameters.RE_EVAL_WEIGHT, parameters.PRECISION, parameters.SHADOW_PREDICTORS, parameters.STEADY_STATE)
+
+        # the client's mutant keeps its networks, new genomes are copied into them and clear the cache
+        self.cache = None
+        if parameters.ACTION_CACHE_RESOLUTION is not None:
+            self.cache = ActionCache(parameters.ACTION_CACHE_RESOLUTION, parameters.ACTION_CACHE_BUDGET)
+            self.population.mutant.actionNetwork.cache = self.cache
         
         if parameters.enableDataTracking:
             # init log file for predictions and sensors
@@ -57,6 +54,10 @@ class Controller():
     
     def getMaster(self):
         return False
+
+    def getClientID(self):
+        """ returns the index the master assigned to this client """
+        return client.clientID
         
     def _log(self, line):
         """ writes the line to the logfile """
@@ -100,6 +101,12 @@ class Controller():
         else: # no action if eval time is over 
             motor = [0,0]
 
+            # log cache statistics once per evaluation
+            if self.cache is not None and self.cache.lookups() > 0:
+                if parameters.enableDataTracking:
+                    write_csv("results/cache", str(self.cache.hits) + "," + str(self.cache.misses) + "," + str(self.cache.evictions) + "," + str(len(self.cache)))
+                self.cache.resetStatistics()
+
         # set motor values
         robot.setMotorValues(motor[0], motor[1])
 
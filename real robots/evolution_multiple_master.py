@@ -8,6 +8,7 @@ import math
 import os.path
 import numpy as np
 from genetic_population_multiple_real import GeneticPopulation
+from activation import sigmoid_stable, tanh
 from state import State, write_csv 
 import parameters
 
@@ -17,16 +18,6 @@ from rob import Robot
 # imports for connection
 from serverMe import Server
 
-def sigmoid(x):
-    """ returns the value of the sigmoid function evaluated at all elements of x """
-    return 1 / (1 + np.exp(-x))
-    
-    
-def tanh(x):
-    """ returns the value of the sigmoid function evaluated at all elements of x """
-    return np.tanh(x)
-
-
 class Controller():
     """
     Controller for thymio simulation using 1+1 evolution  distributed across a master and his clients
@@ -52,7 +43,7 @@ class Controller():
         """ 
 
         # create a genetic population
-        self.population = GeneticPopulation(self, parameters.EVAL_TIME, parameters.POST_EVAL_TIME, parameters.RE_EVAL_PROB, parameters.EVALS, parameters.SENSORS, parameters.ACTIONS, parameters.HIDDEN_ACTION, parameters.HIDDEN_PRED, parameters.MUT_RATE, tanh, sigmoid, parameters.RE_EVAL_WEIGHT)
+        self.population = GeneticPopulation(self, parameters.EVAL_TIME, parameters.POST_EVAL_TIME, parameters.RE_EVAL_PROB, parameters.EVALS, parameters.SENSORS, parameters.ACTIONS, parameters.HIDDEN_ACTION, parameters.HIDDEN_PRED, parameters.MUT_RATE, tanh, sigmoid_stable, parameters.RE_EVAL_WEIGHT, parameters.PRECISION, parameters.SHADOW_PREDICTORS, parameters.STEADY_STATE)
 
         # init log files
         self.filename = "results/run"
@@ -72,6 +63,9 @@ class Controller():
             write_csv("results/parameters", "mutateRate," + str(self.population.mutateRate))
             write_csv("results/parameters", "transferFuncAction,tanh")
             write_csv("results/parameters", "transferFuncPred,sigmoid")
+            write_csv("results/parameters", "precision," + parameters.PRECISION)
+            write_csv("results/parameters", "shadowPredictors," + str(parameters.SHADOW_PREDICTORS))
+            write_csv("results/parameters", "steadyState," + str(parameters.STEADY_STATE))
             
             self._log("SEP=,")
             self._log("king,mutant")
@@ -87,9 +81,12 @@ class Controller():
         """ writes the line to the logfile """
         write_csv(self.filename, line)
 
-    def emit(self, msg):
-        """ sends a message """
-        server.sendBroadcast(msg)
+    def emit(self, msg, client=None):
+        """ sends a message to all clients or only to the client with the given index """
+        if client is None:
+            server.sendBroadcast(msg)
+        else:
+            server.send(client, msg)
 
     def receive(self):
         # read buffer of incomming messages
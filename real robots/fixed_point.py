@@ -0,0 +1,235 @@
+"""
+Minimize Surprise - fixed point inference
+
+Bit-exact Python reference of the 16 bit integer forward pass that runs natively on the Thymio (see aseba_export.py).
+All values are fixed point numbers with FRACTION_BITS fractional bits (1024 represents 1.0), stored as int16 like Aseba variables.
+
+Only the operations the Aseba virtual machine offers are used:
+math.dot -- dot product of two int16 arrays, summed up in 32 bit and shifted right afterwards
+math.muldiv -- elementwise a * b / c with a 32 bit intermediate result, truncated towards zero
+lookup tables -- activation functions are looked up in a table of tanh values, sigmoid is derived from it
+"""
+
+import numpy
+
+FRACTION_BITS = 10 # fixed point format Q5.10: 1.0 is represented by 1024
+ONE = 1 << FRACTION_BITS
+TABLE_BITS = 4 # resolution of the activation table: 1/16
+TABLE_SIZE = 256 # the table covers [-8, 8)
+TABLE_OFFSET = TABLE_SIZE // 2
+DOT_SHIFT = 2 * FRACTION_BITS - TABLE_BITS # shifts a product of two fixed point numbers to table index units
+
+
+def _wrap(values, bits):
+    """ returns the given integers wrapped to signed integers with the given amount of bits, like a C cast """
+    values = numpy.asarray(values, dtype=numpy.int64)
+    return (values + (1 << (bits - 1))) % (1 << bits) - (1 << (bits - 1))
+
+
+def quantize(values):
+    """ returns the given real numbers as fixed point int16 numbers, rounded to nearest and saturated """
+    return numpy.clip(numpy.rint(numpy.asarray(values) * ONE), -32768, 32767).astype(numpy.int16)
+
+
+def dot(weights, vector, shift=DOT_SHIFT):
+    """ returns the result of Aseba's math.dot for every row of *weights* with *vector* as int16 array
+
+    Arguments:
+    weights -- int16 matrix, one row per dot product
+    vector -- int16 vector with as many entries as *weights* has columns
+    shift -- amount of bits the 32 bit sums are shifted right
+
+    """
+    sums = _wrap(numpy.asarray(weights, dtype=numpy.int64).dot(numpy.asarray(vector, dtype=numpy.int64)), 32)
+    return _wrap(sums >> shift, 16).astype(numpy.int16)
+
+
+def muldiv(a, b, c):
+    """ returns the result of Aseba's math.muldiv: a * b / c computed elementwise in 32 bit and truncated towards zero """
+    product = _wrap(numpy.asarray(a, dtype=numpy.int64) * numpy.asarray(b, dtype=numpy.int64), 32)
+    c = numpy.asarray(c, dtype=numpy.int64)
+    quotient = numpy.abs(product) // numpy.abs(c) * numpy.sign(product) * numpy.sign(c)
+    return _wrap(quotient, 16).astype(numpy.int16)
+
+
+def tanh_table():
+    """ returns the activation lookup table: tanh sampled at the centres of TABLE_SIZE intervals of width 2^-TABLE_BITS """
+    centres = (numpy.arange(TABLE_SIZE) - TABLE_OFFSET + 0.5) / (1 << TABLE_BITS)
+    return quantize(numpy.tanh(centres))
+
+
+TABLE = tanh_table()
+
+
+def _lookup(index):
+    """ returns the table entries for the given (not yet saturated) table indices """
+    return TABLE[numpy.clip(numpy.asarray(index, dtype=numpy.int64) + TABLE_OFFSET, 0, TABLE_SIZE - 1)]
+
+
+def tanh(z):
+    """ returns tanh of z given in table index units (2^-TABLE_BITS) as fixed point number """
+    return _lookup(z)
+
+
+def sigmoid(z):
+    """ returns sigmoid of z given in table index units as fixed point number, using sigmoid(z) = (1 + tanh(z / 2)) / 2 """
+    return ((_lookup(numpy.asarray(z, dtype=numpy.int64) >> 1).astype(numpy.int32) + ONE) >> 1).astype(numpy.int16)
+
+
+ACTIVATIONS = {"tanh": tanh, "sigmoid": sigmoid}
+
+
+class FixedPointActionNetwork:
+    """ fixed point version of *ActionNetwork*
+
+    Usage:
+    Create the network from a genome in the format of *ActionNetwork.toGenome*.
+    Then call *input* with an int16 vector of *amountIn* fixed point values in order to retrieve the fixed point outputs.
+
+    """
+
+    def __init__(self, amountIn, amountHidden, amountOut, activation, genome):
+        """ quantizes the weights of given genome
+
+        Arguments:
+        amountIn -- amount of input values (without bias)
+        amountHidden -- amount of hidden nodes in the only hidden layer
+        amountOut -- amount of output values
+        activation -- name of the activation function, "tanh" or "sigmoid"
+        genome -- real valued genome in the format of *ActionNetwork.toGenome*
+
+        """
+        self.amountIn = amountIn + 1
+        self.amountHidden = amountHidden
+        self.amountOut = amountOut
+        self.activation = activation
+        self.activationFunction = ACTIVATIONS[activation]
+
+        genome = quantize(genome)
+        self.hidden = genome[:self.amountHidden*self.amountIn].reshape(self.amountHidden, self.amountIn)
+        self.out = genome[self.amountHidden*self.amountIn:].reshape(self.amountOut, self.amountHidden+1)
+
+    def input(self, vector):
+        """ returns the fixed point outputs for the given fixed point input vector """
+        vector = numpy.append(vector, -ONE) # bias
+        tmp = numpy.append(self.activationFunction(dot(self.hidden, vector)), -ONE) # bias for calculation of outputs
+
+        return self.activationFunction(dot(self.out, tmp))
+
+
+class FixedPointPredictionNetwork:
+    """ fixed point version of *PredictionNetwork*
+
+    The self-recurrence is part of each hidden node's dot product: the weights of node i are extended by its recurrent weight
+    and the input vector by the last output of node i, so the recurrence is rounded together with the other inputs.
+
+    Usage:
+    Create the network from a genome in the format of *PredictionNetwork.toGenome*.
+    Then call *input* with an int16 vector of *amountIn* fixed point values in order to retrieve the fixed point outputs.
+
+    """
+
+    def __init__(self, amountIn, amountHidden, amountOut, activation, genome):
+        """ quantizes the weights and the initial hidden layer output of given genome
+
+        Arguments:
+        amountIn -- amount of input values (without bias)
+        amountHidden -- amount of hidden nodes in the only hidden layer
+        amountOut -- amount of output values
+        activation -- name of the activation function, "tanh" or "sigmoid"
+        genome -- real valued genome in the format of *PredictionNetwork.toGenome*
+
+        """
+        self.amountIn = amountIn + 1
+        self.amountHidden = amountHidden
+        self.amountOut = amountOut
+        self.activation = activation
+        self.activationFunction = ACTIVATIONS[activation]
+
+        genome = quantize(genome)
+        lengthHidden = self.amountHidden * self.amountIn
+        self.hidden = genome[:lengthHidden].reshape(self.amountHidden, self.amountIn)
+        self.recurrent = genome[lengthHidden : lengthHidden + self.amountHidden]
+        self.hiddenOutput = genome[lengthHidden + self.amountHidden : lengthHidden + 2 * self.amountHidden].copy()
+        self.out = genome[lengthHidden + 2 * self.amountHidden:].reshape(self.amountOut, self.amountHidden+1)
+
+    def input(self, vector):
+        """ returns the fixed point outputs for the given fixed point input vector and updates the hidden layer output """
+        vector = numpy.append(vector, -ONE) # bias
+        z = numpy.array([dot(numpy.append(self.hidden[i], self.recurrent[i]), numpy.append(vector, self.hiddenOutput[i])) for i in range(self.amountHidden)])
+        self.hiddenOutput = self.activationFunction(z)
+        tmp = numpy.append(self.hiddenOutput, -ONE) # bias
+
+        return self.activationFunction(dot(self.out, tmp))
+
+
+class FixedPointController:
+    """ fixed point reference of the complete control step of the exported Aseba script
+
+    Usage:
+    Create the controller from the genomes of a king, then call *step* with the raw Thymio sensor values every control period.
+
+    """
+
+    def __init__(self, genomeAction, genomePrediction, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, maxSpeed, maxHorizontal, maxGround):
+        """ creates action and prediction network from the given genomes
+
+        Arguments:
+        genomeAction -- genome of the action network
+        genomePrediction -- genome of the prediction network, None to skip predictions
+        amountSensors -- amount of sensors (7 horizontal and 2 ground sensors)
+        amountActions -- amount of actions (2 wheels)
+        amountHiddenAction -- amount of hidden nodes in the action network
+        amountHiddenPrediction -- amount of hidden nodes in the prediction network
+        maxSpeed -- motor target corresponding to an action of 1.0
+        maxHorizontal -- raw value of a horizontal sensor corresponding to 1.0
+        maxGround -- raw value of a ground sensor corresponding to 1.0
+
+        """
+        self.amountSensors = amountSensors
+        self.maxSpeed = maxSpeed
+        self.maxHorizontal = maxHorizontal
+        self.maxGround = maxGround
+
+        self.actionNetwork = FixedPointActionNetwork(amountSensors + amountActions, amountHiddenAction, amountActions, "tanh", genomeAction)
+        self.predictionNetwork = None
+        if genomePrediction is not None:
+            self.predictionNetwork = FixedPointPredictionNetwork(amountSensors + amountActions, amountHiddenPrediction, amountSensors, "sigmoid", genomePrediction)
+
+        self.givenAction = numpy.full(amountActions, ONE, dtype=numpy.int16) # like GeneticIndividual.reset
+        self.prediction = None
+
+    def sensors(self, horizontal, ground):
+        """ returns the fixed point sensor vector for the raw horizontal and ground sensor values """
+        return numpy.concatenate((muldiv(horizontal, ONE, self.maxHorizontal), muldiv(ground, ONE, self.maxGround)))
+
+    def step(self, horizontal, ground):
+        """ returns the motor targets for the raw sensor values, the prediction for the next step is stored in *prediction* """
+        sensors = self.sensors(horizontal, ground)
+
+        self.givenAction = self.actionNetwork.input(numpy.concatenate((sensors, self.givenAction)))
+        if self.predictionNetwork is not None:
+            self.prediction = self.predictionNetwork.input(numpy.concatenate((sensors, self.givenAction)))
+
+        motor = muldiv(self.givenAction, self.maxSpeed, ONE)
+        if hwp(motor, sensors):
+            return numpy.zeros(2, dtype=numpy.int16)
+        return motor
+
+
+HWP_HORIZONTAL = int(quantize(0.75)) # horizontal obstacle threshold of the real robots' hardware protection
+HWP_GROUND = int(numpy.ceil(0.55 * ONE)) # ground threshold of the real robots' hardware protection
+
+
+def hwp(motor, sensors):
+    """ returns True iff the hardware protection of the real robots stops the robot
+
+    Driving straight or along a large turning radius is equivalent to both motors having the same sign,
+    so the check of *Controller._hwp* reduces to the sign of the motor targets.
+
+    """
+    if motor[0] > 0 and motor[1] > 0:
+        return bool(numpy.any(sensors[:5] > HWP_HORIZONTAL) or numpy.any(sensors[7:] >= HWP_GROUND))
+    if motor[0] < 0 and motor[1] < 0:
+        return bool(numpy.any(sensors[5:7] > HWP_HORIZONTAL) or numpy.any(sensors[7:] >= HWP_GROUND))
+    return False
@@ -0,0 +1,110 @@
+import re
+import unittest
+import numpy
+import fixed_point
+import aseba_export
+from genetic_individual import GeneticIndividual
+from activation import tanh, sigmoid
+
+
+def run_script(script, horizontal, ground):
+    """ runs the timer event of an exported Aseba script once per sensor reading and returns the motor targets and predictions
+
+    Only the subset of Aseba generated by *aseba_export.export_script* is translated to Python.
+
+    """
+    init, event = [], []
+    target = init
+    for line in script.split("\n"):
+        line = line.split("#")[0].rstrip()
+        indent = len(line) - len(line.lstrip("\t"))
+        line = line.strip()
+        line = line.replace("prox.ground.reflected", "proxGround").replace("prox.horizontal", "proxHorizontal")
+        line = line.replace("motor.left.target", "motorLeft").replace("motor.right.target", "motorRight")
+        if line == "" or line == "end" or line.startswith("timer.period"):
+            continue
+        if line == "onevent timer0":
+            target = event
+            continue
+        declaration = re.match(r"var (\w+)(\[(\d+)\])?( = (\[.*\]))?$", line)
+        call = re.match(r"call math\.(\w+)\((.*)\)$", line)
+        if declaration:
+            name, size, values = declaration.group(1), declaration.group(3), declaration.group(5)
+            line = name + " = " + (values if values else "[0] * " + size if size else "0")
+        elif call and call.group(1) == "dot":
+            result, a, b, shift = call.group(2).split(", ")
+            line = result + " = int(fixed_point.dot([" + a + "], " + b + ", " + shift + ")[0])"
+        elif call and call.group(1) == "muldiv":
+            result, a, b, c = call.group(2).split(", ")
+            line = result + "[:] = [int(v) for v in fixed_point.muldiv(" + a + ", " + b + ", " + c + ")]"
+        elif line.startswith("if "):
+            line = line[:-len(" then")] + ":"
+        target.append("    " * indent + line)
+
+    variables = {"fixed_point": fixed_point}
+    exec("\n".join(init), variables)
+    motors, predictions = [], []
+    for h, g in zip(horizontal, ground):
+        variables["proxHorizontal"] = [int(v) for v in h]
+        variables["proxGround"] = [int(v) for v in g]
+        exec("if True:\n" + "\n".join(event), variables)
+        motors.append([variables["motorLeft"], variables["motorRight"]])
+        predictions.append(list(variables.get("p", [])))
+    return numpy.array(motors), numpy.array(predictions)
+
+
+class FixedPointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.individual = GeneticIndividual(9, 2, 7, 10, tanh, sigmoid)
+        self.genomeAction = self.individual.actionNetwork.toGenome().copy()
+        self.genomePrediction = self.individual.predictionNetwork.toGenome().copy()
+        self.horizontal = numpy.random.randint(0, 4500, (50, 7))
+        self.ground = numpy.random.randint(0, 1023, (50, 2))
+
+    def test_operations(self):
+        self.assertEqual(fixed_point.quantize(0.5), 512)
+        self.assertEqual(fixed_point.quantize(100), 32767)
+        self.assertEqual(fixed_point.dot([[1024, -1024]], [512, 1024], 10)[0], -512)
+        self.assertEqual(fixed_point.dot([[-1]], [1], 1)[0], -1) # arithmetic shift rounds towards minus infinity
+        self.assertEqual(fixed_point.muldiv(-3, 1, 2), -1) # division truncates towards zero
+        self.assertEqual(fixed_point.muldiv(4500, 1024, 4500), 1024)
+
+    def test_activation(self):
+        z = numpy.arange(-200, 200)
+        self.assertTrue(numpy.all(numpy.abs(fixed_point.tanh(z) / 1024 - numpy.tanh(z / 16)) < 0.035))
+        self.assertTrue(numpy.all(numpy.abs(fixed_point.sigmoid(z) / 1024 - sigmoid(z / 16)) < 0.035))
+
+    def test_controller(self):
+        controller = fixed_point.FixedPointController(self.genomeAction, self.genomePrediction, 9, 2, 7, 10, 500, 4500, 1023)
+        errorAction, errorPrediction = [], []
+        for h, g in zip(self.horizontal, self.ground):
+            sensors = numpy.concatenate((h / 4500, g / 1023)).reshape(9, 1)
+            controller.step(h, g)
+            action = self.individual.action(sensors)
+            prediction = self.individual.predict(sensors)
+            self.individual.storeSensor(sensors)
+            errorAction.append(numpy.abs(controller.givenAction / 1024 - action.ravel()))
+            errorPrediction.append(numpy.abs(controller.prediction / 1024 - prediction.ravel()))
+
+        self.assertLess(numpy.mean(errorAction), 0.05)
+        self.assertLess(numpy.mean(errorPrediction), 0.05)
+
+    def test_export(self):
+        script = aseba_export.export_script(self.genomeAction, self.genomePrediction, 9, 2, 7, 10, 500, 4500, 1023)
+        controller = fixed_point.FixedPointController(self.genomeAction, self.genomePrediction, 9, 2, 7, 10, 500, 4500, 1023)
+        motors, predictions = run_script(script, self.horizontal, self.ground)
+        for k, (h, g) in enumerate(zip(self.horizontal, self.ground)):
+            self.assertEqual(list(motors[k]), list(controller.step(h, g)))
+            self.assertEqual(list(predictions[k]), list(controller.prediction))
+
+        script = aseba_export.export_script(self.genomeAction, None, 9, 2, 7, 10, 500, 4500, 1023)
+        self.assertNotIn("predictionHidden", script)
+        controller = fixed_point.FixedPointController(self.genomeAction, None, 9, 2, 7, 10, 500, 4500, 1023)
+        motors, _ = run_script(script, self.horizontal, self.ground)
+        for k, (h, g) in enumerate(zip(self.horizontal, self.ground)):
+            self.assertEqual(list(motors[k]), list(controller.step(h, g)))
+
+
+if __name__ == '__main__':
+    unittest.main()
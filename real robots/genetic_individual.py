@@ -1,7 +1,10 @@
-import random
 import numpy
 from action_network import ActionNetwork
-from prediction_network import PredictionNetwork
+from prediction_network import PredictionNetwork, PredictionNetworkBank
+
+PREDICTION_BUFFER = 2 # amount of predictions that may wait for their actual sensor values
+MUTATION_STRENGTH = 0.4 # mutated genes are shifted by uniform noise in [-MUTATION_STRENGTH, MUTATION_STRENGTH)
+generator = numpy.random.default_rng() # random generator used for mutations
 
 class GeneticIndividual:
     """ represents an individual in a genetic population
@@ -17,10 +20,23 @@ class GeneticIndividual:
     Therefore it is crucial to call *action* before calling *predict*!
     Also make sure that before calling *evaluate* you have called *action*, *predict* and *storeSensor* the same amount of times.
 
+    Predictions wait in a small ring buffer until the matching sensor values are stored, the score is accumulated right away.
+    Thus memory stays bounded and *evaluate* takes constant time regardless of the evaluation length.
+
+    The genomes of both networks are views to one contiguous genome buffer owned by the individual.
+
+    Optionally a bank of shadow prediction networks (see *setShadowPredictors*) is stepped next to the active prediction network.
+    The shadows see the same sensor values and actions but never influence the behavior, *evaluateShadows* returns their scores.
+
     """
 
-    def __init__(self, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, activationFunctionAction, activationFunctionPrediction):
-        """ creates a new individual with random weights
+    __slots__ = ("amountSensors", "amountActions", "amountHiddenAction", "amountHiddenPrediction",
+                 "activationFunctionAction", "activationFunctionPrediction", "dtype", "genome", "actionNetwork", "predictionNetwork",
+                 "pendingPredictions", "error", "givenAction", "pendingStart", "pendingCount", "scoreSum", "storedSensors",
+                 "shadowBank", "shadowPredictions", "shadowScoreSums")
+
+    def __init__(self, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, activationFunctionAction, activationFunctionPrediction, genome=None, dtype=numpy.float64):
+        """ creates a new individual with random weights or the weights of given genome
 
         An individual has an action network and a prediction network.
         The amount of input values for the action and prediction networks is the sum of both the *amountSensors* and the *amountActions*.
@@ -34,6 +50,8 @@ class GeneticIndividual:
         amountHiddenPrediction -- amount of hidden nodes in the prediction network
         activationFunctionAction -- activation function used in the action network
         activationFunctionPrediction -- activation function used in the prediction network
+        genome -- optional genome in the format of *toGenome* used as genome buffer (not copied unless its type differs from *dtype*), no random weights are drawn in this case
+        dtype -- floating point type of the genome and of all network computations, numpy.float64 or numpy.float32
 
         """
 
@@ -44,62 +62,162 @@ class GeneticIndividual:
 
         self.activationFunctionAction = activationFunctionAction
         self.activationFunctionPrediction = activationFunctionPrediction
+        self.dtype = numpy.dtype(dtype)
+
+        amountIn = amountSensors + amountActions
+        lengthAction = amountHiddenAction * (amountIn + 1) + amountActions * (amountHiddenAction + 1)
+        lengthPrediction = amountHiddenPrediction * (amountIn + 3) + amountSensors * (amountHiddenPrediction + 1)
 
-        self.actionNetwork = ActionNetwork((amountSensors + amountActions), amountHiddenAction, amountActions, activationFunctionAction)
-        self.predictionNetwork = PredictionNetwork((amountSensors + amountActions), amountHiddenPrediction, amountSensors, activationFunctionPrediction)
+        if genome is None:
+            self.genome = (2 * numpy.random.rand(lengthAction + lengthPrediction) - 1).astype(self.dtype) # random weights in [-1,1)
+        else:
+            self.genome = numpy.ascontiguousarray(genome, dtype=self.dtype)
+
+        # both networks store their weights in views to the genome buffer
+        self.actionNetwork = ActionNetwork(amountIn, amountHiddenAction, amountActions, activationFunctionAction, self.genome[:lengthAction], self.dtype)
+        self.predictionNetwork = PredictionNetwork(amountIn, amountHiddenPrediction, amountSensors, activationFunctionPrediction, self.genome[lengthAction:], self.dtype)
+
+        self.pendingPredictions = numpy.empty((PREDICTION_BUFFER, amountSensors, 1), self.dtype) # ring buffer of predictions without sensor values yet
+        self.error = numpy.empty((amountSensors, 1), self.dtype)
+        self.shadowBank = None
 
         self.reset()
 
     def action(self, input):
-        """ inputs given vector to the action network and returns network's output """
-        vector = numpy.concatenate((input, self.givenAction), 0)  
-        self.givenAction = self.actionNetwork.input(vector)
+        """ inputs given vector and last given action to the action network and returns network's output
+
+        The input is written directly to the preallocated input vector of the network, the returned vector is reused in the next time step.
+
+        """
+        vector = self.actionNetwork.inputVector
+        vector[:self.amountSensors] = input
+        vector[self.amountSensors:-1] = self.givenAction
+        numpy.copyto(self.givenAction, self.actionNetwork.forward())
         return self.givenAction
 
     def predict(self, input):
-        """ inputs given vector and last given action to the prediction network and returns network's output """
-        vector = numpy.concatenate((input, self.givenAction), 0)  
-        self.givenPredictions.append(self.predictionNetwork.input(vector))
+        """ inputs given vector and last given action to the prediction network and returns network's output
 
-        return self.givenPredictions[-1]
+        The returned vector stays valid until *PREDICTION_BUFFER* further predictions were made.
+
+        """
+        if self.pendingCount == PREDICTION_BUFFER:
+            raise RuntimeError("too many predictions without actual sensor values, call storeSensor first")
+
+        vector = self.predictionNetwork.inputVector
+        vector[:self.amountSensors] = input
+        vector[self.amountSensors:self.amountSensors+self.amountActions] = self.givenAction
+
+        slot = (self.pendingStart + self.pendingCount) % PREDICTION_BUFFER
+        prediction = self.pendingPredictions[slot]
+        numpy.copyto(prediction, self.predictionNetwork.forward())
+        if self.shadowBank is not None:
+            numpy.copyto(self.shadowPredictions[slot], self.shadowBank.input(vector[:-1]))
+        self.pendingCount += 1
+
+        return prediction
 
     def storeSensor(self, sensor):
-        """ stores the actual sensor values for currently given prediction """
-        self.actualSensor.append(sensor)
+        """ compares the actual sensor values with the oldest pending prediction and accumulates the score """
+        if self.pendingCount == 0:
+            raise RuntimeError("no prediction for the given sensor values, call predict first")
+
+        # 1 - absolute error, summed over all sensors
+        numpy.subtract(self.pendingPredictions[self.pendingStart], sensor, out=self.error)
+        numpy.absolute(self.error, out=self.error)
+        self.scoreSum += self.amountSensors - self.error.sum()
+        self.storedSensors += 1
+
+        if self.shadowBank is not None:
+            errors = numpy.absolute(self.shadowPredictions[self.pendingStart] - sensor)
+            self.shadowScoreSums += self.amountSensors - errors.sum(axis=(1, 2))
+
+        self.pendingStart = (self.pendingStart + 1) % PREDICTION_BUFFER
+        self.pendingCount -= 1
 
     def reset(self):
-        """ resets stored given predictions and actual sensor data """
-        self.givenAction = numpy.ones((self.amountActions, 1))
-        self.actualSensor = []
-        self.givenPredictions = []
+        """ resets pending predictions, the accumulated score and the hidden states of the prediction networks """
+        self.predictionNetwork.reset()
+        if self.shadowBank is not None:
+            self.shadowBank.reset()
+        self.givenAction = numpy.ones((self.amountActions, 1), self.dtype)
+        self.pendingStart = 0
+        self.pendingCount = 0
+        self.scoreSum = 0.0
+        self.storedSensors = 0
+        if self.shadowBank is not None:
+            self.shadowScoreSums[:] = 0
 
     def evaluate(self):
         """ returns fitness value of this individual according to predicted and actual sensor data """
-        #diffVectorArray = [1 - numpy.square((self.givenPredictions[i] - self.actualSensor[i])) for i in range(len(self.actualSensor))]
         # 1 - mean absolute error 
-        diffVectorArray = [1 - numpy.absolute((self.givenPredictions[i] - self.actualSensor[i])) for i in range(len(self.actualSensor))]
-        diffArray = [numpy.sum(x) for x in diffVectorArray]
-        diff = sum(diffArray)
+        return self.scoreSum / (self.storedSensors * self.amountSensors)
+
+    def scoreBound(self, length):
+        """ returns the highest fitness value *evaluate* can return once *length* sensor values are stored, given the ones stored so far
 
-        return diff / (len(self.actualSensor) * self.amountSensors)
+        Every sensor value still to come adds at most 1 per sensor to the score, if it is predicted perfectly.
+
+        """
+        return (self.scoreSum + (length - self.storedSensors) * self.amountSensors) / (length * self.amountSensors)
+
+    def shadowGenomes(self, amount, rate, seed):
+        """ returns *amount* mutated copies of the prediction network's genome as (amount, genome length) matrix
+
+        The mutations are drawn from a generator initialized with *seed*, so every robot derives the same shadow predictors from the same genome and seed.
+
+        Arguments:
+        amount -- amount of mutated genomes
+        rate -- probability for each number in the genome to be mutated, see *mutate*
+        seed -- seed of the random generator
+
+        """
+        shadowGenerator = numpy.random.default_rng(seed)
+        genome = self.predictionNetwork.toGenome()
+        mask = shadowGenerator.random((amount, genome.size)) < rate
+        return genome + mask * shadowGenerator.uniform(-MUTATION_STRENGTH, MUTATION_STRENGTH, (amount, genome.size))
+
+    def setShadowPredictors(self, genomes):
+        """ steps the prediction networks of the given genomes next to the active prediction network from now on
+
+        Arguments:
+        genomes -- matrix with one prediction genome per row (see *shadowGenomes*), None removes all shadow predictors
+
+        """
+        if genomes is None:
+            self.shadowBank = None
+            return
+
+        self.shadowBank = PredictionNetworkBank(self.amountSensors + self.amountActions, self.amountHiddenPrediction, self.amountSensors, self.activationFunctionPrediction, genomes, self.dtype)
+        self.shadowPredictions = numpy.empty((PREDICTION_BUFFER, self.shadowBank.amountNetworks, self.amountSensors, 1), self.dtype)
+        self.shadowScoreSums = numpy.zeros(self.shadowBank.amountNetworks)
+
+    def evaluateShadows(self):
+        """ returns the fitness values of all shadow predictors as numpy vector, computed like *evaluate* """
+        return self.shadowScoreSums / (self.storedSensors * self.amountSensors)
+
+    def toGenome(self):
+        """ returns the genome of this individual: the genome of the action network followed by the one of the prediction network
+
+        This is the genome buffer itself and not a copy. It only changes when it is written to, not while the individual runs.
+
+        """
+        return self.genome
+
+    def copy(self):
+        """ returns a new individual with a copy of this individual's genome """
+        return GeneticIndividual(self.amountSensors, self.amountActions, self.amountHiddenAction, self.amountHiddenPrediction, self.activationFunctionAction, self.activationFunctionPrediction, self.genome.copy(), self.dtype)
 
     def mutate(self, rate):
         """ mutates a copy of this individual and returns it
 
+        All genes are mutated at once: a random mask selects the genes to be mutated, which are shifted by uniform noise.
+
         Arguments:
         rate -- a real number in [0,1) specifiying the probability for each number in genome to be mutated; should not be much greater than 0.3
 
         """
-        genomeAction = self.actionNetwork.toGenome()
-        genomePrediction = self.predictionNetwork.toGenome()
-
-        # mutate
-        genomeAction = [x if random.random()>=rate else x + random.uniform(-0.4, 0.4) for x in genomeAction]
-        genomePrediction = [x if random.random()>=rate else x + random.uniform(-0.4, 0.4) for x in genomePrediction]
-
-        # recombine
-        copy = GeneticIndividual(self.amountSensors, self.amountActions, self.amountHiddenAction, self.amountHiddenPrediction, self.activationFunctionAction, self.activationFunctionPrediction)
-        copy.actionNetwork.fromGenome(numpy.array(genomeAction))
-        copy.predictionNetwork.fromGenome(numpy.array(genomePrediction))
+        mask = generator.random(self.genome.size) < rate
+        genome = self.genome + mask * generator.uniform(-MUTATION_STRENGTH, MUTATION_STRENGTH, self.genome.size)
 
-        return copy
+        return GeneticIndividual(self.amountSensors, self.amountActions, self.amountHiddenAction, self.amountHiddenPrediction, self.activationFunctionAction, self.activationFunctionPrediction, genome, self.dtype)
@@ -3,6 +3,7 @@ import numpy
 import random
 import parameters
 from genetic_individual import GeneticIndividual
+from steady_state import SteadyState
 #from controller import Supervisor
 from state import State, write_csv
 import time
@@ -20,10 +21,12 @@ class GeneticPopulation:
 
     If this instance is running on the master:
         After that you only need to call *execute_master* at every time step.
+        In the asynchronous steady-state mode every client gets the next candidate as soon as it sent its score (see *SteadyState*),
+        the king is updated whenever all scores of a candidate arrived.
 
     """
 
-    def __init__(self, controller, maxAge, postEvalTime, reEval, evals, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, mutateRate, activationFunctionAction, activationFunctionPrediction, reEvalWeight):
+    def __init__(self, controller, maxAge, postEvalTime, reEval, evals, amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, mutateRate, activationFunctionAction, activationFunctionPrediction, reEvalWeight, dtype=numpy.float64, shadowPredictors=0, steadyState=0):
         """ initializes a population with a king and a mutant
 
         The population consists of a king (the best seen mutant so far) and a currently being tested mutant. Both are instances of the *GeneticIndividual* class.
@@ -44,6 +47,9 @@ class GeneticPopulation:
         activationFunctionAction -- activation function used in the action networks (needed for the genetical individuals)
         activationFunctionPrediction -- activation function used in the prediction networks (needed for the genetical individuals)
         reEvalWeight -- weight of newly determined score after re-evaluating king; old score weighted with (1-reEvalWeight) 
+        dtype -- floating point type used for genomes and inference, numpy.float64 or numpy.float32 (needed for the genetical individuals)
+        shadowPredictors -- amount of mutated prediction networks evaluated next to each new mutant's prediction network, the best one replaces it if it scores higher
+        steadyState -- amount of clients evaluating each candidate in the asynchronous steady-state mode, 0 keeps generations
         """
 
         self.MASTER_WAIT_PUFFER = 20 # puffer for waiting for delayed messages (in timesteps)
@@ -55,9 +61,12 @@ class GeneticPopulation:
         self.evals = evals
         self.evalNo = -1
         self.mutateRate = mutateRate
+        self.shadowPredictors = shadowPredictors
+        self.shadowSeed = None # seed of the shadow predictors of the mutant being evaluated, None if there are none
+        self.steadyState = SteadyState(steadyState) if steadyState > 0 else None
         
         # first king and first mutant 
-        self.king = GeneticIndividual(amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, activationFunctionAction, activationFunctionPrediction)
+        self.king = GeneticIndividual(amountSensors, amountActions, amountHiddenAction, amountHiddenPrediction, activationFunctionAction, activationFunctionPrediction, dtype=dtype)
         self.mutant = self.king.mutate(self.mutateRate)
         
         self.scoreKing = 0
@@ -78,6 +87,7 @@ class GeneticPopulation:
         if self.controller.getMaster() == True:
             #self.state = State.INIT
             self.evaluationScores = []
+            self.shadowScores = []
  
     def set_evaluation_listener(self, listener):
         """
@@ -109,10 +119,12 @@ class GeneticPopulation:
             if parameters.enableDataTracking:
                 self.evaluation_listener(-2,-2)
             self.evaluationScores = []
+            self.shadowScores = []
             
         else: 
             # calculate total score
             self.scoreMutant = sum(self.evaluationScores) / len(self.evaluationScores)
+            self._select_shadow(self.mutant, self.shadowSeed, self.shadowScores)
         
             # calculate score for re-evaluation case 
             if self.scoreTemp is not None:
@@ -135,6 +147,7 @@ class GeneticPopulation:
                     write_csv(self.filename, line) 
              
             self.evaluationScores = []
+            self.shadowScores = []
         
             # re-evalate with a chance of reEval percent 
             if random.random() < self.reEval: 
@@ -149,13 +162,7 @@ class GeneticPopulation:
             
         # POST EVALUATION  
         if self.evalCount == self.evals:
-            self.mutant = self.king
-            self.mutant.reset()
-            self.scoreKing = -1 
-            self.scoreTemp = None # don't calculate mixed score 
-            self.maxAge = self.postEvalTime # extend period for re-eval / video 
-            self.POST_EVAL = 1
-            print("Post Evaluation")
+            self._start_post_evaluation()
 
         if self.evalCount != self.evals+1:   
             self._distribute(self.mutant, fail)
@@ -164,24 +171,142 @@ class GeneticPopulation:
                 print("STOP")
             self.state = State.STOP
         
+    def _start_post_evaluation(self):
+        """ makes all clients test the king for the length of the post-evaluation, the genome still has to be distributed """
+        self.mutant = self.king
+        self.mutant.reset()
+        self.scoreKing = -1 
+        self.scoreTemp = None # don't calculate mixed score 
+        self.maxAge = self.postEvalTime # extend period for re-eval / video 
+        self.POST_EVAL = 1
+        print("Post Evaluation")
+
+    def _select_shadow(self, mutant, shadowSeed, shadowScores):
+        """ replaces the mutant's prediction network by the best shadow predictor if that one scored higher
+
+        Arguments:
+        mutant -- the evaluated mutant
+        shadowSeed -- seed of the shadow predictors distributed with the mutant, None if there are none
+        shadowScores -- scores of the shadow predictors reported by each client
+
+        """
+        if shadowSeed is None or len(shadowScores) == 0:
+            return
+
+        scores = numpy.mean(shadowScores, axis=0)
+        best = int(numpy.argmax(scores))
+        if scores[best] > self.scoreMutant:
+            # the mutant still has the distributed genome, so the same shadow genomes as on the clients are derived from the seed
+            mutant.predictionNetwork.fromGenome(mutant.shadowGenomes(len(scores), self.mutateRate, shadowSeed)[best])
+            self.scoreMutant = scores[best]
+
+    def _request(self, client):
+        """ hands the next candidate to the idle client in the steady-state mode, leaves it idle once all evaluations were handed out """
+        candidate = self.steadyState.open()
+        if candidate is None:
+            if self.evalCount >= self.evals:
+                return
+
+            # re-evaluate the king with a chance of reEval percent, unless it was not evaluated yet or is already being re-evaluated
+            reEvaluating = any(candidate.individual is self.king for candidate in self.steadyState.candidates.values())
+            if random.random() < self.reEval and self.steadyState.finished > 0 and not reEvaluating:
+                candidate = self.steadyState.add(self.king, None, self.scoreKing)
+            else:
+                shadowSeed = random.randrange(2**31) if self.shadowPredictors > 0 else None
+                candidate = self.steadyState.add(self.king.mutate(self.mutateRate), shadowSeed)
+            self.evalCount += 1
+            print(self.evalCount)
+
+        self.steadyState.assign(client, candidate, self.time)
+        self.controller.emit(self._genome_message(candidate.individual, candidate.number, time.time(), candidate.shadowSeed), client)
+
+    def _evaluate_candidate(self, candidate):
+        """ evaluates a candidate of the steady-state mode whose scores all arrived and maybe kills the king """
+        self.scoreMutant = sum(candidate.scores) / len(candidate.scores)
+        self._select_shadow(candidate.individual, candidate.shadowSeed, candidate.shadowScores)
+
+        # a re-evaluated king that is still king gets the mixed score, otherwise the mixed score competes like the score of a mutant
+        scoreKing = self.scoreKing
+        if candidate.scoreTemp is not None:
+            self.scoreMutant = self.reevalWeightNew * self.scoreMutant + (1.0 - self.reevalWeightNew) * candidate.scoreTemp 
+            if candidate.individual is self.king:
+                scoreKing = -1
+
+        # log scores 
+        if self.evaluation_listener and parameters.enableDataTracking:
+            self.evaluation_listener(scoreKing, self.scoreMutant)
+
+        # candidate replaces current king 
+        if self.scoreMutant >= scoreKing:
+            self.king = candidate.individual
+            self.scoreKing = self.scoreMutant
+            # store/print genome
+            if parameters.enableDataTracking:
+                line = ",".join(str(x) for x in self.king.actionNetwork.toGenome())
+                write_csv(self.filename, line)
+                line = ",".join(str(x) for x in self.king.predictionNetwork.toGenome()) + str("\n")
+                write_csv(self.filename, line) 
+
+    def _execute_steady_state(self):
+        """ collects the scores of the clients, evaluates candidates whose scores all arrived and hands the next candidates to the idle clients """
+        self.time += 1
+
+        for received in self.controller.receive():
+            print(received)
+            msg = received.split("####") # client index, candidate number, score and optionally the scores of the shadow predictors
+            client = int(msg[0])
+            shadowScores = [float(x) for x in msg[3].split("@")] if len(msg) > 3 else None
+            candidate = self.steadyState.report(client, float(msg[2]), shadowScores, int(msg[1]))
+            if candidate is not None:
+                self._evaluate_candidate(candidate)
+            if client not in self.steadyState.running:
+                self._request(client)
+
+        # if there is no word from a thymio, it gets its candidate again without holding up the others
+        for client in self.steadyState.overdue(self.time, self.maxAge + 50):
+            print("no score received from client " + str(client))
+            candidate = self.steadyState.running[client][0]
+            self.steadyState.restart(client, self.time)
+            self.controller.emit(self._genome_message(candidate.individual, candidate.number, time.time(), candidate.shadowSeed), client)
+
+        # POST EVALUATION once all evaluations are done, all clients test the king at the same time
+        if self.evalCount >= self.evals and len(self.steadyState.running) == 0:
+            self._start_post_evaluation()
+            self.time = 0
+            self._distribute(self.mutant, False)
+
+    def _genome_message(self, individual, evalNo, stamp, shadowSeed):
+        """ returns the message carrying the genome of a genetic individual
+
+        Arguments:
+        individual -- the genetic individual
+        evalNo -- number of the evaluation, which the clients return with their scores
+        stamp -- time at which the clients start the evaluation
+        shadowSeed -- seed of the shadow predictors, None if there are none
+
+        """
+        listAction = [str(x) for x in individual.actionNetwork.toGenome()]
+        listPrediction = [str(x) for x in individual.predictionNetwork.toGenome()]
+        return str(evalNo) + "####" + str(stamp) + "####" + str(self.POST_EVAL) + "####" + "@".join(listAction) + "####" + "@".join(listPrediction) + "####" + (str(shadowSeed) if shadowSeed is not None else "-")
+
     def _distribute(self, individual, fail):
         """ sends a genetic individual encoded via genome to clients """
 
-        genomeAction = individual.actionNetwork.toGenome()
-        genomePrediction = individual.predictionNetwork.toGenome()
-
-        listAction = [str(x) for x in genomeAction]
-        listPrediction = [str(x) for x in genomePrediction]
-        
         stamp = time.time() + 1
 
         # increase quantity of evaluated genomes
         if not fail:
             self.evalCount += 1
             print(self.evalCount)
+
+            # shadow predictors are only searched for new mutants, not for re-evaluated kings or in the post-evaluation
+            self.shadowSeed = None
+            if self.shadowPredictors > 0 and self.scoreTemp is None and not self.POST_EVAL:
+                self.shadowSeed = random.randrange(2**31)
+        elif self.POST_EVAL: # a failed evaluation resends the same genome and seed, but the king is post-evaluated without shadows
+            self.shadowSeed = None
             
-        msg = str(self.evalCount) + "####" + str(stamp) + "####" + str(self.POST_EVAL) + "####" + "@".join(listAction) + "####" + "@".join(listPrediction)
-        self.controller.emit(msg)
+        self.controller.emit(self._genome_message(individual, self.evalCount, stamp, self.shadowSeed))
 
         self.state = State.WAIT
         
@@ -191,6 +316,10 @@ class GeneticPopulation:
         self.mutant.storeSensor(lastSensor)
         self.scoreMutant = self.mutant.evaluate()
         msg = str(self.evalNo) + "####" + str(self.scoreMutant)
+        if self.mutant.shadowBank is not None: # scores of the shadow predictors
+            msg += "####" + "@".join(str(x) for x in self.mutant.evaluateShadows())
+        if self.steadyState is not None: # the master hands the next candidate to this client
+            msg = str(self.controller.getClientID()) + "####" + msg
         print(msg)
         self.controller.emit(msg) #self.scoreMutant)# double
         self.countRetry = 0
@@ -205,7 +334,7 @@ class GeneticPopulation:
             received = received + msg[i+1]
             
         try:
-            [evalNo, stamp, flag, listAction, listPrediction] = received.split("####")  # check if genome is complete
+            [evalNo, stamp, flag, listAction, listPrediction, shadowSeed] = received.split("####")  # check if genome is complete
         except:
             self.state = State.WAIT  # try again next timestep
             print("receive split fail")
@@ -259,6 +388,15 @@ class GeneticPopulation:
             self.tmpGenome = received
             return False
         
+        if shadowSeed != "-":
+            try:
+                shadowSeed = int(shadowSeed)
+            except:
+                self.state = State.WAIT
+                print("receive fail")
+                self.tmpGenome = received
+                return False
+
         if (len(genomeAction) != parameters.genLengthAction or len(genomePrediction) != parameters.genLengthPred):
             #check if genome is complete
             self.state = State.WAIT  
@@ -268,6 +406,12 @@ class GeneticPopulation:
             
         self.mutant.actionNetwork.fromGenome(numpy.array(genomeAction))
         self.mutant.predictionNetwork.fromGenome(numpy.array(genomePrediction))
+
+        # derive the shadow predictors from the received genome
+        if shadowSeed != "-":
+            self.mutant.setShadowPredictors(self.mutant.shadowGenomes(self.shadowPredictors, self.mutateRate, shadowSeed))
+        else:
+            self.mutant.setShadowPredictors(None)
         print(int(evalNo))
         self.mutant.reset()
         if self.tmpGenome != "":
@@ -297,9 +441,17 @@ class GeneticPopulation:
                 
             if self.initdelay < 0:
                 self.state = State.WAIT
-                self._distribute(self.mutant,False)
+                if self.steadyState is not None:
+                    for client in range(parameters.ROBOTS):
+                        self._request(client)
+                else:
+                    self._distribute(self.mutant,False)
                 
             return True
+
+        if self.steadyState is not None and not self.POST_EVAL:
+            self._execute_steady_state()
+            return True
         
         if self.state == State.WAIT:
 
@@ -312,8 +464,12 @@ class GeneticPopulation:
                 for i in range(length):
                     print(received[i])
                     msg = received[i].split("####")
+                    if self.steadyState is not None: # clients of the steady-state mode send their index first
+                        msg = msg[1:]
                     if int(msg[0]) == self.evalCount:
                         self.evaluationScores.append(float(msg[1]))
+                        if len(msg) > 2:
+                            self.shadowScores.append([float(x) for x in msg[2].split("@")])
 
                 if len(self.evaluationScores) == parameters.ROBOTS:  #check if every bot sent a score
                     self.time = 0
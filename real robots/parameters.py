@@ -15,6 +15,11 @@ ARENA_X             = 1.1  # in m
 ARENA_Y             = 1.1  # in m
 ROBOTS              = 10
 enableDataTracking  = True
+PRECISION           = "float64"  # inference precision: "float64" or "float32" (faster on the robot hosts)
+ACTION_CACHE_RESOLUTION = None   # quantization of the action network's inputs for caching its outputs, None disables the cache
+ACTION_CACHE_BUDGET = 65536      # memory budget of the action cache in bytes
+SHADOW_PREDICTORS   = 0          # mutated prediction networks evaluated next to each mutant's one, the best replaces it if it scores higher
+STEADY_STATE        = 0          # robots evaluating each candidate in the asynchronous steady-state mode, in which every robot gets a new candidate as soon as it finishes; 0 keeps generations
 
 
 SENSORS         = 9  # 5 horiontal front + 2 back + 2 ground
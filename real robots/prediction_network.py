@@ -1,22 +1,35 @@
 import numpy
+from activation import supports_out
 
 class PredictionNetwork:
     """ represents a feedforward, recurrent network with one hidden layer
 
+    All weights and the initial hidden layer output are stored in one contiguous genome buffer.
+    *hidden*, *recurrent*, *hiddenOutput* and *out* are views to this buffer, which running the network never changes.
+    The running hidden layer output is kept in the preallocated vector *hiddenState*, which *reset* loads from *hiddenOutput*.
+    Each hidden node is only connected to itself, so the self-recurrence is kept as the vector *recurrent* and applied elementwise.
+
     Usage:
     Call constructor and initialize network with desired parameters.
     Then call *input* with a vector, for example the action values, and retrieve the prediction vector.
+    Alternatively write the input values directly to the first *amountIn* - 1 entries of *inputVector* and call *forward*.
 
     """
 
-    def __init__(self, amountIn, amountHidden, amountOut, activationFunction):
-        """ initialize a new PredictionNetwork with specified sizes and random matrices
+    __slots__ = ("amountIn", "amountHidden", "amountOut", "activationFunction", "inPlace", "dtype", "genomeLength",
+                 "genome", "hidden", "recurrent", "hiddenOutput", "out",
+                 "inputVector", "hiddenVector", "outputVector", "hiddenState")
+
+    def __init__(self, amountIn, amountHidden, amountOut, activationFunction, genome=None, dtype=numpy.float64):
+        """ initialize a new PredictionNetwork with specified sizes and random matrices or matrices from given genome
 
         Arguments:
         amountIn -- amount of inputs to the network
         amountHidden -- amount of hidden nodes in the only hidden layer
         amountOut -- amount of output nodes
         activationFunction -- reference to a function applied to the sum of all incoming values in each node, the output of this function is the output of the node
+        genome -- optional genome buffer used as storage of the weights instead of drawing random weights; it is not copied, so later changes of the network's weights write to it
+        dtype -- floating point type of weights and computations, for example numpy.float32 for faster inference with half the memory
 
         Usage:
         Call *input* to get the networks output
@@ -25,49 +38,186 @@ class PredictionNetwork:
         self.amountIn = amountIn + 1
         self.amountHidden = amountHidden
         self.amountOut = amountOut
-        self.hiddenOutput = None
         self.activationFunction = activationFunction
-        self._constructRandomMatrices()
+        self.inPlace = supports_out(activationFunction)
+        self.dtype = numpy.dtype(dtype)
+        self.genomeLength = self.amountHidden * (self.amountIn + 2) + self.amountOut * (self.amountHidden+1) # recurrent weights and initial hidden output included
+        self._constructBuffers()
+
+        if genome is None:
+            self._constructRandomMatrices()
+        else:
+            self._useGenome(genome)
+
+    def _constructBuffers(self):
+        """ allocates the bias-augmented vectors reused in every call of *forward*
+
+        *inputVector* holds the input values followed by the bias.
+        *hiddenVector* holds the hidden layer output followed by the bias.
+        *hiddenState* holds the hidden layer output carried over to the next call of *forward*.
+
+        """
+        self.inputVector = numpy.empty((self.amountIn, 1), self.dtype)
+        self.inputVector[self.amountIn-1] = -1 # bias
+        self.hiddenVector = numpy.empty((self.amountHidden+1, 1), self.dtype)
+        self.hiddenVector[-1] = -1 # bias
+        self.outputVector = numpy.empty((self.amountOut, 1), self.dtype)
+        self.hiddenState = numpy.empty((self.amountHidden, 1), self.dtype)
 
     def _constructRandomMatrices(self):
         """ generates random matrices with values in [-1,1) suspect to change via fromGenom """
-        self.hidden = 2 * numpy.random.rand(self.amountHidden, self.amountIn) - 1
-        self.hidden = numpy.concatenate((self.hidden, numpy.diag( 2 * numpy.random.rand(self.amountHidden) - 1 )), 1)
-        self.hiddenOutput = 2 * numpy.random.rand(self.amountHidden, 1) - 1
-        self.out = 2 * numpy.random.rand(self.amountOut, (self.amountHidden+1)) - 1
+        self._useGenome(2 * numpy.random.rand(self.genomeLength) - 1)
+
+    def _useGenome(self, genome):
+        """ uses the given genome buffer as storage and creates the matrices as views to it, the genome is only copied if its type does not match *dtype* """
+        self.genome = numpy.ascontiguousarray(genome[:self.genomeLength], dtype=self.dtype)
+
+        lengthHidden = self.amountHidden * self.amountIn
+        self.hidden = self.genome[ : lengthHidden].reshape(self.amountHidden, self.amountIn)
+        self.recurrent = self.genome[lengthHidden : lengthHidden + self.amountHidden].reshape(self.amountHidden, 1)
+        self.hiddenOutput = self.genome[lengthHidden + self.amountHidden : lengthHidden + 2 * self.amountHidden].reshape(self.amountHidden, 1)
+        self.out = self.genome[lengthHidden + 2 * self.amountHidden : ].reshape(self.amountOut, (self.amountHidden+1))
+        self.reset()
+
+    def reset(self):
+        """ restarts the network from the initial hidden layer output stored in the genome """
+        numpy.copyto(self.hiddenState, self.hiddenOutput)
 
     def toGenome(self):
-        """ returns the genome representing this network """
-        return numpy.concatenate((self.hidden[:,:self.amountIn].flatten(),
-                                    numpy.diag(self.hidden[:,self.amountIn:]),
-                                    self.hiddenOutput.flatten(),
-                                    self.out.flatten()))
+        """ returns the genome representing this network, which is the buffer storing the weights and not a copy
+
+        The genome contains the initial hidden layer output, it does not change while the network runs.
+
+        """
+        return self.genome
 
     def fromGenome(self, genome):
-        """ overwrites current matrices with those in given genome """
+        """ overwrites current matrices with those in given genome
 
-        # get either genome
-        genomeHidden = genome[ : self.amountHidden * self.amountIn]
-        genomeHiddenDiag = genome[self.amountHidden * self.amountIn : self.amountHidden * self.amountIn + self.amountHidden]
-        genomeHiddenOutput = genome[self.amountHidden * self.amountIn + self.amountHidden : self.amountHidden * self.amountIn + 2 * self.amountHidden]
-        genomeOut = genome[self.amountHidden * self.amountIn + 2 * self.amountHidden : ]
+        The genome is copied to the genome buffer of this network in a single operation, then the network is reset.
 
-        # construct matrices
-        self.hidden = genomeHidden.reshape(self.amountHidden, self.amountIn)
-        self.hidden = numpy.concatenate((self.hidden, numpy.diag(genomeHiddenDiag)), 1)
-        self.hiddenOutput = genomeHiddenOutput.reshape(self.amountHidden, 1)
-        self.out = genomeOut.reshape(self.amountOut, (self.amountHidden+1))
+        """
+        self.genome[:] = genome[:self.genomeLength]
+        self.reset()
 
     def input(self, vector):
         """ input a vector to this network and returns the output of the network
 
+        The returned vector is reused by the next call, so copy it if it should be kept.
+
         Arguments:
         vector -- numpy vector that should be input to this network, amount of elements must match *amountIn*
 
         """
+        self.inputVector[:self.amountIn-1] = vector
+        return self.forward()
+
+    def forward(self):
+        """ calculates the network's output for the values currently stored in *inputVector* without allocating new arrays """
+        numpy.matmul(self.hidden, self.inputVector, out=self.hiddenVector[:-1])
+
+        # elementwise self-recurrence, the last hidden layer output is overwritten in place
+        self.hiddenState *= self.recurrent
+        self.hiddenState += self.hiddenVector[:-1]
+        self._activate(self.hiddenState)
+        self.hiddenVector[:-1] = self.hiddenState
+
+        numpy.matmul(self.out, self.hiddenVector, out=self.outputVector) # last entry is the bias
+        self._activate(self.outputVector)
+        return self.outputVector
+
+    def _activate(self, vector):
+        """ applies the activation function to the given vector in place """
+        if self.inPlace:
+            self.activationFunction(vector, out=vector)
+        else:
+            vector[...] = self.activationFunction(vector)
+
+
+class PredictionNetworkBank:
+    """ represents a bank of equally sized *PredictionNetwork*s evaluated in one batched computation
+
+    The weights of K networks are stacked into 3-D arrays and every network keeps its own recurrent hidden state, so that one call to *input* steps all K networks.
 
-        vector = numpy.concatenate((vector, [[-1]]), 0) # bias 
-        self.hiddenOutput = self.activationFunction(self.hidden.dot(numpy.concatenate((vector, self.hiddenOutput), 0)))
-        tmp = numpy.concatenate((self.hiddenOutput, [[-1]]),0) # concatenate bias 
+    Usage:
+    Create a bank from a (K, genome length) matrix of genomes or via *fromNetworks* from a list of networks.
+    Then call *input* with the K input vectors stacked to an array of shape (K, amountIn, 1) in order to retrieve the K prediction vectors as an array of shape (K, amountOut, 1).
+    A single vector of shape (amountIn, 1) is fed to all K networks.
+
+    """
+
+    def __init__(self, amountIn, amountHidden, amountOut, activationFunction, genomes, dtype=None):
+        """ initialize a new PredictionNetworkBank with specified sizes from a matrix of genomes
+
+        Arguments:
+        amountIn -- amount of inputs to each network
+        amountHidden -- amount of hidden nodes in the only hidden layer of each network
+        amountOut -- amount of output nodes of each network
+        activationFunction -- reference to a function applied elementwise to the stacked sums of incoming values
+        genomes -- matrix with one genome per row in the format of *PredictionNetwork.toGenome*
+        dtype -- optional floating point type of weights and computations, by default the type of *genomes*
+
+        """
+        self.amountIn = amountIn + 1
+        self.amountHidden = amountHidden
+        self.amountOut = amountOut
+        self.activationFunction = activationFunction
+        self.dtype = dtype
+        self.fromGenomes(genomes)
+
+    @classmethod
+    def fromNetworks(cls, networks):
+        """ returns a bank containing copies of the weights and hidden states of all given networks, which must have equal sizes """
+        first = networks[0]
+        genomes = numpy.stack([network.toGenome() for network in networks])
+        bank = cls(first.amountIn - 1, first.amountHidden, first.amountOut, first.activationFunction, genomes, first.dtype)
+        bank.hiddenOutput = numpy.stack([network.hiddenState for network in networks]).astype(bank.hiddenOutput.dtype)
+        return bank
+
+    def toGenomes(self):
+        """ returns the genomes of all networks in this bank as a (K, genome length) matrix, containing the current hidden states """
+        return numpy.concatenate((self.hidden.reshape(self.amountNetworks, -1),
+                                    self.recurrent.reshape(self.amountNetworks, -1),
+                                    self.hiddenOutput.reshape(self.amountNetworks, -1),
+                                    self.out.reshape(self.amountNetworks, -1)), 1)
+
+    def fromGenomes(self, genomes):
+        """ overwrites all matrices and hidden states with those in given genomes
+
+        Arguments:
+        genomes -- matrix with one genome per row, the amount of rows determines the amount of networks in this bank
+
+        """
+        genomes = numpy.asarray(genomes, dtype=self.dtype)
+        self.amountNetworks = genomes.shape[0]
+
+        # get either genome
+        lengthHidden = self.amountHidden * self.amountIn
+        genomeHidden = genomes[:, : lengthHidden]
+        genomeRecurrent = genomes[:, lengthHidden : lengthHidden + self.amountHidden]
+        genomeHiddenOutput = genomes[:, lengthHidden + self.amountHidden : lengthHidden + 2 * self.amountHidden]
+        genomeOut = genomes[:, lengthHidden + 2 * self.amountHidden : ]
+
+        # construct stacked matrices, the self-recurrence is kept as a vector like in *PredictionNetwork*
+        self.hidden = genomeHidden.reshape(self.amountNetworks, self.amountHidden, self.amountIn)
+        self.recurrent = genomeRecurrent.reshape(self.amountNetworks, self.amountHidden, 1)
+        self.initialHiddenOutput = genomeHiddenOutput.reshape(self.amountNetworks, self.amountHidden, 1)
+        self.out = genomeOut.reshape(self.amountNetworks, self.amountOut, (self.amountHidden+1))
+        self.reset()
+
+    def reset(self):
+        """ restarts all networks from the initial hidden layer outputs of their genomes """
+        self.hiddenOutput = self.initialHiddenOutput.copy()
+
+    def input(self, vectors):
+        """ inputs one vector per network to this bank and returns the stacked outputs of all networks
+
+        Arguments:
+        vectors -- numpy array of shape (K, amountIn, 1), or a single vector of shape (amountIn, 1) fed to all networks
+
+        """
+        # the bias input is -1, so its weights (last column) are subtracted instead of concatenating the bias to each vector
+        tmp = numpy.matmul(self.hidden[:, :, :-1], vectors) - self.hidden[:, :, -1:]
+        self.hiddenOutput = self.activationFunction(tmp + self.recurrent * self.hiddenOutput)
 
-        return self.activationFunction(self.out.dot(tmp))
+        return self.activationFunction(numpy.matmul(self.out[:, :, :-1], self.hiddenOutput) - self.out[:, :, -1:])
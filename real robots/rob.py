@@ -11,6 +11,8 @@ class Robot:
     def __init__(self):
         self.proxSensorsVal = [0, 0, 0, 0, 0, 0, 0]
         self.groundSensorsVal = [0, 0]
+        self.sensors = np.zeros((9, 1)) # sensor vector reused by getAllSensors
+        self.sensorMax = np.array([[parameters.MAX_HORIZONTAL_SENSOR]] * 7 + [[parameters.MAX_GROUND_SENSOR]] * 2)
         self.parser = OptionParser()
         self.parser.add_option("-s", "--system", action="store_true", dest="system", default=False,
                           help="use the system bus instead of the session bus")
@@ -48,17 +50,11 @@ class Robot:
         self.network.GetVariable("thymio-II", "prox.ground.reflected", reply_handler=self.get_variables_reply_ground,
                                   error_handler=self.get_variables_error)
         
-        return np.array([
-                [(self.proxSensorsVal[0] / parameters.MAX_HORIZONTAL_SENSOR)],
-                [(self.proxSensorsVal[1] / parameters.MAX_HORIZONTAL_SENSOR)],
-                [(self.proxSensorsVal[2] / parameters.MAX_HORIZONTAL_SENSOR)],
-                [(self.proxSensorsVal[3] / parameters.MAX_HORIZONTAL_SENSOR)],
-                [(self.proxSensorsVal[4] / parameters.MAX_HORIZONTAL_SENSOR)],
-                [(self.proxSensorsVal[5] / parameters.MAX_HORIZONTAL_SENSOR)],
-                [(self.proxSensorsVal[6] / parameters.MAX_HORIZONTAL_SENSOR)],
-                [(self.groundSensorsVal[0] / parameters.MAX_GROUND_SENSOR)],
-                [(self.groundSensorsVal[1] / parameters.MAX_GROUND_SENSOR)]
-                ])
+        # write normalized values into the preallocated sensor vector, which is overwritten by the next call
+        self.sensors[:7, 0] = self.proxSensorsVal
+        self.sensors[7:, 0] = self.groundSensorsVal
+        np.divide(self.sensors, self.sensorMax, out=self.sensors)
+        return self.sensors
     
     def getAllGroundSensors(self):
         self.network.GetVariable("thymio-II", "prox.ground.reflected", reply_handler=self.get_variables_reply_ground,
@@ -7,6 +7,7 @@ class Server:
 
     def __init__(self):
         self.clientList = []
+        self.clients = {} # sockets by client index
         self.stop_threads = False
         self.buffer = []
         self.mutex = Lock()
@@ -42,6 +43,7 @@ class Server:
             con = Thread(target=self.on_new_client, args=(conn, addr, clientIndex))
             con.start()
             self.clientList.append(conn)
+            self.clients[clientIndex] = conn
             clientIndex = clientIndex + 1
 
     # receiving from clients
@@ -77,6 +79,10 @@ class Server:
         for client in self.clientList:
             client.send(var.encode())
 
+    # sending to the client with the given index only
+    def send(self, clientIndex, var):
+        self.clients[clientIndex].send(var.encode())
+
     def closeServer(self):
         self.stop_threads = True
         tmpSocket = socket.socket()